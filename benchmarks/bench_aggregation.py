@@ -0,0 +1,100 @@
+"""Benchmark: single-pass FloodAggregator vs the previous lambda groupbys.
+
+Usage: python -m benchmarks.bench_aggregation [--rows 1200000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_aggregator import FloodAggregator
+from src.data_cache import apply_schema
+
+def make_data(rows, rivers=50, seed=42):
+    """Hourly readings for `rivers` stations, `rows` in total"""
+    rng = np.random.default_rng(seed)
+    per_river = rows // rivers
+    timestamps = pd.date_range('2024-01-01', periods=per_river, freq='h')
+    height = rng.normal(196, 33, per_river * rivers)
+    return pd.DataFrame({
+        'timestamp': np.tile(timestamps.to_numpy(), rivers),
+        'river_name': np.repeat([f'River_{i:03d}' for i in range(rivers)], per_river),
+        'water_height_cm': height,
+        'water_flow_m3s': np.clip(height / 60, 0.1, None),
+        'rainfall_mm': rng.exponential(6, per_river * rivers),
+        'flood_status': np.where(height > 200, 'BANJIR', 'AMAN'),
+        'sensor_status': np.where(rng.random(per_river * rivers) < 0.02, 'ERROR', 'NORMAL')
+    })
+
+def legacy_tables(data):
+    """The per-group lambda aggregation previously in FloodDataAnalyzer"""
+    temporal_data = data.copy()
+    temporal_data['hour'] = temporal_data['timestamp'].dt.hour
+    temporal_data['month'] = temporal_data['timestamp'].dt.month
+    hourly = temporal_data.groupby('hour').agg({
+        'water_height_cm': 'mean', 'rainfall_mm': 'mean',
+        'flood_status': lambda x: (x == 'BANJIR').mean()
+    }).round(3)
+    monthly = temporal_data.groupby('month').agg({
+        'water_height_cm': 'mean', 'rainfall_mm': 'sum',
+        'flood_status': lambda x: (x == 'BANJIR').mean()
+    }).round(3)
+    seasonal_data = temporal_data.copy()
+    seasonal_data['season'] = seasonal_data['month'].apply(
+        lambda x: 'Rainy' if x in [1, 2, 3, 10, 11, 12] else 'Dry'
+    )
+    seasonal = seasonal_data.groupby('season').agg({
+        'water_height_cm': ['mean', 'std', 'max'],
+        'rainfall_mm': ['sum', 'mean'],
+        'flood_status': lambda x: (x == 'BANJIR').mean(),
+        'river_name': 'nunique'
+    }).round(3)
+    rivers = data.groupby('river_name').agg({
+        'water_height_cm': ['mean', 'std', 'max', 'min'],
+        'water_flow_m3s': ['mean', 'max'],
+        'rainfall_mm': 'sum',
+        'flood_status': lambda x: (x == 'BANJIR').sum(),
+        'sensor_status': lambda x: (x == 'ERROR').mean()
+    }).round(3)
+    return hourly, monthly, seasonal, rivers
+
+def engine_tables(data):
+    aggregator = FloodAggregator(data)
+    return (aggregator.hourly_table(), aggregator.monthly_table(),
+            aggregator.seasonal_table(), aggregator.river_table())
+
+def best_of(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_200_000)
+    parser.add_argument('--rivers', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    raw = make_data(args.rows, args.rivers)
+    print(f"Rows: {len(raw):,} ({args.rivers} rivers)")
+    
+    # Text dtypes (plain read_csv) and the typed schema used by the columnar cache
+    for label, data in (('text dtypes', raw), ('typed schema', apply_schema(raw.copy()))):
+        legacy_time, legacy = best_of(legacy_tables, data, args.repeat)
+        engine_time, engine = best_of(engine_tables, data, args.repeat)
+        
+        # Same numbers, up to rounding at the 3rd decimal
+        for old, new in zip(legacy, engine):
+            np.testing.assert_allclose(old.to_numpy(float), new.to_numpy(float)[:, :old.shape[1]], atol=2e-3)
+        
+        print(f"[{label}]")
+        print(f"  Lambda groupbys:   {legacy_time * 1000:8.1f} ms")
+        print(f"  FloodAggregator:   {engine_time * 1000:8.1f} ms")
+        print(f"  Speedup:           {legacy_time / engine_time:8.1f}x")
+
+if __name__ == '__main__':
+    main()
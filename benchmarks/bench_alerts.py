@@ -0,0 +1,53 @@
+"""Benchmark: early-warning rule evaluation latency per ingest batch.
+
+Warms the AlertEngine up with `--history-hours` of readings for `--rivers`
+stations, then feeds `--batches` live batches (one reading per river per
+batch, i.e. one sampling tick) and reports the per-batch latency.
+
+Usage: python -m benchmarks.bench_alerts [--rivers 500] [--batches 200]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.alert_engine import AlertEngine
+
+def make_ticks(rivers, hours, start, rng):
+    """Hourly readings for `rivers` stations over `hours` hours"""
+    timestamps = pd.date_range(start, periods=hours, freq='h')
+    height = 150 + np.cumsum(rng.normal(0, 12, (rivers, hours)), axis=1).clip(-140, 140)
+    return pd.DataFrame({
+        'timestamp': np.tile(timestamps.to_numpy(), rivers),
+        'river_name': np.repeat([f'River_{i:03d}' for i in range(rivers)], hours),
+        'water_height_cm': height.ravel(),
+        'rainfall_mm': rng.exponential(6, rivers * hours)
+    })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rivers', type=int, default=500)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--history-hours', type=int, default=24 * 30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    data = make_ticks(args.rivers, args.history_hours + args.batches, '2024-01-01', rng)
+    history = data[data['timestamp'] < data['timestamp'].min() + pd.Timedelta(hours=args.history_hours)]
+    live = data.drop(history.index).sort_values('timestamp', kind='stable')
+
+    engine = AlertEngine()
+    start = time.perf_counter()
+    backfill = engine.process(history)
+    print(f"Backfill: {len(history):,} readings, {args.rivers} rivers, "
+          f"{len(backfill):,} alerts in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    engine.latencies.clear()
+    raised = sum(len(engine.process(tick)) for _, tick in live.groupby('timestamp', sort=True))
+    print(f"Live: {args.batches} batches of {args.rivers} readings, {raised} alerts")
+    print(f"  {json.dumps(engine.metrics())}")
+
+if __name__ == "__main__":
+    main()
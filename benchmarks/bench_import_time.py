@@ -0,0 +1,71 @@
+"""Benchmark: cold-start time of the CLI.
+
+Runs `python main.py status` in fresh interpreters (median of `--runs`
+after one warm-up run) and, for comparison, the time to import the
+sampler, analyzer and visualizer modules, which is what every command
+paid before heavy libraries were imported lazily. Lists the slowest
+imports of `status` from `python -X importtime`.
+
+Usage: python -m benchmarks.bench_import_time [--runs 10] [--max-ms 300]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EAGER_IMPORTS = 'import src.data_sampler, src.data_analyzer, src.data_visualizer'
+
+def wall_ms(command, runs):
+    """Median wall time of a command in fresh interpreters (after one warm-up run)"""
+    subprocess.run(command, cwd=ROOT, capture_output=True)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def slowest_imports(command, top):
+    """Top modules by cumulative import time (microseconds) from -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], cwd=ROOT,
+                            capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        entries.append((int(cumulative), module.strip()))
+    return sorted(entries, reverse=True)[:top], {module for _, module in entries}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='exit with status 1 if `status` takes longer than this')
+    args = parser.parse_args()
+
+    status_command = [sys.executable, 'main.py', 'status']
+    baseline_ms = wall_ms([sys.executable, '-c', 'pass'], args.runs)
+    status_ms = wall_ms(status_command, args.runs)
+    eager_ms = wall_ms([sys.executable, '-c', EAGER_IMPORTS], args.runs)
+    print(f"Interpreter startup:            {baseline_ms:8.1f} ms")
+    print(f"main.py status:                 {status_ms:8.1f} ms")
+    print(f"Eager sampler/analyzer/plots:   {eager_ms:8.1f} ms")
+
+    top, modules = slowest_imports(status_command, args.top)
+    heavy = sorted(module for module in ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy') if module in modules)
+    print(f"Heavy modules imported by status: {', '.join(heavy) or 'none'}")
+    print("Slowest imports of status (cumulative):")
+    for cumulative, module in top:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    if args.max_ms is not None and status_ms > args.max_ms:
+        print(f"status cold start {status_ms:.1f} ms exceeds {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
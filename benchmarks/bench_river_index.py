@@ -0,0 +1,79 @@
+"""Benchmark: per-river lookups, boolean mask vs the FloodDataset river index.
+
+Builds `--rivers` stations x `--hours` hourly readings (timestamp-major, like
+the raw CSV), then times
+  - one full pass over all rivers (`data[data['river_name'] == river]` vs
+    index slices), as in the sampler, executor and visualizer loops
+  - `--lookups` random (river, 7-day window) queries
+The index build (one sort) is reported separately and counted in the totals.
+
+Usage: python -m benchmarks.bench_river_index [--rivers 500] [--hours 2160] [--lookups 200]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.flood_dataset import FloodDataset
+
+def make_readings(rivers, hours, rng):
+    """Hourly readings for `rivers` stations, ordered by timestamp then river"""
+    timestamps = pd.date_range('2024-01-01', periods=hours, freq='h')
+    names = pd.Categorical([f'River_{i:03d}' for i in range(rivers)])
+    return pd.DataFrame({
+        'timestamp': np.repeat(timestamps.to_numpy(), rivers),
+        'river_name': np.tile(names, hours),
+        'water_height_cm': rng.normal(150, 40, rivers * hours),
+        'rainfall_mm': rng.exponential(6, rivers * hours)
+    })
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rivers', type=int, default=500)
+    parser.add_argument('--hours', type=int, default=24 * 90)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    data = make_readings(args.rivers, args.hours, rng)
+    rivers = [f'River_{i:03d}' for i in range(args.rivers)]
+    print(f"{len(data):,} readings, {args.rivers} rivers")
+
+    queries = [(rivers[i], pd.Timestamp('2024-01-01') + pd.Timedelta(hours=int(h)))
+               for i, h in zip(rng.integers(0, args.rivers, args.lookups),
+                               rng.integers(0, max(1, args.hours - 168), args.lookups))]
+    week = pd.Timedelta(days=7)
+
+    def mask_all():
+        return sum(len(data[data['river_name'] == river]) for river in rivers)
+
+    def mask_windows():
+        return sum(len(data[(data['river_name'] == river) & (data['timestamp'] >= start)
+                            & (data['timestamp'] <= start + week)]) for river, start in queries)
+
+    dataset = FloodDataset(data)
+    _, build_seconds = timed(dataset.river_index)
+
+    def index_all():
+        return sum(len(rows) for rows in dataset.river_groups().values())
+
+    def index_windows():
+        return sum(len(dataset.river_slice(river, start, start + week)) for river, start in queries)
+
+    print(f"Index build (one sort): {build_seconds * 1000:.1f} ms")
+    for label, mask, index in (('all rivers', mask_all, index_all),
+                               (f'{args.lookups} window lookups', mask_windows, index_windows)):
+        expected, mask_seconds = timed(mask)
+        rows, index_seconds = timed(index)
+        assert rows == expected
+        print(f"  {label:<22} mask {mask_seconds * 1000:9.1f} ms | index {index_seconds * 1000:7.1f} ms "
+              f"({mask_seconds / (index_seconds + build_seconds):.0f}x incl. build)")
+
+if __name__ == "__main__":
+    main()
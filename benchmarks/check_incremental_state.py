@@ -0,0 +1,109 @@
+"""Regression check: persisted incremental state follows the source CSV.
+
+Builds the saved streaming-statistics state and the cached forecast model
+from a synthetic CSV, then changes the CSV and checks both, reloaded and
+brought up to date, against a full recompute:
+
+  - append: new rows are added incrementally (no rebuild)
+  - late:   a row at or before its river's watermark is appended
+  - rewrite: every water level is shifted down by 50 cm in place
+
+Exits with status 1 if any case disagrees with the recompute.
+
+Usage: python -m benchmarks.check_incremental_state
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.data_analyzer import FloodDataAnalyzer
+from src.data_cache import apply_schema
+from src.data_generator import generate_flood_data
+from src.forecaster import WaterLevelForecaster
+
+COLUMNS = ['water_height_cm', 'rainfall_mm']
+
+def read(csv_path):
+    return apply_schema(pd.read_csv(csv_path))
+
+def saved_stats(csv_path, stats_path):
+    """Streaming stats after one analysis run on the current CSV (and its log)"""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        analyzer = FloodDataAnalyzer(read(csv_path), stats_path=stats_path, stats_source=csv_path)
+        stats = analyzer.get_streaming_stats(COLUMNS)
+    return stats, log.getvalue()
+
+def saved_forecaster(csv_path, model_path):
+    """Cached forecast model after one forecast run on the current CSV"""
+    model = WaterLevelForecaster.load(model_path, source_path=csv_path).sync(read(csv_path))
+    model.save(model_path, csv_path)
+    return model
+
+def check_forecast(name, csv_path, model_path, expect_refit):
+    model = saved_forecaster(csv_path, model_path)
+    expected = WaterLevelForecaster().update(read(csv_path))
+    forecast = model.predict().sort_values(['river_name', 'target_time'])
+    recomputed = expected.predict().sort_values(['river_name', 'target_time'])
+    ok = np.allclose(forecast['forecast_cm'], recomputed['forecast_cm'], equal_nan=True)
+    refit = model.refit_reason is not None
+    ok = ok and refit == expect_refit
+    print(f"  {name:<8} {'ok' if ok else 'FAILED':<7} mean forecast {forecast['forecast_cm'].mean():.2f} "
+          f"(recomputed {recomputed['forecast_cm'].mean():.2f}), refit: {refit}")
+    return ok
+
+def check(name, csv_path, stats_path, expect_rebuild):
+    stats, log = saved_stats(csv_path, stats_path)
+    data = read(csv_path)
+    described = stats.describe()
+    expected = data[COLUMNS].describe()
+    ok = (np.allclose(described.loc['count'], expected.loc['count'])
+          and np.allclose(described.loc['mean'], expected.loc['mean'])
+          and np.allclose(described.loc['std'], expected.loc['std']))
+    rebuilt = 'rebuilding' in log
+    ok = ok and rebuilt == expect_rebuild
+    print(f"  {name:<8} {'ok' if ok else 'FAILED':<7} mean {described.loc['mean', 'water_height_cm']:.2f} "
+          f"(recomputed {expected.loc['mean', 'water_height_cm']:.2f}), rebuilt: {rebuilt}")
+    return ok
+
+def main():
+    data = generate_flood_data(n_rivers=3, days=20)
+    history = data[data['timestamp'] < data['timestamp'].min() + pd.Timedelta(days=15)]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'sensors.csv')
+        stats_path = os.path.join(tmp, 'stats.json')
+        model_path = os.path.join(tmp, 'forecast.npz')
+        history.to_csv(csv_path, index=False)
+        saved_stats(csv_path, stats_path)
+        saved_forecaster(csv_path, model_path)
+
+        def append_rows():
+            data.drop(history.index).to_csv(csv_path, mode='a', header=False, index=False)
+
+        def append_late_row():
+            late = history.iloc[[len(history) // 2]].assign(water_height_cm=299.0)
+            late.to_csv(csv_path, mode='a', header=False, index=False)
+
+        def shift_heights():
+            shifted = read(csv_path)
+            shifted['water_height_cm'] -= 50
+            shifted.to_csv(csv_path, index=False)
+
+        for name, change, rebuild in [('append', append_rows, False), ('late', append_late_row, True),
+                                      ('rewrite', shift_heights, True)]:
+            change()
+            print(f"{name}:")
+            results.append(check('stats', csv_path, stats_path, expect_rebuild=rebuild))
+            results.append(check_forecast('forecast', csv_path, model_path, expect_refit=rebuild))
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Load generator for the live ingestion server.
+
+Simulates `--devices` concurrent sensors, each sending `--requests` POSTs
+of `--batch` readings over a keep-alive connection (or streaming NDJSON
+lines with --stream), then prints request latency and the server's batch
+flush timings.
+
+Usage: python -m benchmarks.load_ingest_server [--spawn] [--devices 50]
+       [--requests 40] [--batch 50] [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from utils.config import DATASET_CONFIG, INGEST_SERVER_CONFIG
+from src.ingest_server import IngestServer, MicroBatchWriter
+
+def make_readings(device, count, rng):
+    """`count` raw-schema readings from one simulated device"""
+    river = DATASET_CONFIG['rivers'][device % len(DATASET_CONFIG['rivers'])].replace('_', ' ')
+    height = rng.normal(180, 40, count).clip(0, DATASET_CONFIG['sensor_height_cm'])
+    start = np.datetime64('2024-04-01T00:00:00') + np.timedelta64(device, 's')
+    readings = []
+    for i in range(count):
+        flood = height[i] > DATASET_CONFIG['flood_threshold_cm']
+        readings.append({
+            'timestamp': str(start + np.timedelta64(i, 'm')).replace('T', ' '),
+            'river_name': river,
+            'sensor_distance_cm': round(DATASET_CONFIG['sensor_height_cm'] - height[i], 2),
+            'water_height_cm': round(float(height[i]), 2),
+            'water_flow_m3s': round(float(height[i]) / 60, 3),
+            'flood_status': 'BANJIR' if flood else 'AMAN',
+            'flood_level': 'TINGGI' if flood else 'RENDAH',
+            'rainfall_mm': round(float(rng.exponential(5)), 1),
+            'humidity_pct': 80.0,
+            'temperature_c': 27.5,
+            'sensor_status': 'NORMAL',
+            'latitude': -8.2,
+            'longitude': 114.3
+        })
+    return readings
+
+async def http_request(reader, writer, method, path, body=b''):
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return status, json.loads(await reader.readexactly(length))
+
+async def run_device(device, args, latencies):
+    rng = np.random.default_rng(device)
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    for _ in range(args.requests):
+        readings = make_readings(device, args.batch, rng)
+        start = time.perf_counter()
+        if args.stream:
+            writer.write(''.join(json.dumps(r) + '\n' for r in readings).encode())
+            await writer.drain()
+        else:
+            status, _ = await http_request(reader, writer, 'POST', '/readings', json.dumps(readings).encode())
+            assert status == 202, status
+        latencies.append(time.perf_counter() - start)
+    if args.stream:
+        # Half-close and wait until the server has consumed every line
+        writer.write_eof()
+        await reader.read()
+    writer.close()
+
+async def run(args):
+    server = None
+    if args.spawn:
+        output_dir = tempfile.mkdtemp(prefix='ingest_bench_')
+        server = await IngestServer(MicroBatchWriter(output_dir), args.host, 0).start()
+        args.port = server.port
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_device(d, args, latencies) for d in range(args.devices)))
+    elapsed = time.perf_counter() - start
+
+    total = args.devices * args.requests * args.batch
+    latencies = np.array(latencies) * 1000
+    print(f"Sent {total:,} readings from {args.devices} devices in {elapsed:.2f}s "
+          f"({total / elapsed:,.0f} readings/s, {'stream' if args.stream else 'http'})")
+    print(f"  request latency ms  p50={np.percentile(latencies, 50):.2f}  "
+          f"p95={np.percentile(latencies, 95):.2f}  max={latencies.max():.2f}")
+
+    if server is not None:
+        await server.stop()
+        metrics = server.writer.metrics()
+    else:
+        await asyncio.sleep(INGEST_SERVER_CONFIG['batch_max_latency_s'] * 2)
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        _, metrics = await http_request(reader, writer, 'GET', '/metrics')
+        writer.close()
+    print(f"  server flushes: {json.dumps(metrics)}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=INGEST_SERVER_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=INGEST_SERVER_CONFIG['port'])
+    parser.add_argument('--spawn', action='store_true', help='run the server in-process on a free port')
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--stream', action='store_true', help='use the NDJSON line protocol')
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
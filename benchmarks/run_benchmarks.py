@@ -0,0 +1,192 @@
+"""Benchmark suite: every public method of the sampler, analyzer and visualizer.
+
+For each `--rows` size a synthetic archive is generated (src/data_generator.py,
+hourly, up to a year per river, more rivers for more rows). Every public
+method of FloodDataSampler, FloodDataAnalyzer and FloodDataVisualizer then
+runs on a fresh instance over a fresh FloodDataset (no cached index or
+episodes carried between methods):
+  - `--repeat` timed runs (best wall time reported)
+  - one extra run under tracemalloc for the peak traced allocation
+
+Results go to JSON. `--save-baseline NAME` stores them in
+benchmarks/baselines/NAME.json; `--compare NAME` checks them against a stored
+baseline and exits with status 1 when a method got slower (or used more
+memory) than the tolerance allows. Baselines are only comparable on the same
+machine; the file records which one.
+
+At 10^8 rows the archive alone is ~5 GB in memory, so the largest size needs
+a machine sized for it.
+
+Usage: python -m benchmarks.run_benchmarks [--rows 10000 100000 1000000] [--classes sampler analyzer]
+           [--methods name ...] [--save-baseline NAME | --compare NAME] [--tolerance 1.5]
+"""
+import argparse
+import contextlib
+import inspect
+import json
+import platform
+import tempfile
+import tracemalloc
+import time
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_generator import generate_flood_data
+from src.flood_dataset import FloodDataset
+from src.data_sampler import FloodDataSampler
+from src.data_analyzer import FloodDataAnalyzer
+from src.data_visualizer import FloodDataVisualizer
+from utils.config import STATS_CONFIG
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+CLASSES = {
+    'sampler': FloodDataSampler,
+    'analyzer': FloodDataAnalyzer,
+    'visualizer': FloodDataVisualizer
+}
+
+# Arguments for methods that need them: f(data, tmp_dir) -> kwargs
+METHOD_ARGS = {
+    'river_specific_sampling': lambda data, tmp: {'river_name': str(data['river_name'].iloc[0])},
+    'get_streaming_stats': lambda data, tmp: {'columns': STATS_CONFIG['columns']},
+    'save_river_samples': lambda data, tmp: {'output_dir': os.path.join(tmp, 'samples')},
+    'render_all': lambda data, tmp: {'output_dir': os.path.join(tmp, 'plots'), 'workers': 1},
+    'plot_water_level_timeseries': lambda data, tmp: {'save_path': os.path.join(tmp, 'timeseries.png')},
+    'plot_flood_events_distribution': lambda data, tmp: {'save_path': os.path.join(tmp, 'flood_events.png')},
+    'plot_correlation_heatmap': lambda data, tmp: {'save_path': os.path.join(tmp, 'correlation.png')},
+    'plot_river_comparison': lambda data, tmp: {'save_path': os.path.join(tmp, 'river_comparison.png')},
+    'plot_temporal_patterns': lambda data, tmp: {'save_path': os.path.join(tmp, 'temporal.png')}
+}
+
+def public_methods(cls):
+    """Public methods defined on the class itself, in source order"""
+    methods = [(name, func) for name, func in vars(cls).items()
+               if inspect.isfunction(func) and not name.startswith('_')]
+    return sorted(methods, key=lambda item: item[1].__code__.co_firstlineno)
+
+def make_instance(key, data):
+    dataset = FloodDataset(data)
+    if key == 'visualizer':
+        return FloodDataVisualizer(dataset, headless=True)
+    return CLASSES[key](dataset)
+
+def archive_shape(rows):
+    """(rivers, days) of an hourly archive close to `rows` readings"""
+    days = int(min(365, max(30, rows // (24 * 7))))
+    return max(1, round(rows / (24 * days))), days
+
+def measure(key, name, data, tmp, repeat):
+    kwargs = METHOD_ARGS.get(name, lambda data, tmp: {})(data, tmp)
+    seconds = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            instance = make_instance(key, data)
+            start = time.perf_counter()
+            getattr(instance, name)(**kwargs)
+            seconds.append(time.perf_counter() - start)
+
+        instance = make_instance(key, data)
+        tracemalloc.start()
+        getattr(instance, name)(**kwargs)
+        # A method that stops the tracer itself leaves no peak
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+    return {'seconds': round(min(seconds), 4), 'peak_mb': None if peak is None else round(peak / 2**20, 2)}
+
+def run(rows_list, classes, methods, repeat):
+    results = {}
+    for rows in rows_list:
+        rivers, days = archive_shape(rows)
+        data = generate_flood_data(n_rivers=rivers, days=days)
+        print(f"\n{len(data):,} rows ({rivers} rivers x {days} days)")
+        size = results.setdefault(str(rows), {'rows': len(data), 'rivers': rivers, 'days': days, 'methods': {}})
+        with tempfile.TemporaryDirectory() as tmp:
+            for key in classes:
+                for name, _ in public_methods(CLASSES[key]):
+                    if methods and name not in methods:
+                        continue
+                    label = f'{CLASSES[key].__name__}.{name}'
+                    size['methods'][label] = measure(key, name, data, tmp, repeat)
+                    stats = size['methods'][label]
+                    peak = '-' if stats['peak_mb'] is None else f"{stats['peak_mb']:.1f}"
+                    print(f"  {label:<55} {stats['seconds']:>9.4f} s {peak:>9} MB")
+        del data
+    return results
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Regressions: methods slower (or with a larger peak) than tolerance x baseline"""
+    regressions = []
+    for rows, size in results.items():
+        reference = baseline['results'].get(rows, {}).get('methods', {})
+        for label, stats in size['methods'].items():
+            if label not in reference:
+                continue
+            old = reference[label]
+            if stats['seconds'] > max(old['seconds'] * tolerance, old['seconds'] + min_seconds):
+                regressions.append(f"{rows} rows {label}: {old['seconds']:.4f} s -> {stats['seconds']:.4f} s")
+            if stats['peak_mb'] is None or old['peak_mb'] is None:
+                continue
+            if stats['peak_mb'] > max(old['peak_mb'] * tolerance, old['peak_mb'] + 1.0):
+                regressions.append(f"{rows} rows {label}: {old['peak_mb']:.1f} MB -> {stats['peak_mb']:.1f} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sampler, analyzer and visualizer methods')
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e4, 1e5, 1e6])
+    parser.add_argument('--classes', nargs='+', choices=list(CLASSES), default=list(CLASSES))
+    parser.add_argument('--methods', nargs='+', help='only these method names')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed slowdown factor')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='ignore slowdowns below this')
+    args = parser.parse_args()
+
+    report = {
+        'machine': machine_info(),
+        'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'repeat': args.repeat,
+        'results': run([int(rows) for rows in args.rows], args.classes, args.methods, args.repeat)
+    }
+
+    paths = [args.output] if args.output else []
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        paths.append(os.path.join(BASELINE_DIR, f'{args.save_baseline}.json'))
+    for path in paths:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved: {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        if baseline['machine'] != report['machine']:
+            print(f"\nWarning: baseline '{args.compare}' was recorded on a different machine")
+        regressions = compare(report['results'], baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against '{args.compare}':")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against '{args.compare}' (tolerance {args.tolerance}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
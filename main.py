@@ -1,57 +1,55 @@
+"""IoT Flood Monitoring Banyuwangi pipeline.
+
+Commands (heavy libraries are only imported by the commands that use them):
+    run      full batch pipeline (default when no command is given)
+    ingest   rows appended to the raw CSV since the last run
+    sample   sampling stage
+    analyze  quality, analysis, alert and forecast stages
+    plot     plot stage
+    status   latest river status, ingest progress and stage cache (stdlib only)
+
+Usage: python main.py [run|ingest|sample|analyze|plot|status] [options]
+"""
 import os
 import sys
+import argparse
+import json
+import time
 import traceback
-from pathlib import Path
-import pandas as pd
-
-# Add the parent directory to Python path
-current_dir = Path(__file__).parent
-sys.path.append(str(current_dir))
-sys.path.append(str(current_dir / 'src'))
-sys.path.append(str(current_dir / 'utils'))
-
-# Import dengan error handling yang lebih baik
-try:
-    from src.data_sampler import FloodDataSampler
-    from src.data_analyzer import FloodDataAnalyzer
-    from src.data_visualizer import FloodDataVisualizer
-    from utils.helpers import create_directories
-    print(" All imports successful")
-except ImportError as e:
-    print(f" Import error: {e}")
-    print(" Trying alternative import method...")
-    
-    # Coba import langsung
-    try:
-        from data_sampler import FloodDataSampler
-        from data_analyzer import FloodDataAnalyzer
-        from data_visualizer import FloodDataVisualizer
-        from helpers import create_directories
-        print(" Alternative imports successful")
-    except ImportError as e2:
-        print(f" Alternative import also failed: {e2}")
-        print(" Current directory structure:")
-        for root, dirs, files in os.walk('.'):
-            level = root.replace('.', '').count(os.sep)
-            indent = ' ' * 2 * level
-            print(f'{indent}{os.path.basename(root)}/')
-            subindent = ' ' * 2 * (level + 1)
-            for file in files:
-                if file.endswith('.py'):
-                    print(f'{subindent}{file}')
-        sys.exit(1)
-
-def load_existing_data(csv_file_path):
+
+from src.instrumentation import METRICS, instrumented
+from utils.config import (CACHE_CONFIG, PARALLEL_CONFIG, PIPELINE_CONFIG, DATASET_CONFIG, QC_CONFIG,
+                          SAMPLING_CONFIG, GRID_CONFIG, STATS_CONFIG, CORRELATION_CONFIG,
+                          ALERT_CONFIG, FORECAST_CONFIG, VISUALIZATION_CONFIG, SNAPSHOT_CONFIG,
+                          HYDRAULICS_CONFIG, INSTRUMENTATION_CONFIG, FILE_PATHS)
+
+DEFAULT_CSV = FILE_PATHS['raw_data']
+
+# Stages run by each pipeline command (None: every cached stage)
+COMMAND_STAGES = {
+    'run': None,
+    'sample': ['samples'],
+    'analyze': ['quality', 'analysis', 'alerts', 'forecast'],
+    'plot': ['plots']
+}
+
+@instrumented
+def load_existing_data(csv_file_path, use_cache=True):
     """Load existing CSV data dengan handling error"""
     try:
         print(f" Loading data from: {csv_file_path}")
         
-        # Load data
-        main_data = pd.read_csv(csv_file_path)
-        
-        # Convert timestamp to datetime
-        if 'timestamp' in main_data.columns:
-            main_data['timestamp'] = pd.to_datetime(main_data['timestamp'])
+        if use_cache:
+            # Typed columnar cache, rebuilt only when the CSV changes
+            from src.data_cache import FloodDataCache
+            main_data = FloodDataCache(csv_file_path).load()
+        else:
+            import pandas as pd
+            main_data = pd.read_csv(csv_file_path)
+            
+            # Convert timestamp to datetime
+            if 'timestamp' in main_data.columns:
+                main_data['timestamp'] = pd.to_datetime(main_data['timestamp'])
         
         print(f" Data loaded successfully!")
         print(f"    Records: {len(main_data):,}")
@@ -73,54 +71,260 @@ def load_existing_data(csv_file_path):
         print(f" Error loading data: {e}")
         return None
 
-def main():
+def summarize_new_rows(chunk):
+    """Incremental consumer: ringkasan pembacaan baru per batch"""
+    flood_rows = int((chunk['flood_status'] == 'BANJIR').sum()) if 'flood_status' in chunk.columns else 0
+    print(f"    Batch: {len(chunk):,} records, {chunk['river_name'].nunique()} rivers, "
+          f"{flood_rows:,} flood readings, up to {chunk['timestamp'].max()}")
+
+def run_incremental(csv_file_path, consumers=None):
+    """Ingest only rows appended since the previous run"""
+    from src.data_ingestor import FloodDataIngestor
+    from src.data_exporter import FloodSnapshotExporter
+    from src.forecaster import forecast_model_path, update_persisted_forecast
+    from src.partition_store import PartitionedFloodStore
+    from src.stream_stats import stats_state_path, update_persisted_stats
+    
+    print(f" Incremental ingestion from: {csv_file_path}")
+    ingestor = FloodDataIngestor(csv_file_path)
+    if consumers is None:
+        # Ringkasan batch + status terbaru untuk dashboard + statistik streaming + model prakiraan
+        stats_path = stats_state_path(csv_file_path)
+        model_path = forecast_model_path(csv_file_path)
+        consumers = [summarize_new_rows, FloodSnapshotExporter().update_latest,
+                     lambda chunk: update_persisted_stats(chunk, stats_path, csv_file_path),
+                     lambda chunk: update_persisted_forecast(chunk, model_path, csv_file_path)]
+    for consumer in consumers:
+        ingestor.add_consumer(consumer)
+    with METRICS.span('ingest.incremental'):
+        ingestor.run()
+    # Store partisi sungai/bulan mengikuti CSV dengan offset-nya sendiri
+    with METRICS.span('ingest.store_sync'):
+        PartitionedFloodStore().sync(csv_file_path)
+    return 0
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Tanpa perintah (atau hanya opsi) = pipeline lengkap, seperti sebelumnya
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h', '--help'):
+        argv = ['run'] + argv
+    
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--csv', default=DEFAULT_CSV, help='path to the raw sensor CSV')
+    common.add_argument('--metrics', default=INSTRUMENTATION_CONFIG['metrics_path'],
+                        help='stage metrics file: .prom (Prometheus text) or .json')
+    common.add_argument('--profile', metavar='STAGE', default=None,
+                        help='capture one stage with a profiler, e.g. stage.analysis '
+                             'or FloodDataAnalyzer.basic_statistics')
+    common.add_argument('--profiler', choices=['cprofile', 'pyinstrument'],
+                        default=INSTRUMENTATION_CONFIG['profiler'])
+    
+    pipeline = argparse.ArgumentParser(add_help=False, parents=[common])
+    pipeline.add_argument('--no-cache', action='store_true',
+                          help='parse the raw CSV directly instead of using the columnar cache')
+    pipeline.add_argument('--executor', choices=['serial', 'thread', 'process'],
+                          default=PARALLEL_CONFIG['executor'],
+                          help='backend for per-river work')
+    pipeline.add_argument('--workers', type=int, default=PARALLEL_CONFIG['workers'],
+                          help='number of per-river workers (default: CPU count)')
+    pipeline.add_argument('--stage-workers', type=int, default=PIPELINE_CONFIG['stage_workers'],
+                          help='independent pipeline stages run concurrently')
+    pipeline.add_argument('--force', action='store_true',
+                          help='ignore the stage cache and rerun the stages')
+    
+    parser = argparse.ArgumentParser(description='IoT Flood Monitoring Banyuwangi Pipeline')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    run = commands.add_parser('run', parents=[pipeline], help='full batch pipeline (default)')
+    run.add_argument('--stages', nargs='+', default=None,
+                     help='run only these stages (and what they depend on)')
+    run.add_argument('--incremental', action='store_true',
+                     help='same as the ingest command')
+    commands.add_parser('ingest', parents=[common],
+                        help='process only rows appended to the raw CSV since the last run')
+    commands.add_parser('sample', parents=[pipeline], help='sampling stage')
+    commands.add_parser('analyze', parents=[pipeline], help='quality, analysis, alert and forecast stages')
+    commands.add_parser('plot', parents=[pipeline], help='plot stage')
+    status = commands.add_parser('status', help='latest river status, ingest progress and stage cache')
+    status.add_argument('--csv', default=DEFAULT_CSV, help='path to the raw sensor CSV')
+    status.add_argument('--json', action='store_true', help='print the status as JSON')
+    
+    args = parser.parse_args(argv)
+    if args.command == 'run' and args.incremental:
+        args.command = 'ingest'
+    if args.command in COMMAND_STAGES:
+        args.stages = getattr(args, 'stages', None) or COMMAND_STAGES[args.command]
+    return args
+
+def _read_json(path):
     try:
-        print(" Starting IoT Flood Monitoring Banyuwangi Pipeline...")
-        print("=" * 60)
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def collect_status(csv_file_path):
+    """Status terbaru dari file JSON yang sudah ada (tanpa pandas)"""
+    status = {'csv': csv_file_path}
+    
+    latest = _read_json(os.path.join(SNAPSHOT_CONFIG['output_dir'], 'latest.json'))
+    if latest is not None:
+        status['rivers'] = latest.get('rivers', {})
+    
+    state = _read_json(FILE_PATHS['ingest_state'])
+    if state is not None:
+        ingest = {key: state.get(key) for key in ['source', 'rows_ingested', 'last_timestamp']}
+        if state.get('source') == os.path.abspath(csv_file_path) and os.path.exists(csv_file_path):
+            ingest['pending_bytes'] = max(os.path.getsize(csv_file_path) - state.get('offset', 0), 0)
+        status['ingest'] = ingest
+    
+    manifest = _read_json(os.path.join(FILE_PATHS['pipeline_cache_dir'], 'manifest.json'))
+    if manifest is not None:
+        status['stages'] = {}
+        for name, key in sorted(manifest.items()):
+            result_path = os.path.join(FILE_PATHS['pipeline_cache_dir'], f'{name}.pkl')
+            modified = (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getmtime(result_path)))
+                        if os.path.exists(result_path) else None)
+            status['stages'][name] = {'key': key, 'modified': modified}
+    return status
+
+def run_status(args):
+    """Perintah status: hanya membaca JSON, tidak memuat dataset"""
+    status = collect_status(args.csv)
+    if args.json:
+        print(json.dumps(status, indent=2))
+        return 0 if len(status) > 1 else 1
+    if len(status) == 1:
+        print(" No pipeline outputs found yet (run: python main.py)")
+        return 1
+    
+    if 'rivers' in status:
+        print(f" Latest readings ({len(status['rivers'])} rivers):")
+        for river, reading in status['rivers'].items():
+            print(f"    {river:<20} {reading.get('water_height_cm', float('nan')):>7.1f} cm  "
+                  f"{reading.get('status', '-'):<8} {reading.get('timestamp', '-')}")
+    if 'ingest' in status:
+        ingest = status['ingest']
+        print(f" Ingested: {ingest['rows_ingested'] or 0:,} rows up to {ingest['last_timestamp']}")
+        if 'pending_bytes' in ingest:
+            print(f"    Pending: {ingest['pending_bytes']:,} bytes not ingested yet")
+        else:
+            print(f"    Source: {ingest['source']}")
+    if 'stages' in status:
+        print(f" Cached stages ({FILE_PATHS['pipeline_cache_dir']}):")
+        for name, stage in status['stages'].items():
+            print(f"    [{name}] {stage['key']}  {stage['modified'] or 'result missing'}")
+    return 0
+
+def write_metrics(args):
+    """Stage metrics (and the profile, if one was captured) of this run"""
+    path = METRICS.write(args.metrics)
+    if path is None:
+        print(f" Stage metrics: no stage ran, {args.metrics} left unchanged")
+    else:
+        print(f" Stage metrics: {path} ({len(METRICS.totals)} stages this run, added to its totals)")
+    for stage, profile_path in METRICS.profiles.items():
+        print(f" Profile of {stage}: {profile_path}")
+    if args.profile and args.profile not in METRICS.profiles:
+        print(f" Profile: stage '{args.profile}' did not run (cached? rerun with --force)")
+
+def find_csv_file(csv_file_path):
+    """CSV sumber, atau CSV pertama di folder data jika tidak ditemukan"""
+    if os.path.exists(csv_file_path):
+        return csv_file_path
+    
+    print(f" CSV file not found: {csv_file_path}")
+    print(" Please provide the path to your existing CSV file")
+    
+    # Try to find any CSV file in data directory
+    data_files = []
+    for root, dirs, files in os.walk('data'):
+        for file in files:
+            if file.endswith('.csv'):
+                data_files.append(os.path.join(root, file))
+    
+    if not data_files:
+        print(" No CSV files found in data directory")
+        return None
+    
+    print(" Found these CSV files:")
+    for i, file_path in enumerate(data_files, 1):
+        print(f"   {i}. {file_path}")
+    
+    # Use the first found CSV file
+    # For multiple files, you could implement selection logic here
+    print(f" Using: {data_files[0]}" if len(data_files) == 1 else f" Using first file: {data_files[0]}")
+    return data_files[0]
+
+def build_pipeline(args, csv_file_path):
+    """Stage graph of the batch pipeline (see src/pipeline.py)"""
+    # Modul berat (pandas, matplotlib) diimpor di dalam tahap yang memakainya
+    from src.pipeline import PipelineDAG
+    
+    dag = PipelineDAG(workers=args.stage_workers)
+    quality_path = os.path.join('outputs/reports/', 'data_quality.csv')
+    flow_path = os.path.join('outputs/reports/', 'flow_validation.csv')
+    holdout_path = os.path.join('outputs/reports/', 'flow_holdout.csv')
+    alerts_path = os.path.join('outputs/reports/', 'alerts.csv')
+    forecast_path = os.path.join('outputs/reports/', 'forecast.csv')
+    plots_dir = 'outputs/plots/'
+    sample_names = ['systematic', 'stratified', 'random', 'temporal_daily', 'flood_events']
+    
+    @dag.stage('dataset', cache=False)
+    def load_dataset(inputs):
+        from src.flood_dataset import FloodDataset
+        from src.river_executor import RiverExecutor
+        from utils.helpers import detect_flood_episodes
         
-        # 1. Create directory structure
-        print(" Creating directory structure...")
-        create_directories()
+        main_data = load_existing_data(csv_file_path, use_cache=CACHE_CONFIG['enabled'] and not args.no_cache)
+        if main_data is None:
+            raise RuntimeError(f"could not load {csv_file_path}")
+        # Satu dataset bersama (tanpa copy) dan flood episodes dihitung sekali
+        # untuk sampler, analyzer, visualizer
+        dataset = FloodDataset(main_data)
+        flood_episodes = detect_flood_episodes(main_data)
+        executor = RiverExecutor(dataset, backend=args.executor, workers=args.workers)
+        print(f"    Flood episodes: {len(flood_episodes):,}")
+        return {'data': main_data, 'dataset': dataset, 'episodes': flood_episodes, 'executor': executor}
+    
+    @dag.stage('quality', deps=['dataset'], config=[QC_CONFIG, DATASET_CONFIG, HYDRAULICS_CONFIG],
+               outputs=[quality_path, flow_path, holdout_path])
+    def quality_stage(inputs):
+        from src.hydraulics import validate_flow, holdout_validation
+        from src.quality_check import quality_summary
         
-        # 2. Load existing dataset
-        csv_file_path = 'data/raw/iot_floodmonitor_banyuwangi_hydrological_2024_v1.0.csv'
+        # Quality check sebelum analisis: bitmask qc_flags per pembacaan
+        dataset = inputs['dataset']['dataset']
+        qc_start = time.perf_counter()
+        qc_flags = dataset.derived('qc_flags')
+        qc_seconds = time.perf_counter() - qc_start
+        os.makedirs(os.path.dirname(quality_path), exist_ok=True)
+        quality_summary(dataset, qc_flags).to_csv(quality_path)
+        print(f"    Quality check: {int((qc_flags != 0).sum()):,} flagged readings "
+              f"in {qc_seconds * 1000:.0f} ms -> {quality_path}")
         
-        # Check if file exists
-        if not os.path.exists(csv_file_path):
-            print(f" CSV file not found: {csv_file_path}")
-            print(" Please provide the path to your existing CSV file")
-            
-            # Try to find any CSV file in data directory
-            data_files = []
-            for root, dirs, files in os.walk('data'):
-                for file in files:
-                    if file.endswith('.csv'):
-                        data_files.append(os.path.join(root, file))
-            
-            if data_files:
-                print(" Found these CSV files:")
-                for i, file_path in enumerate(data_files, 1):
-                    print(f"   {i}. {file_path}")
-                
-                # Use the first found CSV file
-                if len(data_files) == 1:
-                    csv_file_path = data_files[0]
-                    print(f" Using: {csv_file_path}")
-                else:
-                    # For multiple files, you could implement selection logic here
-                    csv_file_path = data_files[0]
-                    print(f" Using first file: {csv_file_path}")
-            else:
-                print(" No CSV files found in data directory")
-                return 1
+        # Debit tersimpan vs Manning per sungai (geometri dari HYDRAULICS_CONFIG)
+        flow_check = validate_flow(dataset)
+        flow_check.to_csv(flow_path)
+        print(f"    Flow check: {int(flow_check['mismatched'].sum()):,} of {int(flow_check['checked'].sum()):,} "
+              f"stored flows off the Manning curve -> {flow_path}")
         
-        main_data = load_existing_data(csv_file_path)
-        if main_data is None:
-            return 1
+        # Kalibrasi slope pada periode awal, diuji pada periode akhir yang tidak ikut kalibrasi
+        holdout = holdout_validation(dataset)
+        holdout.to_csv(holdout_path)
+        print(f"    Flow holdout (from {holdout.attrs['split']:%Y-%m-%d}): {int(holdout['mismatched'].sum()):,} "
+              f"of {int(holdout['checked'].sum()):,} off with slopes calibrated before it -> {holdout_path}")
+        return {'flagged': int((qc_flags != 0).sum()), 'flow_mismatched': int(flow_check['mismatched'].sum())}
+    
+    @dag.stage('samples', deps=['dataset'], config=[SAMPLING_CONFIG, GRID_CONFIG],
+               outputs=[f"data/samples/sampling_{name}.csv" for name in sample_names])
+    def samples_stage(inputs):
+        from src.data_sampler import FloodDataSampler
         
-        # 3. Data Sampling
-        print("\n Performing data sampling...")
-        sampler = FloodDataSampler(main_data)
+        # Data sudah di memori: sampel per sungai dari index, tanpa partition store
+        # (store di-sync oleh perintah ingest, untuk sampling tanpa memuat arsip)
+        loaded = inputs['dataset']
+        sampler = FloodDataSampler(loaded['dataset'], episodes=loaded['episodes'],
+                                   executor=loaded['executor'])
         
         # Generate individual samples
         samples_info = {
@@ -131,34 +335,45 @@ def main():
             'flood_events': sampler.flood_event_sampling()
         }
         
-        # Save samples
-        samples_created = 0
+        # Save samples (kosong = hanya header, agar output tahap selalu ada)
+        record_counts = {}
         for sample_name, sample_data in samples_info.items():
-            if not sample_data.empty:
-                filename = f"data/samples/sampling_{sample_name}.csv"
-                sample_data.to_csv(filename, index=False)
-                samples_created += 1
-                print(f"    {sample_name}: {len(sample_data):,} records") 
-        
-        # River-specific samples
-        print("\n Generating river-specific samples...")
-        river_samples_created = 0
-        if 'river_name' in main_data.columns:
-            for river in main_data['river_name'].unique():
-                river_sample = sampler.river_specific_sampling(river)
-                if not river_sample.empty:
-                    # Clean river name for filename
-                    clean_river_name = river.replace(' ', '_').replace('-', '_')
-                    river_filename = f"data/samples/sampling_river_{clean_river_name}.csv"
-                    river_sample.to_csv(river_filename, index=False)
-                    river_samples_created += 1
-                    print(f"    {river}: {len(river_sample):,} records")
+            if sample_data.empty and sample_data.columns.empty:
+                sample_data = loaded['data'].iloc[:0]
+            sample_data.to_csv(f"data/samples/sampling_{sample_name}.csv", index=False)
+            record_counts[sample_name] = len(sample_data)
+            print(f"    {sample_name}: {len(sample_data):,} records")
+        
+        # River-specific samples: partisi per sungai sekali, ditulis paralel sesuai executor
+        if 'river_name' in loaded['data'].columns:
+            for river, n_records in sampler.save_river_samples('data/samples/').items():
+                if n_records:
+                    record_counts[f'river_{river}'] = n_records
+                    print(f"    {river}: {n_records:,} records")
         else:
             print("    No 'river_name' column found for river-specific sampling")
+        return record_counts
+    
+    @dag.stage('comoments', deps=['dataset'], config=[CORRELATION_CONFIG])
+    def comoments_stage(inputs):
+        from src.data_analyzer import FloodDataAnalyzer
+        
+        # Co-moment sums sekali (per sungai lewat executor) untuk analysis dan plots
+        loaded = inputs['dataset']
+        comoments = FloodDataAnalyzer(loaded['dataset'], executor=loaded['executor']).get_comoments()
+        print(f"    Co-moments: {len(comoments.columns)} variables, {len(comoments.groups)} rivers")
+        return comoments
+    
+    @dag.stage('analysis', deps=['dataset', 'comoments'],
+               config=[DATASET_CONFIG, STATS_CONFIG, CORRELATION_CONFIG, QC_CONFIG])
+    def analysis_stage(inputs):
+        from src.data_analyzer import FloodDataAnalyzer
+        from src.stream_stats import stats_state_path
         
-        # 4. Data Analysis
-        print("\n Analyzing data...")
-        analyzer = FloodDataAnalyzer(main_data)
+        loaded = inputs['dataset']
+        analyzer = FloodDataAnalyzer(loaded['dataset'], episodes=loaded['episodes'], executor=loaded['executor'],
+                                     stats_path=stats_state_path(csv_file_path), stats_source=csv_file_path,
+                                     comoments=inputs['comoments'])
         analysis_results = analyzer.generate_comprehensive_report()
         
         # Print some key insights
@@ -169,43 +384,145 @@ def main():
         if 'basic_stats' in analysis_results:
             water_stats = analysis_results['basic_stats'].get('water_level_cm', {})
             print(f"    Average water level: {water_stats.get('mean', 0):.1f} cm")
+        return analysis_results
+    
+    @dag.stage('alerts', deps=['dataset'], config=[ALERT_CONFIG, DATASET_CONFIG], outputs=[alerts_path])
+    def alerts_stage(inputs):
+        from src.alert_engine import AlertEngine
+        
+        # Early-warning rules over the full history (same engine as the live server)
+        alert_engine = AlertEngine()
+        alerts = alert_engine.process(inputs['dataset']['data'])
+        os.makedirs(os.path.dirname(alerts_path), exist_ok=True)
+        alerts.to_csv(alerts_path, index=False)
+        print(f"    Early-warning alerts: {len(alerts):,} raised "
+              f"({alert_engine.metrics().get('latency_ms_max', 0):.1f} ms), "
+              f"{len(alert_engine.active_alerts())} still active -> {alerts_path}")
+        return {'alerts': len(alerts), 'active': len(alert_engine.active_alerts())}
+    
+    @dag.stage('forecast', deps=['dataset'], config=[FORECAST_CONFIG, DATASET_CONFIG], outputs=[forecast_path])
+    def forecast_stage(inputs):
+        from src.forecaster import WaterLevelForecaster, forecast_model_path
+        
+        # Prakiraan tinggi air 1-6 jam (model di-cache, hanya baris baru yang ditambahkan;
+        # CSV yang ditulis ulang atau baris terlambat = fit ulang dari awal)
+        model_path = forecast_model_path(csv_file_path)
+        forecaster = WaterLevelForecaster.load(model_path, source_path=csv_file_path)
+        forecaster = forecaster.sync(inputs['dataset']['data'])
+        forecaster.save(model_path, csv_file_path)
+        if forecaster.refit_reason:
+            print(f"    Forecast model: refit from scratch ({forecaster.refit_reason})")
+        forecast_start = time.perf_counter()
+        forecast = forecaster.predict()
+        forecast_ms = (time.perf_counter() - forecast_start) * 1000
+        os.makedirs(os.path.dirname(forecast_path), exist_ok=True)
+        forecast.to_csv(forecast_path, index=False)
+        print(f"    Forecast: {forecaster.horizon}h ahead for {len(forecaster.rivers)} rivers "
+              f"in {forecast_ms:.1f} ms -> {forecast_path}")
+        if len(forecast):
+            peak = forecast.loc[forecast['forecast_cm'].idxmax()]
+            print(f"    Highest forecast: {peak['river_name']} {peak['forecast_cm']:.1f} cm "
+                  f"at {peak['target_time']}")
+        return {'model_path': model_path, 'rivers': len(forecaster.rivers), 'refit': forecaster.refit_reason}
+    
+    @dag.stage('plots', deps=['dataset', 'comoments'], config=[VISUALIZATION_CONFIG, DATASET_CONFIG, CORRELATION_CONFIG],
+               outputs=[os.path.join(plots_dir, f'{name}.png') for name in VISUALIZATION_CONFIG['plots']])
+    def plots_stage(inputs):
+        from src.data_visualizer import FloodDataVisualizer
         
-        # 5. Data Visualization
-        print("\n Generating visualizations...")
-        visualizer = FloodDataVisualizer(main_data)
-        
-        # Create plots directory
-        plots_dir = 'outputs/plots/'
-        os.makedirs(plots_dir, exist_ok=True)
-        
-        # Generate plots dengan error handling
-        plots_to_create = [
-            ('water_level_timeseries', visualizer.plot_water_level_timeseries),
-            ('flood_events_distribution', visualizer.plot_flood_events_distribution),
-            ('correlation_heatmap', visualizer.plot_correlation_heatmap),
-            ('river_comparison', visualizer.plot_river_comparison),
-            ('temporal_patterns', visualizer.plot_temporal_patterns)
-        ]
-        
-        plots_created = 0
-        for plot_name, plot_function in plots_to_create:
-            try:
-                result = plot_function(save_path=f"{plots_dir}{plot_name}.png")
-                if result is not None:  # Only count if plot was actually created
-                    plots_created += 1
-                    print(f"    {plot_name}.png")
-                else:
-                    print(f"    {plot_name}: Plot function returned None")
-            except Exception as e:
-                print(f"    {plot_name}: {str(e)[:100]}...")
+        loaded = inputs['dataset']
+        visualizer = FloodDataVisualizer(loaded['dataset'], episodes=loaded['episodes'], headless=True,
+                                         comoments=inputs['comoments'])
+        
+        # Headless batch render: plots in parallel worker processes (Agg backend)
+        render_report = visualizer.render_all(plots_dir, workers=args.workers)
+        for report in render_report:
+            if report['path']:
+                traced = '' if report['peak_memory_mb'] is None else f"peak {report['peak_memory_mb']:.1f} MB, "
+                print(f"    {os.path.basename(report['path'])} "
+                      f"({report['seconds']:.2f}s, {traced}worker RSS {report['peak_rss_mb']} MB)")
+            elif report['error']:
+                print(f"    {report['plot']}: {report['error'][:100]}...")
+            else:
+                print(f"    {report['plot']}: Plot function returned None")
+        return render_report
+    
+    @dag.stage('snapshots', deps=['dataset'], config=[SNAPSHOT_CONFIG, DATASET_CONFIG],
+               outputs=[os.path.join(SNAPSHOT_CONFIG['output_dir'], 'manifest.json')])
+    def snapshots_stage(inputs):
+        from src.data_exporter import FloodSnapshotExporter
+        
+        # Dashboard snapshots (hanya file yang berubah ditulis ulang)
+        loaded = inputs['dataset']
+        snapshot_exporter = FloodSnapshotExporter(loaded['dataset'], episodes=loaded['episodes'])
+        return {'output_dir': snapshot_exporter.output_dir, 'changed': snapshot_exporter.export_all()}
+    
+    return dag
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'status':
+        return run_status(args)
+    
+    from utils.helpers import create_directories
+    
+    METRICS.profile_stage = args.profile
+    METRICS.profiler = args.profiler
+    if args.command == 'ingest':
+        try:
+            create_directories()
+            exit_code = run_incremental(args.csv)
+            write_metrics(args)
+            return exit_code
+        except Exception as e:
+            print(f" Incremental ingestion failed: {e}")
+            traceback.print_exc()
+            return 1
+    
+    try:
+        print(" Starting IoT Flood Monitoring Banyuwangi Pipeline...")
+        print("=" * 60)
+        
+        # 1. Create directory structure
+        print(" Creating directory structure...")
+        create_directories()
+        
+        # 2. Stage graph: dataset -> quality, samples, analysis, alerts, forecast, plots, snapshots.
+        # Tahap yang input (hash CSV) dan config-nya tidak berubah dilewati
+        csv_file_path = find_csv_file(args.csv)
+        if csv_file_path is None:
+            return 1
+        dag = build_pipeline(args, csv_file_path)
+        input_key = dag.fingerprint(csv_file_path)
+        print(f"\n Running pipeline stages (input {input_key}, {dag.workers} concurrent)...")
+        results = dag.run(input_key, targets=args.stages, force=args.force)
+        for stage in dag.report:
+            timing = f"{stage['seconds']:.2f}s" if stage['status'] == 'ran' else 'unchanged, skipped'
+            print(f"    [{stage['stage']}] {timing}")
+        write_metrics(args)
         
         print(f"\n Pipeline completed successfully!")
         print("=" * 60)
         print(" Generated Files Summary:")
         print(f"   Source data: {csv_file_path}")
-        print(f"   Samples: data/samples/ ({samples_created + river_samples_created} files)")
-        print(f"   Visualizations: outputs/plots/ ({plots_created}/5 plots)")
-        print(f"   Analysis: Comprehensive report generated in memory")
+        if 'samples' in results:
+            print(f"   Samples: data/samples/ ({len(results['samples'])} files)")
+        if 'plots' in results:
+            plots_created = sum(1 for report in results['plots'] if report['path'])
+            print(f"   Visualizations: outputs/plots/ ({plots_created}/{len(results['plots'])} plots)")
+        if 'snapshots' in results:
+            # Hasil tahap yang dilewati berasal dari run sebelumnya: tidak ada file yang ditulis
+            ran = {stage['stage'] for stage in dag.report if stage['status'] == 'ran'}
+            updated = f"{len(results['snapshots']['changed'])} updated" if 'snapshots' in ran else 'cached, 0 updated'
+            print(f"   Dashboard snapshots: {results['snapshots']['output_dir']} ({updated})")
+        if 'quality' in results:
+            print(f"   Data quality: outputs/reports/data_quality.csv ({results['quality']['flagged']:,} flagged)")
+        if 'alerts' in results:
+            print(f"   Alerts: outputs/reports/alerts.csv ({results['alerts']['alerts']:,} alerts)")
+        if 'forecast' in results:
+            print(f"   Forecast: outputs/reports/forecast.csv (model cache {results['forecast']['model_path']})")
+        if 'analysis' in results:
+            print(f"   Analysis: Comprehensive report cached in {dag.cache_dir}")
         
         return 0
         
@@ -217,4 +534,4 @@ def main():
 
 if __name__ == "__main__":
     exit_code = main()
-    sys.exit(exit_code)
\ No newline at end of file
+    sys.exit(exit_code)
@@ -0,0 +1 @@
+"""Flood monitoring pipeline: ingestion, storage, analysis, sampling and plots."""
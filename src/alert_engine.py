@@ -0,0 +1,228 @@
+"""Vectorized early-warning rule engine.
+
+Readings are placed on the regular sampling grid (one slot per
+`sampling_interval_hours`) as a rivers x slots matrix per column. Every rule
+of ALERT_CONFIG is then a rolling-window operation over that matrix, for
+all rivers at once:
+
+    rise   value now minus value `window` slots ago
+    sum    accumulation over the window (e.g. rainfall)
+    min    lowest value over the window (sustained above a level)
+    value  latest reading
+
+An alert switches on at metric >= on and only clears below off
+(hysteresis); a new activation within `cooldown_hours` of the previous
+clear is not announced again (de-duplication). The engine carries the
+active state and the last `depth` slots per river between batches, so a
+live ingest batch only evaluates its own new slots.
+
+Readings outside a sane time window are rejected before they reach the
+grid: more than `max_future_hours` ahead of the wall clock, or more than
+`max_age_days` behind the newest accepted slot. A clock-reset timestamp
+would otherwise stretch the dense block over decades, and a far-future one
+would move a river's last slot ahead and turn every real reading into a
+late one.
+"""
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.config import ALERT_CONFIG, DATASET_CONFIG
+
+NO_SLOT = np.iinfo(np.int64).min // 2
+
+def _shifted(matrix, w):
+    """matrix[:, t - w] aligned at t (NaN where t < w)"""
+    shifted = np.full_like(matrix, np.nan)
+    shifted[:, w:] = matrix[:, :-w]
+    return shifted
+
+def window_metric(matrix, kind, w):
+    """Rolling metric over the last `w` slots, for every river and slot"""
+    if kind == 'value':
+        return matrix
+    if kind == 'rise':
+        return matrix - _shifted(matrix, w)
+    if kind == 'sum':
+        valid = ~np.isnan(matrix)
+        csum = np.cumsum(np.where(valid, matrix, 0.0), axis=1)
+        ccount = np.cumsum(valid, axis=1)
+        total = csum - np.nan_to_num(_shifted(csum, w))
+        count = ccount - np.nan_to_num(_shifted(ccount.astype(np.float64), w))
+        return np.where(count > 0, total, np.nan)
+    if kind == 'min':
+        metric = np.full_like(matrix, np.nan)
+        if matrix.shape[1] >= w:
+            windows = np.lib.stride_tricks.sliding_window_view(matrix, w, axis=1)
+            metric[:, w - 1:] = windows.min(axis=-1)  # NaN (gap) breaks "sustained"
+        return metric
+    raise ValueError(f"Unknown rule kind: {kind}")
+
+def _forward_fill(values, missing):
+    """Carry the last non-missing value along axis 1"""
+    positions = np.where(values != missing, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    return np.take_along_axis(values, positions, axis=1)
+
+class AlertEngine:
+    """Stateful per-river rule evaluation over ingest batches"""
+
+    def __init__(self, rules=None, interval_hours=None, cooldown_hours=None):
+        self.rules = rules or ALERT_CONFIG['rules']
+        interval = interval_hours or DATASET_CONFIG['sampling_interval_hours']
+        self.slot_ns = int(interval * 3600 * 10**9)
+        self.windows = [max(1, int(round(rule['window_hours'] / interval))) for rule in self.rules]
+        cooldown = ALERT_CONFIG['cooldown_hours'] if cooldown_hours is None else cooldown_hours
+        self.cooldown = int(round(cooldown / interval))
+        self.columns = sorted({rule['column'] for rule in self.rules})
+        self.depth = max(self.windows) + 1  # 'rise' compares t with t - w
+        self.max_future_ns = int(ALERT_CONFIG['max_future_hours'] * 3600 * 10**9)
+        self.max_age = int(round(ALERT_CONFIG['max_age_days'] * 24 / interval))
+        self.newest = NO_SLOT  # newest accepted slot over all rivers
+        self.rejected = 0
+
+        self.rivers = []
+        self._river_index = {}
+        self.history = {col: np.empty((0, self.depth)) for col in self.columns}
+        self.last_slot = np.empty(0, dtype=np.int64)
+        self.active = np.empty((0, len(self.rules)), dtype=bool)
+        self.last_clear = np.empty((0, len(self.rules)), dtype=np.int64)
+        self.latencies = deque(maxlen=ALERT_CONFIG['latency_window'])
+
+    def _river_rows(self, names):
+        new = [name for name in names if name not in self._river_index]
+        if new:
+            for name in new:
+                self._river_index[name] = len(self.rivers)
+                self.rivers.append(name)
+            n = len(new)
+            self.history = {col: np.vstack([values, np.full((n, self.depth), np.nan)])
+                            for col, values in self.history.items()}
+            self.last_slot = np.concatenate([self.last_slot, np.full(n, NO_SLOT)])
+            self.active = np.vstack([self.active, np.zeros((n, len(self.rules)), dtype=bool)])
+            self.last_clear = np.vstack([self.last_clear, np.full((n, len(self.rules)), NO_SLOT)])
+        return np.array([self._river_index[name] for name in names], dtype=np.int64)
+
+    def _in_window(self, slots):
+        """Slots not in the future (wall clock) and not far behind the newest accepted slot"""
+        ok = slots <= (time.time_ns() + self.max_future_ns) // self.slot_ns
+        newest = max(self.newest, int(slots[ok].max())) if ok.any() else self.newest
+        ok &= slots >= newest - self.max_age
+        self.rejected += int((~ok).sum())
+        return ok, newest
+
+    def process(self, batch):
+        """Evaluate all rules on the new slots of a batch; returns raised alerts"""
+        start = time.perf_counter()
+        alerts = self._process(batch)
+        self.latencies.append(time.perf_counter() - start)
+        return alerts
+
+    def _process(self, batch):
+        if batch.empty:
+            return self._alert_frame([], [], [], [])
+        slots = batch['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) // self.slot_ns
+        codes, names = pd.factorize(batch['river_name'].astype(str))
+        rows = self._river_rows(names.tolist())[codes]
+
+        # Readings outside the time window are rejected; late readings
+        # (at or before a river's evaluated slot) are ignored
+        in_window, self.newest = self._in_window(slots)
+        fresh = in_window & (slots > self.last_slot[rows])
+        if not fresh.any():
+            return self._alert_frame([], [], [], [])
+        order = np.argsort(slots[fresh], kind='stable')  # later readings win within a slot
+        rows, slots = rows[fresh][order], slots[fresh][order]
+        values = {col: batch[col].to_numpy(dtype=np.float64)[fresh][order] for col in self.columns}
+
+        touched, local = np.unique(rows, return_inverse=True)
+        first_new = np.full(len(touched), np.iinfo(np.int64).max)
+        last_new = np.full(len(touched), NO_SLOT)
+        np.minimum.at(first_new, local, slots)
+        np.maximum.at(last_new, local, slots)
+        prev_last = self.last_slot[touched]
+        known = prev_last != NO_SLOT
+        eval_start = np.where(known, np.maximum(prev_last + 1, first_new - self.depth + 1), first_new)
+
+        # Dense rivers x slots block: carried history + new readings
+        s0 = int(eval_start.min()) - self.depth + 1
+        n_slots = int(last_new.max()) - s0 + 1
+        slot_axis = s0 + np.arange(n_slots)
+        hist_cols = (prev_last - self.depth + 1)[:, None] + np.arange(self.depth) - s0
+        hist_ok = known[:, None] & (hist_cols >= 0)
+        hist_r, hist_c = np.nonzero(hist_ok)
+        matrix = {}
+        for col in self.columns:
+            block = np.full((len(touched), n_slots), np.nan)
+            block[hist_r, hist_cols[hist_r, hist_c]] = self.history[col][touched][hist_r, hist_c]
+            block[local, slots - s0] = values[col]
+            matrix[col] = block
+
+        evaluated = (slot_axis >= eval_start[:, None]) & (slot_axis <= last_new[:, None])
+        raised = [[], [], [], []]  # river rows, rule index, slot, metric
+        for j, (rule, w) in enumerate(zip(self.rules, self.windows)):
+            metric = window_metric(matrix[rule['column']], rule['kind'], w)
+            with np.errstate(invalid='ignore'):
+                events = np.where(evaluated & (metric >= rule['on']), 1,
+                                  np.where(evaluated & (metric < rule['off']), 0, -1))
+            # Hysteresis: the state is the last on/off event, starting from the carried state
+            state = _forward_fill(np.column_stack([self.active[touched, j].astype(np.int64), events]), -1)
+            rising = (state[:, 1:] == 1) & (state[:, :-1] == 0)
+            falling = (state[:, 1:] == 0) & (state[:, :-1] == 1)
+
+            clears = np.column_stack([self.last_clear[touched, j], np.where(falling, slot_axis, NO_SLOT)])
+            np.maximum.accumulate(clears, axis=1, out=clears)
+            announce = rising & (slot_axis - clears[:, :-1] >= self.cooldown)
+
+            r, c = np.nonzero(announce)
+            raised[0].append(touched[r])
+            raised[1].append(np.full(len(r), j))
+            raised[2].append(slot_axis[c])
+            raised[3].append(metric[r, c])
+
+            self.active[touched, j] = state[:, -1] == 1
+            self.last_clear[touched, j] = clears[:, -1]
+
+        # Carry the last `depth` slots of every touched river
+        keep_cols = (last_new - self.depth + 1 - s0)[:, None] + np.arange(self.depth)
+        for col in self.columns:
+            self.history[col][touched] = np.take_along_axis(matrix[col], keep_cols, axis=1)
+        self.last_slot[touched] = last_new
+        return self._alert_frame(*(np.concatenate(part) for part in raised))
+
+    def _alert_frame(self, river_rows, rule_index, slots, metric):
+        river_rows = np.asarray(river_rows, dtype=np.int64)
+        rule_index = np.asarray(rule_index, dtype=np.int64)
+        alerts = pd.DataFrame({
+            'timestamp': (np.asarray(slots, dtype=np.int64) * self.slot_ns).astype('datetime64[ns]'),
+            'river_name': np.array(self.rivers, dtype=object)[river_rows].astype(str),
+            'rule': np.array([rule['name'] for rule in self.rules])[rule_index],
+            'severity': np.array([rule['severity'] for rule in self.rules])[rule_index],
+            'value': np.round(np.asarray(metric, dtype=np.float64), 2)
+        })
+        return alerts.sort_values(['timestamp', 'river_name', 'rule'], kind='stable', ignore_index=True)
+
+    def active_alerts(self):
+        """Rules currently active per river"""
+        r, j = np.nonzero(self.active)
+        return pd.DataFrame({
+            'river_name': [self.rivers[i] for i in r],
+            'rule': [self.rules[i]['name'] for i in j],
+            'severity': [self.rules[i]['severity'] for i in j],
+            'last_reading_at': (self.last_slot[r] * self.slot_ns).astype('datetime64[ns]')
+        })
+
+    def metrics(self):
+        """Evaluation latency per batch"""
+        seconds = np.array(self.latencies) * 1000
+        report = {'batches': len(seconds), 'rivers': len(self.rivers), 'active': int(self.active.sum()),
+                  'rejected': self.rejected}
+        if len(seconds):
+            report.update({
+                'latency_ms_p50': round(float(np.percentile(seconds, 50)), 3),
+                'latency_ms_p95': round(float(np.percentile(seconds, 95)), 3),
+                'latency_ms_max': round(float(seconds.max()), 3)
+            })
+        return report
@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+
+from utils.config import DATASET_CONFIG
+from src.flood_dataset import FloodDataset
+
+class FloodAggregator:
+    """Grouped aggregation engine for the analyzer.
+
+    One groupby over a combined (river, month, hour) key using only built-in reducers
+    builds a small cube of counts, sums, means, variances and extrema.
+    Hourly, monthly, seasonal and per-river tables are rolled up from that
+    cube, so the full data is scanned once and no per-group Python lambdas
+    are called. Variances are combined with the parallel (Chan) formula.
+    """
+        
+    def __init__(self, data):
+        self.dataset = FloodDataset.wrap(data)
+        self._cube = None
+    
+    def cube(self):
+        """Per (river, month, hour) partial aggregates, built once"""
+        if self._cube is not None:
+            return self._cube
+        
+        data = self.dataset.data
+        derived = [name for name, col in (('is_flood', 'flood_status'), ('is_error', 'sensor_status'))
+                   if col in data.columns]
+        value_cols = [col for col in ['water_height_cm', 'water_flow_m3s', 'rainfall_mm'] if col in data.columns]
+        frame = self.dataset.view(columns=value_cols, derived=derived)
+        
+        # One integer group key per (river, month, hour) cell
+        river_codes, rivers = pd.factorize(data['river_name'], sort=True)
+        month = self.dataset.derived('month').to_numpy(dtype=np.int64)
+        hour = self.dataset.derived('hour').to_numpy(dtype=np.int64)
+        frame['cell'] = (river_codes.astype(np.int64) * 13 + month) * 24 + hour
+        
+        aggregations = {'rows': ('cell', 'size')}
+        for col in value_cols:
+            aggregations.update({
+                f'{col}__count': (col, 'count'),
+                f'{col}__sum': (col, 'sum'),
+                f'{col}__var': (col, 'var'),
+                f'{col}__max': (col, 'max'),
+                f'{col}__min': (col, 'min')
+            })
+        for name in derived:
+            aggregations[f'{name}__sum'] = (name, 'sum')
+        
+        cube = frame.groupby('cell', sort=True).agg(**aggregations)
+        cells = cube.index.to_numpy()
+        cube = cube.reset_index(drop=True)
+        cube.insert(0, 'hour', cells % 24)
+        cube.insert(0, 'month', cells // 24 % 13)
+        cube.insert(0, 'river_name', np.asarray(rivers)[cells // (24 * 13)])
+        for name in ('is_flood', 'is_error'):
+            if f'{name}__sum' not in cube.columns:
+                cube[f'{name}__sum'] = 0
+        
+        rainy = cube['month'].isin(DATASET_CONFIG['rainy_season_months'])
+        cube['season'] = np.where(rainy, 'Rainy', 'Dry')
+        self._cube = cube
+        return cube
+    
+    def _rollup(self, by, col, stats):
+        """Combine cube cells of one value column into per-`by` statistics"""
+        cube = self.cube()
+        result = {}
+        if f'{col}__count' not in cube.columns:
+            return pd.DataFrame(index=pd.Index(sorted(cube[by].unique()), name=by))
+        
+        grouped = cube.groupby(by, observed=True, sort=True)
+        count = grouped[f'{col}__count'].sum()
+        total = grouped[f'{col}__sum'].sum()
+        mean = total / count.where(count > 0)
+        
+        for stat in stats:
+            if stat == 'mean':
+                result[stat] = mean
+            elif stat == 'sum':
+                result[stat] = total
+            elif stat == 'max':
+                result[stat] = grouped[f'{col}__max'].max()
+            elif stat == 'min':
+                result[stat] = grouped[f'{col}__min'].min()
+            elif stat == 'std':
+                # Chan et al.: M2 = sum(M2_i) + sum(n_i * (mean_i - mean)^2)
+                cell_count = cube[f'{col}__count']
+                cell_mean = cube[f'{col}__sum'] / cell_count.where(cell_count > 0)
+                cell_m2 = (cube[f'{col}__var'] * (cell_count - 1)).fillna(0)
+                group_mean = grouped[f'{col}__sum'].transform('sum') / grouped[f'{col}__count'].transform('sum')
+                spread = cell_count * (cell_mean - group_mean) ** 2
+                m2 = (cell_m2 + spread.fillna(0)).groupby(cube[by], observed=True).sum()
+                result[stat] = np.sqrt(m2 / (count - 1).where(count > 1))
+        return pd.DataFrame(result)
+    
+    def _rate(self, by, name):
+        grouped = self.cube().groupby(by, observed=True, sort=True)
+        return grouped[f'{name}__sum'].sum() / grouped['rows'].sum()
+    
+    def hourly_table(self):
+        """Mean height, mean rainfall and flood rate by hour of day"""
+        table = pd.DataFrame({
+            'water_height_cm': self._rollup('hour', 'water_height_cm', ['mean'])['mean'],
+            'rainfall_mm': self._rollup('hour', 'rainfall_mm', ['mean'])['mean'],
+            'flood_status': self._rate('hour', 'is_flood')
+        })
+        return table.round(3)
+    
+    def monthly_table(self):
+        """Mean height, total rainfall and flood rate by month"""
+        table = pd.DataFrame({
+            'water_height_cm': self._rollup('month', 'water_height_cm', ['mean'])['mean'],
+            'rainfall_mm': self._rollup('month', 'rainfall_mm', ['sum'])['sum'],
+            'flood_status': self._rate('month', 'is_flood')
+        })
+        return table.round(3)
+    
+    def seasonal_table(self):
+        """Height and rainfall statistics, flood rate and river count by season"""
+        cube = self.cube()
+        table = pd.concat({
+            'water_height_cm': self._rollup('season', 'water_height_cm', ['mean', 'std', 'max']),
+            'rainfall_mm': self._rollup('season', 'rainfall_mm', ['sum', 'mean']),
+            'flood_status': self._rate('season', 'is_flood').to_frame('flood_rate'),
+            'river_name': cube.groupby('season', sort=True)['river_name'].nunique().to_frame('nunique')
+        }, axis=1)
+        return table.round(3)
+    
+    def river_table(self):
+        """Per-river height, flow and rainfall statistics with flood and sensor error counts"""
+        cube = self.cube()
+        flood_count = cube.groupby('river_name', observed=True, sort=True)['is_flood__sum'].sum()
+        table = pd.concat({
+            'water_height_cm': self._rollup('river_name', 'water_height_cm', ['mean', 'std', 'max', 'min']),
+            'water_flow_m3s': self._rollup('river_name', 'water_flow_m3s', ['mean', 'max']),
+            'rainfall_mm': self._rollup('river_name', 'rainfall_mm', ['sum']),
+            'flood_status': flood_count.to_frame('flood_count'),
+            'sensor_status': self._rate('river_name', 'is_error').to_frame('error_rate')
+        }, axis=1).round(3)
+        
+        # Rank rivers by flood frequency (rivers without floods stay unranked)
+        table['flood_frequency_rank'] = flood_count[flood_count > 0].rank(ascending=False)
+        return table
@@ -1,23 +1,90 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-import sys
-import os
 
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
-from config import DATASET_CONFIG
-from helpers import detect_flood_events, calculate_flood_duration
+from utils.config import DATASET_CONFIG, STATS_CONFIG, CORRELATION_CONFIG
+from utils.helpers import detect_flood_episodes
+from src.flood_dataset import FloodDataset
+from src.instrumentation import instrumented
+from src.data_aggregator import FloodAggregator
+from src.stream_stats import StreamingStats, CoMomentAccumulator
+from src.quality_check import quality_summary
+
+def _river_episodes(river, river_data, threshold):
+    """Per-river worker: flood episodes of one river"""
+    return detect_flood_episodes(river_data, threshold=threshold)
+
+def _river_summary(river, river_data):
+    """Per-river worker: comparison statistics of one river"""
+    return FloodAggregator(river_data).river_table()
+
+def _river_stats(river, river_data, columns, watermarks):
+    """Per-river worker: streaming accumulators over the rows not yet counted"""
+    stats = StreamingStats(columns)
+    river = str(river)
+    stats.watermarks = {river: watermarks[river]} if river in watermarks else {}
+    new_rows = stats.new_rows(river_data)
+    stats.watermarks = {}
+    return stats.update(new_rows)
+
+def _river_comoments(river, river_data, columns):
+    """Per-river worker: co-moment sums of one river"""
+    return CoMomentAccumulator(columns).update(river_data)
 
 class FloodDataAnalyzer:
-    def __init__(self, data):
-        self.data = data.copy()
+    def __init__(self, data, episodes=None, executor=None, stats_path=None, stats_source=None, comoments=None):
+        # Shared, read-only data (no private copy)
+        self.dataset = FloodDataset.wrap(data)
+        self.data = self.dataset.data
+        self.aggregator = FloodAggregator(self.dataset)
+        self.episodes = episodes
+        self.executor = executor
+        self.stats_path = stats_path
+        self.stats_source = stats_source  # CSV the saved accumulators were built from
+        self.comoments = comoments
         self.analysis_results = {}
     
+    def get_flood_episodes(self):
+        """Flood episodes table (computed once, or supplied by the pipeline)"""
+        if self.episodes is None:
+            threshold = DATASET_CONFIG['flood_threshold_cm']
+            if self.executor is not None:
+                episodes = self.executor.map_concat(_river_episodes, threshold)
+                if not episodes.empty:
+                    episodes = episodes.reset_index(drop=True)
+                    episodes['episode_id'] = np.arange(1, len(episodes) + 1)
+                    self.episodes = episodes
+                else:
+                    self.episodes = detect_flood_episodes(self.data.iloc[:0])
+            else:
+                self.episodes = detect_flood_episodes(self.data, threshold=threshold)
+        return self.episodes
+    
+    def get_streaming_stats(self, columns):
+        """Streaming accumulators, refreshed with the rows not counted yet"""
+        if self.stats_path:
+            stats = StreamingStats.load(self.stats_path, columns, source_path=self.stats_source)
+        else:
+            stats = StreamingStats(columns)
+        if not stats.is_consistent(self.data):
+            # Baris terlambat atau baris yang sudah dihitung hilang: bangun ulang dari data
+            print("Streaming stats: late or removed rows, rebuilding from the data")
+            stats = StreamingStats(columns)
+        
+        if self.executor is not None:
+            # Per-river partial accumulators, merged
+            for partial in self.executor.map(_river_stats, columns, dict(stats.watermarks)).values():
+                stats.merge(partial)
+        else:
+            stats.update(stats.new_rows(self.data))
+        
+        if self.stats_path:
+            stats.save(self.stats_path, self.stats_source)
+        return stats
+    
+    @instrumented
     def basic_statistics(self):
         """Calculate basic statistics for numerical columns"""
-        numerical_cols = ['sensor_distance_cm', 'water_height_cm', 'water_flow_m3s', 
-                         'rainfall_mm', 'humidity_pct', 'temperature_c']
+        numerical_cols = STATS_CONFIG['columns']
         
         # Filter hanya kolom yang ada di data
         available_cols = [col for col in numerical_cols if col in self.data.columns]
@@ -26,24 +93,19 @@ class FloodDataAnalyzer:
             print("No numerical columns found for analysis")
             return pd.DataFrame()
         
-        stats_df = self.data[available_cols].describe()
-        
-        # Additional statistics
-        additional_stats = {}
-        for col in available_cols:
-            try:
-                additional_stats[f'{col}_cv'] = stats.variation(self.data[col].dropna())  # Coefficient of variation
-                additional_stats[f'{col}_skew'] = stats.skew(self.data[col].dropna())
-                additional_stats[f'{col}_kurtosis'] = stats.kurtosis(self.data[col].dropna())
-            except Exception as e:
-                print(f"Could not calculate additional stats for {col}: {e}")
+        stats = self.get_streaming_stats(available_cols)
+        stats_df = stats.describe()
         
+        # Additional statistics (CV, skewness, kurtosis dari momen yang sama)
+        additional_stats = stats.shape_stats()
         if additional_stats:
             stats_df = pd.concat([stats_df, pd.DataFrame(additional_stats, index=['additional'])])
         
         self.analysis_results['basic_stats'] = stats_df
+        self.analysis_results['basic_stats_by_river'] = stats.by_group()
         return stats_df
     
+    @instrumented
     def flood_analysis(self):
         """Analyze flood patterns and statistics"""
         flood_data = self.data[self.data['flood_status'] == 'BANJIR']
@@ -63,120 +125,93 @@ class FloodDataAnalyzer:
         }
         
         # Flood duration analysis
+        episodes = self.get_flood_episodes()
         flood_durations = {}
-        for river in self.data['river_name'].unique():
-            river_data = self.data[self.data['river_name'] == river]
-            flood_events = detect_flood_events(river_data['water_height_cm'])
-            durations = calculate_flood_duration(flood_events)
-            if durations:
+        if not episodes.empty:
+            duration_stats = episodes.groupby('river_name')['duration_hours'].agg(['mean', 'max', 'sum'])
+            for river, row in duration_stats.iterrows():
                 flood_durations[river] = {
-                    'avg_duration_hours': np.mean(durations),
-                    'max_duration_hours': np.max(durations),
-                    'total_flood_hours': np.sum(durations)
+                    'avg_duration_hours': row['mean'],
+                    'max_duration_hours': row['max'],
+                    'total_flood_hours': row['sum']
                 }
         
+        flood_stats['total_flood_episodes'] = len(episodes)
         flood_stats['flood_durations'] = flood_durations
         self.analysis_results['flood_analysis'] = flood_stats
         return flood_stats
     
+    @instrumented
     def temporal_analysis(self):
         """Analyze temporal patterns"""
-        temporal_data = self.data.copy()
-        temporal_data['hour'] = temporal_data['timestamp'].dt.hour
-        temporal_data['day_of_week'] = temporal_data['timestamp'].dt.dayofweek
-        temporal_data['month'] = temporal_data['timestamp'].dt.month
-        
         temporal_patterns = {}
         
-        # Hourly patterns
-        hourly_stats = temporal_data.groupby('hour').agg({
-            'water_height_cm': 'mean',
-            'rainfall_mm': 'mean',
-            'flood_status': lambda x: (x == 'BANJIR').mean() if 'flood_status' in temporal_data.columns else 0
-        }).round(3)
-        
-        # Monthly patterns
-        monthly_stats = temporal_data.groupby('month').agg({
-            'water_height_cm': 'mean',
-            'rainfall_mm': 'sum',
-            'flood_status': lambda x: (x == 'BANJIR').mean() if 'flood_status' in temporal_data.columns else 0
-        }).round(3)
-        
-        temporal_patterns['hourly'] = hourly_stats
-        temporal_patterns['monthly'] = monthly_stats
-        temporal_patterns['seasonal'] = self._analyze_seasonal_patterns(temporal_data)
+        # Hourly, monthly and seasonal tables from the single-pass aggregation cube
+        temporal_patterns['hourly'] = self.aggregator.hourly_table()
+        temporal_patterns['monthly'] = self.aggregator.monthly_table()
+        temporal_patterns['seasonal'] = self._analyze_seasonal_patterns()
         
         self.analysis_results['temporal_analysis'] = temporal_patterns
         return temporal_patterns
     
-    def _analyze_seasonal_patterns(self, data):
+    def _analyze_seasonal_patterns(self):
         """Analyze seasonal patterns in flood data"""
         try:
-            data_copy = data.copy()
-            data_copy['season'] = data_copy['month'].apply(
-                lambda x: 'Rainy' if x in [1, 2, 3, 10, 11, 12] else 'Dry'
-            )
-            
-            seasonal_stats = data_copy.groupby('season').agg({
-                'water_height_cm': ['mean', 'std', 'max'],
-                'rainfall_mm': ['sum', 'mean'],
-                'flood_status': lambda x: (x == 'BANJIR').mean() if 'flood_status' in data_copy.columns else 0,
-                'river_name': 'nunique'
-            }).round(3)
-            
-            return seasonal_stats
+            return self.aggregator.seasonal_table()
         except Exception as e:
             print(f"Error in seasonal analysis: {e}")
             # Return empty DataFrame dengan struktur yang diharapkan
             return pd.DataFrame()
     
+    def get_comoments(self):
+        """Co-moment accumulator over the hydrological variables (one pass, or supplied by the pipeline)"""
+        if self.comoments is None:
+            columns = [col for col in CORRELATION_CONFIG['columns'] if col in self.data.columns]
+            self.comoments = CoMomentAccumulator(columns)
+            if self.executor is not None:
+                for partial in self.executor.map(_river_comoments, columns).values():
+                    self.comoments.merge(partial)
+            else:
+                self.comoments.update(self.data)
+        return self.comoments
+    
+    @instrumented
     def correlation_analysis(self):
         """Analyze correlations between variables"""
-        numerical_cols = ['water_height_cm', 'water_flow_m3s', 'rainfall_mm', 
-                         'humidity_pct', 'temperature_c']
+        comoments = self.get_comoments()
         
-        # Filter hanya kolom yang ada
-        available_cols = [col for col in numerical_cols if col in self.data.columns]
-        
-        if len(available_cols) < 2:
+        if len(comoments.columns) < 2:
             print("Not enough numerical columns for correlation analysis")
             return {
                 'correlation_matrix': pd.DataFrame(),
                 'strong_correlations': {}
             }
         
-        correlation_matrix = self.data[available_cols].corr()
-        
-        # Significant correlations (absolute value > 0.3)
-        strong_correlations = {}
-        for i, col1 in enumerate(available_cols):
-            for j, col2 in enumerate(available_cols):
-                if i < j and abs(correlation_matrix.loc[col1, col2]) > 0.3:
-                    strong_correlations[f'{col1} vs {col2}'] = round(correlation_matrix.loc[col1, col2], 3)
+        correlation_matrix = comoments.corr()
         
         correlation_results = {
             'correlation_matrix': correlation_matrix,
-            'strong_correlations': strong_correlations
+            # Significant correlations (absolute value > 0.3)
+            'strong_correlations': comoments.strong_pairs(correlation_matrix),
+            # Korelasi N hari terakhir dan per sungai dari akumulator yang sama
+            'rolling_correlation_matrix': comoments.corr(window=True),
+            'river_correlations': {river: comoments.corr(group=river) for river in sorted(comoments.groups)}
         }
         
         self.analysis_results['correlation_analysis'] = correlation_results
         return correlation_results
     
+    @instrumented
     def river_comparison_analysis(self):
         """Compare statistics across different rivers"""
         try:
-            river_stats = self.data.groupby('river_name').agg({
-                'water_height_cm': ['mean', 'std', 'max', 'min'],
-                'water_flow_m3s': ['mean', 'max'],
-                'rainfall_mm': 'sum',
-                'flood_status': lambda x: (x == 'BANJIR').sum() if 'flood_status' in self.data.columns else 0,
-                'sensor_status': lambda x: (x == 'ERROR').mean() if 'sensor_status' in self.data.columns else 0
-            }).round(3)
-            
-            # Rank rivers by flood frequency jika ada data banjir
-            if 'flood_status' in self.data.columns:
-                flood_frequency = self.data[self.data['flood_status'] == 'BANJIR']['river_name'].value_counts()
-                river_stats['flood_frequency_rank'] = flood_frequency.rank(ascending=False)
+            # Includes flood_frequency_rank (rank by number of flood readings)
+            if self.executor is not None:
+                river_stats = self.executor.map_concat(_river_summary)
+                flood_count = river_stats[('flood_status', 'flood_count')]
+                river_stats['flood_frequency_rank'] = flood_count[flood_count > 0].rank(ascending=False)
+            else:
+                river_stats = self.aggregator.river_table()
             
             self.analysis_results['river_comparison'] = river_stats
             return river_stats
@@ -184,6 +219,14 @@ class FloodDataAnalyzer:
             print(f"Error in river comparison: {e}")
             return pd.DataFrame()
     
+    @instrumented
+    def data_quality_analysis(self):
+        """Readings flagged by the QC stage, per river and flag"""
+        quality = quality_summary(self.dataset)
+        self.analysis_results['data_quality'] = quality
+        return quality
+    
+    @instrumented
     def generate_comprehensive_report(self):
         """Generate comprehensive analysis report"""
         print("Generating Comprehensive Flood Analysis Report...")
@@ -196,6 +239,7 @@ class FloodDataAnalyzer:
             temporal_stats = self.temporal_analysis()
             correlation_stats = self.correlation_analysis()
             river_stats = self.river_comparison_analysis()
+            quality_stats = self.data_quality_analysis()
         except Exception as e:
             print(f"Error during analysis: {e}")
             return self.analysis_results
@@ -224,6 +268,11 @@ class FloodDataAnalyzer:
             except:
                 print(f"Temporal Patterns: Available (check details)")
         
+        if not quality_stats.empty:
+            print(f"Data Quality:")
+            print(f"Flagged Readings: {quality_stats['flagged'].sum():,} "
+                  f"({quality_stats['flagged'].sum() / quality_stats['readings'].sum():.1%})")
+        
         # Correlation summary
         if correlation_stats and correlation_stats['strong_correlations']:
             print(f"Strong Correlations (>0.3):")
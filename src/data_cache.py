@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import shutil
+import os
+
+from utils.config import FILE_PATHS, DATASET_SCHEMA, CACHE_CONFIG
+
+CACHE_VERSION = 2  # 2: source = source_signature() (path, size, mtime, sha256)
+
+def apply_schema(data, schema=None):
+    """Cast columns to the typed dataset schema (in place where possible)"""
+    schema = schema or DATASET_SCHEMA
+    for col, dtype in schema.items():
+        if col not in data.columns:
+            continue
+        if dtype.startswith('datetime64'):
+            data[col] = pd.to_datetime(data[col]).astype(dtype)
+        elif data[col].dtype != dtype:
+            data[col] = data[col].astype(dtype)
+    return data
+
+def file_digest(path, block_size=1 << 20, size=None):
+    """SHA-256 of a file (or of its first `size` bytes), read in blocks"""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+def source_signature(path, previous=None):
+    """Path, size, mtime and SHA-256 of a source file (hash of `previous` reused if unchanged)"""
+    stat = os.stat(path)
+    signature = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and all(previous.get(key) == value for key, value in signature.items()):
+        signature['sha256'] = previous['sha256']
+    else:
+        signature['sha256'] = file_digest(path)
+    return signature
+
+def source_extends(signature, path):
+    """True if `path` still starts with the bytes of `signature` (unchanged or only appended to)"""
+    if not signature or not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    if signature['path'] != os.path.abspath(path) or stat.st_size < signature['size']:
+        return False
+    if stat.st_size == signature['size'] and stat.st_mtime_ns == signature['mtime_ns']:
+        return True
+    return file_digest(path, size=signature['size']) == signature['sha256']
+
+def _pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class FloodDataCache:
+    """Typed columnar cache of the raw CSV.
+
+    The cache is valid while the source file's size and mtime are unchanged;
+    if only the mtime moved, the content hash decides. Data is stored as
+    Parquet when pyarrow is installed, otherwise as one memory-mappable .npy
+    file per column (categoricals as integer codes).
+    """
+    
+    def __init__(self, csv_file_path, cache_dir=None, cache_format=None):
+        self.csv_file_path = csv_file_path
+        stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+        self.cache_path = os.path.join(cache_dir or FILE_PATHS['cache_dir'], stem)
+        self.meta_path = os.path.join(self.cache_path, 'meta.json')
+        
+        cache_format = cache_format or CACHE_CONFIG['format']
+        if cache_format == 'auto':
+            cache_format = 'parquet' if _pyarrow_available() else 'npy'
+        self.cache_format = cache_format
+    
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path) as f:
+            return json.load(f)
+    
+    def _write_meta(self, meta):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+    
+    def is_valid(self):
+        """Check whether the cache matches the current source file"""
+        meta = self._read_meta()
+        if (meta is None or meta.get('version') != CACHE_VERSION
+                or meta.get('format') != self.cache_format):
+            return False
+        
+        if os.path.getsize(self.csv_file_path) != meta['source']['size']:
+            return False
+        # Hash dihitung ulang hanya jika mtime berubah (touched but possibly unchanged)
+        signature = source_signature(self.csv_file_path, previous=meta['source'])
+        if signature['sha256'] != meta['source']['sha256']:
+            return False
+        if signature != meta['source']:
+            meta['source'] = signature
+            self._write_meta(meta)
+        return True
+    
+    def build(self):
+        """Parse the CSV once with explicit dtypes and write the cache"""
+        dtypes = {col: dtype for col, dtype in DATASET_SCHEMA.items()
+                  if not dtype.startswith('datetime64')}
+        data = pd.read_csv(self.csv_file_path, dtype=dtypes)
+        data = apply_schema(data)
+        
+        signature = source_signature(self.csv_file_path)
+        
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+        os.makedirs(self.cache_path, exist_ok=True)
+        meta = {
+            'version': CACHE_VERSION,
+            'format': self.cache_format,
+            'source': signature,
+            'rows': len(data),
+            'columns': {col: str(data[col].dtype) for col in data.columns},
+            'categories': {}
+        }
+        
+        if self.cache_format == 'parquet':
+            data.to_parquet(os.path.join(self.cache_path, 'data.parquet'), index=False)
+        else:
+            for col in data.columns:
+                values = data[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    meta['categories'][col] = values.cat.categories.tolist()
+                    values = values.cat.codes
+                np.save(os.path.join(self.cache_path, f'{col}.npy'), values.to_numpy())
+        
+        self._write_meta(meta)
+        return data
+    
+    def read(self, columns=None, memory_map=True):
+        """Read (selected columns of) a valid cache"""
+        meta = self._read_meta()
+        columns = columns or list(meta['columns'])
+        
+        if self.cache_format == 'parquet':
+            return pd.read_parquet(os.path.join(self.cache_path, 'data.parquet'),
+                                   columns=columns, memory_map=memory_map)
+        
+        mmap_mode = 'r' if memory_map else None
+        data = {}
+        for col in columns:
+            values = np.load(os.path.join(self.cache_path, f'{col}.npy'), mmap_mode=mmap_mode)
+            if col in meta['categories']:
+                values = pd.Categorical.from_codes(values, categories=meta['categories'][col])
+            data[col] = values
+        return pd.DataFrame(data, copy=False)
+    
+    def load(self, columns=None):
+        """Return the dataset, rebuilding the cache when the source changed"""
+        if self.is_valid():
+            return self.read(columns)
+        
+        print(f"Building columnar cache ({self.cache_format}) for {self.csv_file_path}")
+        data = self.build()
+        return data[columns] if columns else data
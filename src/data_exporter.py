@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import hashlib
+import gzip
+import json
+import os
+
+from utils.config import DATASET_CONFIG, SNAPSHOT_CONFIG
+from utils.helpers import detect_flood_episodes
+from utils.downsample import downsample_indices
+from src.flood_dataset import FloodDataset
+
+SNAPSHOT_NAMES = ['latest', 'hourly', 'daily', 'episodes']
+
+def _iso(values):
+    return pd.DatetimeIndex(values).strftime('%Y-%m-%dT%H:%M').tolist()
+
+def _rounded(values, decimals=2):
+    return [None if v != v else v for v in np.round(np.asarray(values, dtype=float), decimals).tolist()]
+
+def river_status(height_cm):
+    """Dashboard status for a water height: normal, warning or danger"""
+    if height_cm > DATASET_CONFIG['flood_threshold_cm']:
+        return 'danger'
+    if height_cm > DATASET_CONFIG['warning_threshold_cm']:
+        return 'warning'
+    return 'normal'
+
+class FloodSnapshotExporter:
+    """Compact, versioned JSON snapshots for the web dashboard.
+
+    Each snapshot is written as <name>.json plus a precompressed
+    <name>.json.gz, and listed in manifest.json with a content hash usable
+    as an ETag. A snapshot file is only rewritten when its content
+    changed, so unchanged files keep their mtime and HTTP validators.
+    """
+    
+    def __init__(self, data=None, episodes=None, output_dir=None):
+        self.dataset = FloodDataset.wrap(data) if data is not None else None
+        self.episodes = episodes
+        self.output_dir = output_dir or SNAPSHOT_CONFIG['output_dir']
+        self.manifest_path = os.path.join(self.output_dir, 'manifest.json')
+    
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'schema_version': SNAPSHOT_CONFIG['schema_version'], 'snapshots': {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+    
+    def write_snapshot(self, name, payload, manifest):
+        """Write one snapshot if its content changed; returns True if written"""
+        payload = {'schema_version': SNAPSHOT_CONFIG['schema_version'], 'snapshot': name, **payload}
+        body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:16]
+        
+        entry = manifest['snapshots'].get(name)
+        path = os.path.join(self.output_dir, f'{name}.json')
+        if entry and entry['etag'] == etag and os.path.exists(path):
+            return False
+        
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(f'{path}.tmp', path)
+        # mtime=0 keeps the gzip bytes identical for identical content
+        with open(f'{path}.gz.tmp', 'wb') as f:
+            f.write(gzip.compress(body, compresslevel=9, mtime=0))
+        os.replace(f'{path}.gz.tmp', f'{path}.gz')
+        
+        manifest['snapshots'][name] = {
+            'file': f'{name}.json',
+            'etag': etag,
+            'bytes': len(body),
+            'gzip_bytes': os.path.getsize(f'{path}.gz'),
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        return True
+    
+    def save_manifest(self, manifest):
+        manifest['schema_version'] = SNAPSHOT_CONFIG['schema_version']
+        if manifest == self.load_manifest() and os.path.exists(self.manifest_path):
+            return
+        with open(f'{self.manifest_path}.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(f'{self.manifest_path}.tmp', self.manifest_path)
+    
+    def latest_snapshot(self, data):
+        """Last reading per river"""
+        latest = data.sort_values('timestamp', kind='stable').groupby('river_name', observed=True).tail(1)
+        latest = latest.sort_values('river_name')
+        rivers = {}
+        for row in latest.itertuples(index=False):
+            height = float(row.water_height_cm)
+            rivers[str(row.river_name)] = {
+                'timestamp': _iso([row.timestamp])[0],
+                'water_height_cm': round(height, 2),
+                'water_flow_m3s': round(float(getattr(row, 'water_flow_m3s', np.nan)), 3),
+                'rainfall_mm': round(float(getattr(row, 'rainfall_mm', np.nan)), 2),
+                'flood_status': str(getattr(row, 'flood_status', '')),
+                'sensor_status': str(getattr(row, 'sensor_status', '')),
+                'status': river_status(height)
+            }
+        return {'rivers': rivers}
+    
+    def _rollup(self, data, freq):
+        grouped = data.groupby(['river_name', pd.Grouper(key='timestamp', freq=freq)], observed=True)
+        return grouped.agg(
+            height_mean=('water_height_cm', 'mean'),
+            height_max=('water_height_cm', 'max'),
+            rainfall_mm=('rainfall_mm', 'sum')
+        ).reset_index()
+    
+    def _series(self, rollup):
+        """Columnar per-river series, downsampled for chart rendering"""
+        series = {}
+        for river, river_rollup in rollup.groupby('river_name', observed=True, sort=True):
+            keep = downsample_indices(
+                river_rollup['timestamp'].to_numpy(), river_rollup['height_max'].to_numpy(),
+                SNAPSHOT_CONFIG['max_points_per_series'],
+                keep_peaks_above=DATASET_CONFIG['flood_threshold_cm']
+            )
+            river_rollup = river_rollup.iloc[keep]
+            series[str(river)] = {
+                't': _iso(river_rollup['timestamp']),
+                'mean': _rounded(river_rollup['height_mean'], 1),
+                'max': _rounded(river_rollup['height_max'], 1),
+                'rain': _rounded(river_rollup['rainfall_mm'], 1)
+            }
+        return series
+    
+    def hourly_snapshot(self, data):
+        """Hourly rollup over the last SNAPSHOT_CONFIG['hourly_days'] days"""
+        start = data['timestamp'].max() - pd.Timedelta(days=SNAPSHOT_CONFIG['hourly_days'])
+        recent = data[data['timestamp'] > start]
+        return {'interval': '1h', 'rivers': self._series(self._rollup(recent, 'h'))}
+    
+    def daily_snapshot(self, data):
+        """Daily rollup over the whole history"""
+        return {'interval': '1d', 'rivers': self._series(self._rollup(data, 'D'))}
+    
+    def episodes_snapshot(self, episodes):
+        """Flood episode list"""
+        return {'episodes': {
+            'river': episodes['river_name'].astype(str).tolist(),
+            'start': _iso(episodes['start']),
+            'end': _iso(episodes['end']),
+            'duration_hours': _rounded(episodes['duration_hours'], 2),
+            'peak_height_cm': _rounded(episodes['peak_height_cm'], 1)
+        }}
+    
+    def export_all(self):
+        """Write every snapshot; returns the names that changed"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        data = self.dataset.view(columns=[col for col in [
+            'timestamp', 'river_name', 'water_height_cm', 'water_flow_m3s',
+            'rainfall_mm', 'flood_status', 'sensor_status'
+        ] if col in self.dataset.data.columns])
+        if self.episodes is None:
+            self.episodes = detect_flood_episodes(data, threshold=DATASET_CONFIG['flood_threshold_cm'])
+        
+        payloads = {
+            'latest': self.latest_snapshot(data),
+            'hourly': self.hourly_snapshot(data),
+            'daily': self.daily_snapshot(data),
+            'episodes': self.episodes_snapshot(self.episodes)
+        }
+        manifest = self.load_manifest()
+        changed = [name for name in SNAPSHOT_NAMES if self.write_snapshot(name, payloads[name], manifest)]
+        self.save_manifest(manifest)
+        print(f"Dashboard snapshots: {len(changed)}/{len(SNAPSHOT_NAMES)} rewritten in {self.output_dir}")
+        return changed
+    
+    def update_latest(self, chunk):
+        """Incremental consumer: merge newly ingested rows into latest.json"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        
+        latest_path = os.path.join(self.output_dir, 'latest.json')
+        rivers = {}
+        if os.path.exists(latest_path):
+            with open(latest_path) as f:
+                rivers = json.load(f).get('rivers', {})
+        for river, reading in self.latest_snapshot(chunk)['rivers'].items():
+            if river not in rivers or reading['timestamp'] >= rivers[river]['timestamp']:
+                rivers[river] = reading
+        
+        changed = self.write_snapshot('latest', {'rivers': dict(sorted(rivers.items()))}, manifest)
+        self.save_manifest(manifest)
+        return changed
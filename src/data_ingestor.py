@@ -0,0 +1,117 @@
+import pandas as pd
+import numpy as np
+import io
+import json
+import os
+
+from utils.config import FILE_PATHS, INGEST_CONFIG
+from src.data_cache import apply_schema
+
+class FloodDataIngestor:
+    """Tail-aware reader for the append-only sensor CSV.
+
+    The byte offset and last timestamp processed are kept in a small JSON
+    state file, so each run only parses rows appended since the previous one.
+    """
+    
+    def __init__(self, csv_file_path, state_path=None, chunk_size=None):
+        self.csv_file_path = csv_file_path
+        self.state_path = state_path or FILE_PATHS['ingest_state']
+        self.chunk_size = chunk_size or INGEST_CONFIG['chunk_size']
+        self.consumers = []
+        self.state = self.load_state()
+    
+    def load_state(self):
+        """Load ingest state, or start from the beginning of the file"""
+        initial_state = {
+            'source': os.path.abspath(self.csv_file_path),
+            'offset': 0,
+            'columns': None,
+            'last_timestamp': None,
+            'rows_ingested': 0
+        }
+        if not os.path.exists(self.state_path):
+            return initial_state
+        
+        with open(self.state_path) as f:
+            state = json.load(f)
+        
+        if state.get('source') != initial_state['source']:
+            print(f"Ingest state belongs to {state.get('source')}, starting over")
+            return initial_state
+        return state
+    
+    def save_state(self):
+        """Persist ingest state atomically"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+    
+    def reset(self):
+        """Forget progress so the next run re-ingests the whole file"""
+        self.state['offset'] = 0
+        self.state['columns'] = None
+        self.state['last_timestamp'] = None
+        self.state['rows_ingested'] = 0
+    
+    def add_consumer(self, consumer):
+        """Register a callable that receives each new chunk (DataFrame)"""
+        self.consumers.append(consumer)
+        return self
+    
+    def read_new_rows(self):
+        """Yield DataFrame chunks of the rows appended since the last run"""
+        file_size = os.path.getsize(self.csv_file_path)
+        if file_size < self.state['offset']:
+            print("Source file shrank (rotated or rewritten), re-ingesting from start")
+            self.reset()
+        
+        with open(self.csv_file_path, 'rb') as f:
+            if self.state['columns'] is None:
+                header = f.readline()
+                self.state['columns'] = header.decode('utf-8').strip().split(',')
+                self.state['offset'] = f.tell()
+            
+            f.seek(self.state['offset'])
+            new_bytes = f.read(file_size - self.state['offset'])
+        
+        # Only complete lines; a row still being written is picked up next run
+        line_ends = np.flatnonzero(np.frombuffer(new_bytes, dtype=np.uint8) == ord('\n')) + 1
+        chunk_ends = line_ends[self.chunk_size - 1::self.chunk_size].tolist()
+        if line_ends.size and (not chunk_ends or chunk_ends[-1] != line_ends[-1]):
+            chunk_ends.append(int(line_ends[-1]))
+        
+        chunk_start = 0
+        for chunk_end in chunk_ends:
+            chunk = pd.read_csv(
+                io.BytesIO(new_bytes[chunk_start:chunk_end]), header=None,
+                names=self.state['columns']
+            )
+            chunk = apply_schema(chunk)
+            first_row = self.state['rows_ingested']
+            chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+            yield chunk
+            
+            # Progress only advances once the chunk has been handed over
+            self.state['offset'] += chunk_end - chunk_start
+            self.state['rows_ingested'] += len(chunk)
+            self.state['last_timestamp'] = str(chunk['timestamp'].max())
+            chunk_start = chunk_end
+    
+    def run(self):
+        """Pass new rows to every consumer and save progress"""
+        total_rows = 0
+        try:
+            for chunk in self.read_new_rows():
+                for consumer in self.consumers:
+                    consumer(chunk)
+                total_rows += len(chunk)
+        finally:
+            # Chunks whose consumers failed are not committed and get retried
+            self.save_state()
+        
+        print(f"Incremental ingestion: {total_rows:,} new records "
+              f"(last timestamp: {self.state['last_timestamp']})")
+        return total_rows
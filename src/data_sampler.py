@@ -1,27 +1,88 @@
 import pandas as pd
 import numpy as np
-from datetime import timedelta
-import sys
 import os
 
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
-from config import SAMPLING_CONFIG
+from utils.config import SAMPLING_CONFIG, DATASET_CONFIG
+from utils.helpers import detect_flood_episodes
+from src.flood_dataset import FloodDataset
+from src.instrumentation import instrumented
+from src.river_executor import RiverExecutor
+from src.time_grid import RiverTimeGrid
+
+def river_sample_filename(river_name):
+    """Nama file sample per sungai"""
+    clean_river_name = str(river_name).replace(' ', '_').replace('-', '_')
+    return f"sampling_river_{clean_river_name}.csv"
+
+def _save_river_sample(river, river_data, output_dir):
+    """Per-river worker: tulis sample satu sungai, kembalikan jumlah record"""
+    if river_data.empty:
+        return 0
+    river_data.to_csv(os.path.join(output_dir, river_sample_filename(river)), index=False)
+    return len(river_data)
 
 class FloodDataSampler:
-    def __init__(self, data):
-        self.data = data.copy()
+    def __init__(self, data=None, episodes=None, executor=None, store=None, source=None):
+        # Data dibagi (tanpa copy) lewat FloodDataset; tanpa data, arsip
+        # dari store baru dimuat saat sampling yang butuh semua data
+        if data is None and store is None:
+            raise ValueError("FloodDataSampler needs data or a partitioned store")
+        self._dataset = None if data is None else FloodDataset.wrap(data)
+        self.store = store
+        self.source = source  # CSV the data was loaded from (to check the store against)
+        self._use_store = None
         self.sampling_config = SAMPLING_CONFIG
+        self.episodes = episodes
+        self.executor = executor
+    
+    @property
+    def dataset(self):
+        if self._dataset is None:
+            self._dataset = FloodDataset(self.store.query())
+        return self._dataset
+    
+    @property
+    def data(self):
+        return self.dataset.data
+    
+    def _river_data(self, river_name):
+        """Readings of one river: only its partitions from the store, if the store holds this data"""
+        if self._use_store is None:
+            # Dengan data di memori, store hanya dipakai jika berasal dari CSV yang sama
+            self._use_store = self.store is not None and (
+                self._dataset is None or self.source is not None and self.store.matches(self.source))
+            if self.store is not None and not self._use_store:
+                print(f"Partition store is not in sync with {self.source or 'the sampler data'}, "
+                      f"using the in-memory data")
+        if self._use_store:
+            return self.store.query(rivers=[river_name])
+        return self.dataset.river_slice(river_name)
+    
+    def get_executor(self):
+        """Executor per sungai (serial jika tidak diberikan dari pipeline)"""
+        if self.executor is None:
+            self.executor = RiverExecutor(self.dataset, backend='serial')
+        return self.executor
+    
+    def get_flood_episodes(self):
+        """Episode banjir (dihitung sekali, atau diberikan dari pipeline)"""
+        if self.episodes is None:
+            self.episodes = detect_flood_episodes(
+                self.data, threshold=DATASET_CONFIG['flood_threshold_cm']
+            )
+        return self.episodes
     
+    @instrumented
     def systematic_sampling(self, hours=None):
         """Sampling sistematis berdasarkan jam tertentu"""
         if hours is None:
             hours = self.sampling_config['systematic_hours']
         
-        sampled_data = self.data[self.data['timestamp'].dt.hour.isin(hours)]
+        sampled_data = self.data[self.dataset.derived('hour').isin(hours)]
         print(f"Systematic sampling: {len(sampled_data)} records at hours {hours}")
         return sampled_data
     
+    @instrumented
     def stratified_sampling(self, stratify_column='flood_status', samples_per_class=None):
         """Sampling stratified berdasarkan kolom tertentu"""
         if samples_per_class is None:
@@ -44,6 +105,7 @@ class FloodDataSampler:
         print(f"Stratified sampling: {len(result)} total records")
         return result
     
+    @instrumented
     def random_sampling(self, sample_size=None):
         """Simple random sampling"""
         if sample_size is None:
@@ -53,18 +115,17 @@ class FloodDataSampler:
         print(f"Random sampling: {len(sampled_data)} records")
         return sampled_data
     
+    @instrumented
     def temporal_sampling(self, frequency=None, river_specific=None):
         """Sampling temporal dengan aggregasi"""
         if frequency is None:
             frequency = self.sampling_config['temporal_frequency']
         
-        if river_specific:
-            data = self.data[self.data['river_name'] == river_specific]
-        else:
-            data = self.data
+        data = self._river_data(river_specific) if river_specific else self.data
         
-        # Aggregate data by time frequency
-        temporal_data = data.groupby([pd.Grouper(key='timestamp', freq=frequency), 'river_name']).agg({
+        # Aggregate on the regular river x time grid: gaps are filled only
+        # up to the configured limit, coverage = fraction of slots measured
+        aggregations = {
             'water_height_cm': 'mean',
             'water_flow_m3s': 'mean',
             'rainfall_mm': 'sum',
@@ -72,48 +133,91 @@ class FloodDataSampler:
             'flood_level': 'last',
             'temperature_c': 'mean',
             'humidity_pct': 'mean'
-        }).reset_index()
+        }
+        grid = RiverTimeGrid(data, columns=list(aggregations))
+        temporal_data = grid.aggregate(frequency, aggregations)
         
         print(f"Temporal sampling ({frequency}): {len(temporal_data)} records")
         return temporal_data
     
+    @instrumented
     def flood_event_sampling(self, include_before_hours=6, include_after_hours=12):
-        """Sampling event banjir dengan window waktu"""
-        flood_events = self.data[self.data['flood_status'] == 'BANJIR']
+        """Sampling event banjir dengan window waktu
+
+        Window di sekitar setiap episode banjir digabung per sungai menjadi
+        event; setiap baris dikembalikan sekali dengan event_id dan event_phase.
+        """
+        episodes = self.get_flood_episodes()
         
-        if flood_events.empty:
+        if episodes.empty:
             print("No flood events found for sampling")
             return pd.DataFrame()
         
-        event_times = flood_events['timestamp'].unique()
-        
-        event_windows = []
-        for event_time in event_times:
-            start_window = event_time - timedelta(hours=include_before_hours)
-            end_window = event_time + timedelta(hours=include_after_hours)
-            
-            window_data = self.data[
-                (self.data['timestamp'] >= start_window) & 
-                (self.data['timestamp'] <= end_window)
-            ].copy()
-            
-            # Mark event phase
-            window_data['event_phase'] = 'BEFORE'
-            window_data.loc[window_data['timestamp'] == event_time, 'event_phase'] = 'PEAK'
-            window_data.loc[window_data['timestamp'] > event_time, 'event_phase'] = 'AFTER'
-            
-            event_windows.append(window_data)
-        
-        result = pd.concat(event_windows) if event_windows else pd.DataFrame()
-        print(f"Flood event sampling: {len(result)} records from {len(event_times)} events")
+        before = pd.Timedelta(hours=include_before_hours)
+        after = pd.Timedelta(hours=include_after_hours)
+        
+        # Gabungkan window yang bersinggungan menjadi satu event per sungai
+        windows = episodes.sort_values(['river_name', 'start'], kind='stable').reset_index(drop=True)
+        new_event = (
+            (windows['river_name'] != windows['river_name'].shift())
+            | (windows['start'] - before > windows['end'].shift() + after)
+        )
+        windows['event_id'] = new_event.cumsum()
+        
+        # Interval join: episode terakhir yang sudah dimulai dan episode berikutnya
+        river_codes, rivers = pd.factorize(self.data['river_name'])
+        rows = pd.DataFrame({
+            'position': np.arange(len(self.data)),
+            'river_code': river_codes,
+            'timestamp': self.data['timestamp'].to_numpy()
+        }).sort_values('timestamp', kind='stable')
+        windows['river_code'] = pd.Index(rivers).get_indexer(windows['river_name'])
+        windows = windows[['river_code', 'start', 'end', 'event_id']].astype(
+            {'start': rows['timestamp'].dtype, 'end': rows['timestamp'].dtype}
+        ).sort_values('start', kind='stable')
+        joined = rows
+        for direction, suffix in (('backward', '_prev'), ('forward', '_next')):
+            joined = pd.merge_asof(
+                joined, windows.rename(columns=lambda c: c if c == 'river_code' else c + suffix),
+                left_on='timestamp', right_on='start' + suffix,
+                by='river_code', direction=direction
+            )
+        
+        is_peak = (joined['timestamp'] <= joined['end_prev']).to_numpy()
+        is_after = ~is_peak & (joined['timestamp'] <= joined['end_prev'] + after).to_numpy()
+        is_before = ~is_peak & ~is_after & (joined['start_next'] - joined['timestamp'] <= before).to_numpy()
+        keep = is_peak | is_after | is_before
+        
+        joined = joined[keep].assign(
+            event_phase=np.where(is_peak, 'PEAK', np.where(is_after, 'AFTER', 'BEFORE'))[keep],
+            event_id=np.where(is_before, joined['event_id_next'], joined['event_id_prev'])[keep]
+        ).astype({'event_id': 'int64'}).sort_values(['event_id', 'timestamp'], kind='stable')
+        
+        result = self.data.iloc[joined['position'].to_numpy()]
+        result['event_id'] = joined['event_id'].to_numpy()
+        result['event_phase'] = joined['event_phase'].to_numpy()
+        
+        n_events = int(new_event.sum())
+        print(f"Flood event sampling: {len(result)} records from {n_events} events")
         return result
     
+    @instrumented
     def river_specific_sampling(self, river_name):
         """Sampling data untuk sungai tertentu"""
-        river_data = self.data[self.data['river_name'] == river_name].copy()
+        river_data = self._river_data(river_name)
         print(f"River-specific sampling ({river_name}): {len(river_data)} records")
         return river_data
     
+    @instrumented
+    def save_river_samples(self, output_dir):
+        """Simpan sample per sungai (paralel sesuai executor)"""
+        os.makedirs(output_dir, exist_ok=True)
+        record_counts = self.get_executor().map(_save_river_sample, output_dir)
+        for river, n_records in record_counts.items():
+            print(f"River-specific sampling ({river}): {n_records} records")
+        return record_counts
+    
+    @instrumented
     def generate_all_samples(self):
         """Generate all sampling methods at once"""
         samples = {}
@@ -133,8 +237,8 @@ class FloodDataSampler:
         # Flood events
         samples['flood_events'] = self.flood_event_sampling()
         
-        # River-specific samples
-        for river in self.data['river_name'].unique():
-            samples[f'river_{river}'] = self.river_specific_sampling(river)
+        # River-specific samples (satu partisi per sungai)
+        for river, river_data in self.get_executor().partitions().items():
+            samples[f'river_{river}'] = river_data
         
         return samples
\ No newline at end of file
@@ -1,87 +1,217 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import tracemalloc
+import time
 import sys
 import os
 
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
-from config import VISUALIZATION_CONFIG
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from utils.config import VISUALIZATION_CONFIG, DATASET_CONFIG, PARALLEL_CONFIG
+from utils.helpers import detect_flood_episodes
+from utils.downsample import downsample_indices
+from src.flood_dataset import FloodDataset
+from src.instrumentation import instrumented
+from src.stream_stats import CoMomentAccumulator
+
+PLOT_NAMES = VISUALIZATION_CONFIG['plots']
+
+# Visualizer of the current render worker process
+_worker_visualizer = None
+
+def _init_render_worker(data, episodes, comoments=None):
+    global _worker_visualizer
+    _worker_visualizer = FloodDataVisualizer(data, episodes=episodes, headless=True,
+                                             comoments=comoments)
+
+def _render_plot(plot_name, save_path, dpi, trace_memory=False):
+    """Render one plot in a worker and report time and peak memory"""
+    visualizer = _worker_visualizer
+    visualizer.dpi = dpi
+    
+    # tracemalloc memperlambat render ~2x: hanya jika diminta
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    start_wall = time.perf_counter()
+    try:
+        created = getattr(visualizer, f'plot_{plot_name}')(save_path=save_path) is not None
+        error = None
+    except Exception as e:
+        created = False
+        error = str(e)
+    seconds = time.perf_counter() - start_wall
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if start_tracing:
+        tracemalloc.stop()
+    plt.close('all')
+    
+    # Peak RSS of the worker process (KB on Linux, bytes on macOS)
+    peak_rss_mb = None
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = round(max_rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+    
+    return {
+        'plot': plot_name,
+        'path': save_path if created else None,
+        'dpi': dpi,
+        'seconds': round(seconds, 3),
+        'peak_memory_mb': None if peak is None else round(peak / 2 ** 20, 1),
+        'peak_rss_mb': peak_rss_mb,
+        'error': error
+    }
 
 class FloodDataVisualizer:
-    def __init__(self, data):
-        self.data = data.copy()
+    def __init__(self, data, episodes=None, headless=False, comoments=None):
+        # Shared, read-only data (no private copy)
+        self.dataset = FloodDataset.wrap(data)
+        self.data = self.dataset.data
+        self.episodes = episodes
+        self.comoments = comoments
+        self.headless = headless
+        if headless:
+            plt.switch_backend('Agg')
         self.setup_plot_style()
     
+    def get_flood_episodes(self):
+        """Flood episodes table (computed once, or supplied by the pipeline)"""
+        if self.episodes is None:
+            self.episodes = detect_flood_episodes(
+                self.data, threshold=DATASET_CONFIG['flood_threshold_cm']
+            )
+        return self.episodes
+    
+    def get_comoments(self):
+        """Co-moment accumulator (built once, or shared by the analyzer)"""
+        if self.comoments is None:
+            self.comoments = CoMomentAccumulator().update(self.data)
+        return self.comoments
+    
     def setup_plot_style(self):
         """Setup matplotlib and seaborn style"""
-        plt.style.use(VISUALIZATION_CONFIG['style'])
+        style = VISUALIZATION_CONFIG['style']
+        if style not in plt.style.available and f'{style}-v0_8' in plt.style.available:
+            # matplotlib >= 3.6 renamed the seaborn styles
+            style = f'{style}-v0_8'
+        plt.style.use(style)
         sns.set_palette(VISUALIZATION_CONFIG['color_palette'])
         self.fig_size = VISUALIZATION_CONFIG['figure_size']
         self.dpi = VISUALIZATION_CONFIG['dpi']
     
+    def _finish_plot(self, fig, save_path):
+        """Save, then show (interactive) or close (headless) the figure"""
+        if save_path:
+            fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
+        
+        if self.headless:
+            plt.close(fig)
+        else:
+            plt.show()
+        return fig
+    
+    @instrumented
+    def render_all(self, output_dir, plot_names=None, fmt='png', dpi=None, outputs=None, workers=None,
+                   trace_memory=None):
+        """Render plots headless in parallel worker processes
+        
+        `outputs` maps a plot name to {'format': ..., 'dpi': ...} to override
+        the defaults per plot. Returns one report dict per plot with the
+        output path, render time, worker peak RSS and, with `trace_memory`,
+        the peak traced (tracemalloc) memory.
+        """
+        if trace_memory is None:
+            trace_memory = VISUALIZATION_CONFIG['trace_memory']
+        plot_names = plot_names or PLOT_NAMES
+        outputs = outputs or {}
+        os.makedirs(output_dir, exist_ok=True)
+        
+        jobs = []
+        for plot_name in plot_names:
+            options = outputs.get(plot_name, {})
+            plot_format = options.get('format', fmt)
+            plot_dpi = options.get('dpi', dpi or self.dpi)
+            jobs.append((plot_name, os.path.join(output_dir, f'{plot_name}.{plot_format}'), plot_dpi,
+                         trace_memory))
+        
+        workers = min(workers or os.cpu_count(), len(jobs))
+        if workers <= 1:
+            _init_render_worker(self.dataset, self.episodes, self.comoments)
+            return [_render_plot(*job) for job in jobs]
+        
+        # Spawned (not forked) workers: render_all also runs inside pipeline stage threads
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                 initargs=(self.dataset, self.episodes, self.comoments),
+                                 mp_context=multiprocessing.get_context(PARALLEL_CONFIG['start_method'])) as pool:
+            futures = [pool.submit(_render_plot, *job) for job in jobs]
+            return [future.result() for future in futures]
+    
+    @instrumented
     def plot_water_level_timeseries(self, river_name=None, save_path=None):
-        """Plot water level time series"""
+        """Plot water level time series (downsampled per river, flood peaks kept)"""
+        # Potongan per sungai dari index (river, timestamp), sudah urut waktu
         if river_name:
-            plot_data = self.data[self.data['river_name'] == river_name]
+            river_groups = {river_name: self.dataset.river_slice(river_name)}
             title = f'Water Level Time Series - {river_name}'
         else:
-            plot_data = self.data
+            river_groups = self.dataset.river_groups()
             title = 'Water Level Time Series - All Rivers'
         
         fig, ax = plt.subplots(figsize=self.fig_size)
         
-        if river_name:
-            ax.plot(plot_data['timestamp'], plot_data['water_height_cm'], 
-                   linewidth=1, alpha=0.7)
-        else:
-            for river in plot_data['river_name'].unique():
-                river_data = plot_data[plot_data['river_name'] == river]
-                ax.plot(river_data['timestamp'], river_data['water_height_cm'], 
-                       linewidth=1, alpha=0.7, label=river)
+        max_points = VISUALIZATION_CONFIG['max_points_per_series']
+        for river, river_data in river_groups.items():
+            if river_data.empty:
+                continue
+            timestamps = river_data['timestamp'].to_numpy()
+            heights = river_data['water_height_cm'].to_numpy()
+            keep = downsample_indices(
+                timestamps, heights, max_points,
+                method=VISUALIZATION_CONFIG['downsample_method'],
+                keep_peaks_above=DATASET_CONFIG['flood_threshold_cm']
+            )
+            ax.plot(timestamps[keep], heights[keep], linewidth=1, alpha=0.7,
+                    label=None if river_name else river)
+        if not river_name:
             ax.legend()
         
         # Add flood threshold line
-        ax.axhline(y=200, color='red', linestyle='--', alpha=0.7, label='Flood Threshold')
-        ax.axhline(y=150, color='orange', linestyle='--', alpha=0.7, label='Warning Level')
+        ax.axhline(y=DATASET_CONFIG['flood_threshold_cm'], color='red', linestyle='--', alpha=0.7, label='Flood Threshold')
+        ax.axhline(y=DATASET_CONFIG['warning_threshold_cm'], color='orange', linestyle='--', alpha=0.7, label='Warning Level')
         
         ax.set_title(title, fontsize=14, fontweight='bold')
         ax.set_xlabel('Timestamp')
         ax.set_ylabel('Water Height (cm)')
         ax.grid(True, alpha=0.3)
         
-        if save_path:
-            plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
-        
-        plt.show()
-        return fig
+        return self._finish_plot(fig, save_path)
     
+    @instrumented
     def plot_flood_events_distribution(self, save_path=None):
-        """Plot distribution of flood events"""
-        flood_data = self.data[self.data['flood_status'] == 'BANJIR']
+        """Plot distribution of flood episodes"""
+        episodes = self.get_flood_episodes()
         
-        if flood_data.empty:
+        if episodes.empty:
             print("No flood events to visualize")
             return None
         
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
         
-        # Flood events by river
-        flood_by_river = flood_data['river_name'].value_counts()
+        # Flood episodes by river
+        flood_by_river = episodes['river_name'].value_counts()
         ax1.bar(flood_by_river.index, flood_by_river.values)
         ax1.set_title('Flood Events by River', fontweight='bold')
         ax1.set_xlabel('River')
         ax1.set_ylabel('Number of Flood Events')
         ax1.tick_params(axis='x', rotation=45)
         
-        # Flood events by month
-        flood_data['month'] = flood_data['timestamp'].dt.month
-        flood_by_month = flood_data['month'].value_counts().sort_index()
+        # Flood episodes by month of onset
+        flood_by_month = episodes['start'].dt.month.value_counts().sort_index()
         ax2.bar(flood_by_month.index, flood_by_month.values)
         ax2.set_title('Flood Events by Month', fontweight='bold')
         ax2.set_xlabel('Month')
@@ -89,18 +219,12 @@ class FloodDataVisualizer:
         
         plt.tight_layout()
         
-        if save_path:
-            plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
-        
-        plt.show()
-        return fig
+        return self._finish_plot(fig, save_path)
     
+    @instrumented
     def plot_correlation_heatmap(self, save_path=None):
         """Plot correlation heatmap of numerical variables"""
-        numerical_cols = ['water_height_cm', 'water_flow_m3s', 'rainfall_mm', 
-                         'humidity_pct', 'temperature_c']
-        
-        correlation_matrix = self.data[numerical_cols].corr()
+        correlation_matrix = self.get_comoments().corr()
         
         fig, ax = plt.subplots(figsize=(10, 8))
         sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0,
@@ -108,19 +232,16 @@ class FloodDataVisualizer:
         ax.set_title('Correlation Matrix - Flood Monitoring Variables', 
                     fontsize=14, fontweight='bold')
         
-        if save_path:
-            plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
-        
-        plt.show()
-        return fig
+        return self._finish_plot(fig, save_path)
     
+    @instrumented
     def plot_river_comparison(self, save_path=None):
         """Compare water levels across different rivers"""
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
         
         # Box plot of water levels by river
         sns.boxplot(data=self.data, x='river_name', y='water_height_cm', ax=ax1)
-        ax1.axhline(y=200, color='red', linestyle='--', alpha=0.7, label='Flood Threshold')
+        ax1.axhline(y=DATASET_CONFIG['flood_threshold_cm'], color='red', linestyle='--', alpha=0.7, label='Flood Threshold')
         ax1.set_title('Water Level Distribution by River', fontweight='bold')
         ax1.set_xlabel('River')
         ax1.set_ylabel('Water Height (cm)')
@@ -137,21 +258,20 @@ class FloodDataVisualizer:
         
         plt.tight_layout()
         
-        if save_path:
-            plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
-        
-        plt.show()
-        return fig
+        return self._finish_plot(fig, save_path)
     
+    @instrumented
     def plot_temporal_patterns(self, save_path=None):
         """Plot temporal patterns in the data"""
-        self.data['hour'] = self.data['timestamp'].dt.hour
-        self.data['month'] = self.data['timestamp'].dt.month
+        temporal_data = self.dataset.view(
+            columns=['water_height_cm', 'rainfall_mm', 'flood_status'],
+            derived=('hour', 'month')
+        )
         
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
         
         # Hourly pattern
-        hourly_avg = self.data.groupby('hour')['water_height_cm'].mean()
+        hourly_avg = temporal_data.groupby('hour')['water_height_cm'].mean()
         ax1.plot(hourly_avg.index, hourly_avg.values, marker='o')
         ax1.set_title('Average Water Height by Hour', fontweight='bold')
         ax1.set_xlabel('Hour of Day')
@@ -159,22 +279,28 @@ class FloodDataVisualizer:
         ax1.grid(True, alpha=0.3)
         
         # Monthly pattern
-        monthly_avg = self.data.groupby('month')['water_height_cm'].mean()
+        monthly_avg = temporal_data.groupby('month')['water_height_cm'].mean()
         ax2.bar(monthly_avg.index, monthly_avg.values)
         ax2.set_title('Average Water Height by Month', fontweight='bold')
         ax2.set_xlabel('Month')
         ax2.set_ylabel('Average Water Height (cm)')
         
         # Rainfall pattern
-        monthly_rain = self.data.groupby('month')['rainfall_mm'].sum()
+        monthly_rain = temporal_data.groupby('month')['rainfall_mm'].sum()
         ax3.bar(monthly_rain.index, monthly_rain.values, color='lightblue', alpha=0.7)
         ax3.set_title('Total Rainfall by Month', fontweight='bold')
         ax3.set_xlabel('Month')
         ax3.set_ylabel('Total Rainfall (mm)')
         
         # Flood frequency by month
-        flood_data = self.data[self.data['flood_status'] == 'BANJIR']
+        flood_data = temporal_data[self.dataset.derived('is_flood')]
         if not flood_data.empty:
             flood_by_month = flood_data.groupby('month').size()
             ax4.bar(flood_by_month.index, flood_by_month.values, color='red', alpha=0.7)
-            ax4.set
\ No newline at end of file
+        ax4.set_title('Flood Readings by Month', fontweight='bold')
+        ax4.set_xlabel('Month')
+        ax4.set_ylabel('Number of Flood Readings')
+        
+        plt.tight_layout()
+        
+        return self._finish_plot(fig, save_path)
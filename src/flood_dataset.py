@@ -0,0 +1,131 @@
+import pandas as pd
+import numpy as np
+
+from utils.config import DATASET_CONFIG
+
+def enable_copy_on_write():
+    """Turn on pandas copy-on-write (always on from pandas 3.0)"""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return
+    try:
+        pd.set_option('mode.copy_on_write', True)
+    except (KeyError, pd.errors.OptionError):
+        pass
+
+class FloodDataset:
+    """Shared, read-only handle on the monitoring data.
+
+    Sampler, analyzer and visualizer all hold the same frame instead of a
+    private copy. Derived columns (hour, month, day_of_week, season,
+    is_flood, is_error, qc_flags) are computed once on first use and shared; views
+    are assembled without copying and, with copy-on-write, writes to a
+    view never reach the shared data.
+
+    Lookups by river (and time range) go through a (river, timestamp)
+    sorted copy built once with per-river offsets: each river is a
+    contiguous block, so a lookup is two binary searches and a zero-copy
+    slice instead of a full boolean scan.
+    """
+    
+    DERIVED_COLUMNS = ('hour', 'month', 'day_of_week', 'season', 'is_flood', 'is_error', 'qc_flags')
+    
+    def __init__(self, data):
+        enable_copy_on_write()
+        self._data = data
+        self._derived = {}
+        self._index = None
+    
+    @classmethod
+    def wrap(cls, data):
+        """Return `data` as a FloodDataset without copying"""
+        return data if isinstance(data, FloodDataset) else cls(data)
+    
+    @property
+    def data(self):
+        return self._data
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def derived(self, name):
+        """Derived column as a Series aligned with the data (computed lazily)"""
+        if name not in self._derived:
+            self._derived[name] = self._compute_derived(name)
+        return self._derived[name]
+    
+    def _compute_derived(self, name):
+        if name == 'hour':
+            values = self._data['timestamp'].dt.hour
+        elif name == 'month':
+            values = self._data['timestamp'].dt.month
+        elif name == 'day_of_week':
+            values = self._data['timestamp'].dt.dayofweek
+        elif name == 'season':
+            is_rainy = self.derived('month').isin(DATASET_CONFIG['rainy_season_months']).to_numpy()
+            values = pd.Categorical.from_codes(is_rainy.astype(np.int8), categories=['Dry', 'Rainy'])
+            values = pd.Series(values, index=self._data.index)
+        elif name == 'is_flood':
+            values = self._data['flood_status'] == 'BANJIR'
+        elif name == 'is_error':
+            values = self._data['sensor_status'] == 'ERROR'
+        elif name == 'qc_flags':
+            from src.quality_check import quality_flags  # quality_check builds on this module
+            values = quality_flags(self)
+        else:
+            raise KeyError(f"Unknown derived column: {name}")
+        return values.rename(name)
+    
+    def river_index(self):
+        """(river, timestamp) sorted frame and row order, river names, group offsets and sorted times (built once)"""
+        if self._index is None:
+            codes, rivers = pd.factorize(self._data['river_name'], sort=True)
+            if 'timestamp' in self._data.columns:
+                times = self._data['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            else:
+                times = np.zeros(len(codes), dtype=np.int64)
+            order = np.lexsort((times, codes))
+            already_sorted = bool((order == np.arange(len(order))).all())
+            ordered = self._data if already_sorted else self._data.take(order)
+            rivers = [str(river) for river in rivers]
+            self._index = {
+                'data': ordered,
+                'order': order,
+                'rivers': rivers,
+                'positions': {river: i for i, river in enumerate(rivers)},
+                'offsets': np.searchsorted(codes[order], np.arange(len(rivers) + 1)),
+                'times': times[order]
+            }
+        return self._index
+    
+    @property
+    def rivers(self):
+        return self.river_index()['rivers']
+    
+    def river_slice(self, river, start=None, end=None):
+        """Rows of one river within [start, end], sorted by time (zero-copy slice)"""
+        index = self.river_index()
+        i = index['positions'].get(str(river))
+        if i is None:
+            return index['data'].iloc[:0]
+        lo, hi = index['offsets'][i], index['offsets'][i + 1]
+        times = index['times'][lo:hi]
+        if start is not None:
+            lo += np.searchsorted(times, pd.Timestamp(start).value, side='left')
+        if end is not None:
+            hi -= len(times) - np.searchsorted(times, pd.Timestamp(end).value, side='right')
+        return index['data'].iloc[lo:max(lo, hi)]
+    
+    def river_groups(self):
+        """Dict of river name -> that river's rows (slices of the sorted frame)"""
+        index = self.river_index()
+        offsets = index['offsets']
+        return {river: index['data'].iloc[offsets[i]:offsets[i + 1]]
+                for i, river in enumerate(index['rivers'])}
+    
+    def view(self, columns=None, derived=()):
+        """DataFrame of selected base columns plus derived columns, without copying"""
+        columns = list(self._data.columns) if columns is None else list(columns)
+        frame = {col: self._data[col] for col in columns}
+        for name in derived:
+            frame[name] = self.derived(name)
+        return pd.DataFrame(frame, copy=False)
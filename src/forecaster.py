@@ -0,0 +1,333 @@
+"""Short-horizon water level forecasts per river.
+
+One direct linear model per river and horizon (1..horizon_hours ahead),
+on lagged water height, rainfall and flow. Lag features are slices of a
+rivers x slots matrix, so they are built for all rivers at once. Each
+river keeps the sufficient statistics X'X and X'Y, so new rows are
+folded in with O(new rows) work. Refitting is one batched closed-form
+ridge solve for all rivers, and inference is a single einsum. The cached
+model records the source CSV's signature and the readings folded in per
+river, and is refit from scratch when the CSV was rewritten or rows
+arrived at or before a river's last slot; `refit_reason` says why.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.config import DATASET_CONFIG, FILE_PATHS, FORECAST_CONFIG
+from src.data_cache import source_signature, source_extends
+from src.time_grid import RiverTimeGrid
+
+MODEL_VERSION = 2
+NO_SLOT = np.iinfo(np.int64).min // 2
+
+def forecast_model_path(csv_file_path):
+    """Model cache file for one source CSV"""
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    return os.path.join(FILE_PATHS['models_dir'], f'{stem}_forecast.npz')
+
+def river_matrix(data, columns, slot_ns, rivers):
+    """Rivers x slots matrices (NaN where no reading, no gap filling) in the given river order"""
+    grid = RiverTimeGrid(data, columns=columns, freq=pd.Timedelta(slot_ns),
+                         fill={col: 'none' for col in columns})
+    rows = pd.Index(grid.rivers).get_indexer([str(river) for river in rivers])
+    matrices = {}
+    for col in columns:
+        matrix = np.full((len(rivers), grid.n_slots), np.nan)
+        matrix[rows >= 0] = grid.matrix(col)[rows[rows >= 0]]
+        matrices[col] = matrix
+    return grid.start, matrices
+
+class WaterLevelForecaster:
+    """Per-river direct multi-horizon linear forecaster"""
+
+    def __init__(self, horizon=None, lags=None, ridge=None, interval_hours=None):
+        self.horizon = horizon or FORECAST_CONFIG['horizon_hours']
+        self.lags = dict(lags or FORECAST_CONFIG['lags'])
+        self.ridge = FORECAST_CONFIG['ridge'] if ridge is None else ridge
+        interval = interval_hours or DATASET_CONFIG['sampling_interval_hours']
+        self.slot_ns = int(interval * 3600 * 10**9)
+        self.columns = list(self.lags)
+        self.feature_names = ['intercept'] + [f'{col}_lag{k}' for col in self.columns
+                                              for k in range(self.lags[col])]
+        self.depth = max(self.lags.values())
+        self.keep = self.depth + self.horizon  # slots of raw history carried per river
+
+        d = len(self.feature_names)
+        self.rivers = []
+        self.xtx = np.zeros((0, d, d))
+        self.xty = np.zeros((0, d, self.horizon))
+        self.n = np.zeros(0)
+        self.tail = {col: np.zeros((0, self.keep)) for col in self.columns}
+        self.last_slot = np.zeros(0, dtype=np.int64)
+        self.readings = np.zeros(0, dtype=np.int64)  # readings folded in per river
+        self.source = None  # signature of the source CSV when last saved
+        self.refit_reason = None  # set by load/sync when the model was rebuilt from scratch
+        self.weights = None
+
+    def config(self):
+        return {'version': MODEL_VERSION, 'horizon': self.horizon, 'lags': self.lags,
+                'ridge': self.ridge, 'slot_ns': self.slot_ns}
+
+    def _add_rivers(self, names):
+        new = [name for name in dict.fromkeys(names) if name not in self.rivers]
+        if new:
+            n, d = len(new), len(self.feature_names)
+            self.rivers.extend(new)
+            self.xtx = np.concatenate([self.xtx, np.zeros((n, d, d))])
+            self.xty = np.concatenate([self.xty, np.zeros((n, d, self.horizon))])
+            self.n = np.concatenate([self.n, np.zeros(n)])
+            self.tail = {col: np.vstack([tail, np.full((n, self.keep), np.nan)])
+                         for col, tail in self.tail.items()}
+            self.last_slot = np.concatenate([self.last_slot, np.full(n, NO_SLOT)])
+            self.readings = np.concatenate([self.readings, np.zeros(n, dtype=np.int64)])
+            self.weights = None
+
+    def design(self, matrices):
+        """Features X (rivers, slots, d) at each origin and targets Y (rivers, slots, horizon)"""
+        height = matrices['water_height_cm']
+        n_rivers, n_slots = height.shape
+        X = np.full((n_rivers, n_slots, len(self.feature_names)), np.nan)
+        X[:, :, 0] = 1.0
+        j = 1
+        for col in self.columns:
+            for k in range(self.lags[col]):
+                if k < n_slots:
+                    X[:, k:, j] = matrices[col][:, :n_slots - k]
+                j += 1
+        Y = np.full((n_rivers, n_slots, self.horizon), np.nan)
+        for h in range(1, min(self.horizon + 1, n_slots)):
+            Y[:, :n_slots - h, h - 1] = height[:, h:]
+        return X, Y
+
+    def update(self, data):
+        """Fold new readings into the per-river sufficient statistics"""
+        data = data.dropna(subset=['timestamp'])
+        if data.empty:
+            return self
+        names = data['river_name'].astype(str)
+        self._add_rivers(names.unique().tolist())
+        slots = data['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) // self.slot_ns
+        index = {river: i for i, river in enumerate(self.rivers)}
+        rows = np.array([index[name] for name in names], dtype=np.int64)
+        fresh = slots > self.last_slot[rows]  # late readings are ignored
+        if not fresh.any():
+            return self
+        rows, slots = rows[fresh], slots[fresh]
+        self.readings += np.bincount(rows, minlength=len(self.rivers))
+
+        touched, local = np.unique(rows, return_inverse=True)
+        last_new = np.full(len(touched), NO_SLOT)
+        np.maximum.at(last_new, local, slots)
+        prev_last = self.last_slot[touched]
+        known = prev_last != NO_SLOT
+
+        # Carried tail + new readings as one rivers x slots block
+        s0 = int(min(slots.min(), (last_new - self.keep + 1).min(),
+                     np.where(known, prev_last - self.keep + 1, slots.max()).min()))
+        n_slots = int(last_new.max()) - s0 + 1
+        tail_cols = (prev_last - self.keep + 1)[:, None] + np.arange(self.keep) - s0
+        tail_r, tail_c = np.nonzero(known[:, None] & (tail_cols >= 0))
+        matrices = {}
+        for col in self.columns:
+            block = np.full((len(touched), n_slots), np.nan)
+            block[tail_r, tail_cols[tail_r, tail_c]] = self.tail[col][touched][tail_r, tail_c]
+            block[local, slots - s0] = data[col].to_numpy(dtype=np.float64)[fresh]
+            matrices[col] = block
+
+        # Origins whose targets became complete with this batch
+        X, Y = self.design(matrices)
+        slot_axis = s0 + np.arange(n_slots)
+        counted_until = np.where(known, prev_last - self.horizon, NO_SLOT)
+        usable = ((slot_axis > counted_until[:, None]) & (slot_axis <= (last_new - self.horizon)[:, None])
+                  & ~np.isnan(X).any(axis=2) & ~np.isnan(Y).any(axis=2))
+        X = np.where(usable[:, :, None], X, 0.0)
+        Y = np.where(usable[:, :, None], Y, 0.0)
+        self.xtx[touched] += np.einsum('rtd,rte->rde', X, X)
+        self.xty[touched] += np.einsum('rtd,rth->rdh', X, Y)
+        self.n[touched] += usable.sum(axis=1)
+
+        keep_cols = (last_new - self.keep + 1 - s0)[:, None] + np.arange(self.keep)
+        for col in self.columns:
+            self.tail[col][touched] = np.take_along_axis(matrices[col], keep_cols, axis=1)
+        self.last_slot[touched] = last_new
+        self.weights = None
+        return self
+
+    def sync(self, data):
+        """Bring the model up to date with the full history in `data`
+
+        Rows after each river's last slot are folded in. If the rows at or
+        before it are not exactly the readings folded in so far (late or
+        removed rows), the model is refit from scratch on `data` and the
+        returned model's `refit_reason` says so.
+        """
+        data = data.dropna(subset=['timestamp'])
+        codes = pd.Index(self.rivers).get_indexer(data['river_name'].astype(str))
+        slots = data['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) // self.slot_ns
+        last = np.full(len(codes), NO_SLOT)
+        last[codes >= 0] = self.last_slot[codes[codes >= 0]]
+        seen = (codes >= 0) & (slots <= last)
+        if np.array_equal(np.bincount(codes[seen], minlength=len(self.rivers)), self.readings):
+            return self.update(data)
+        model = WaterLevelForecaster(self.horizon, self.lags, self.ridge, self.slot_ns / 3600e9)
+        model.source = self.source
+        model.refit_reason = 'late or removed readings'
+        return model.update(data)
+
+    def fit(self):
+        """Closed-form ridge solve for every river and horizon at once"""
+        d = len(self.feature_names)
+        penalty = self.ridge * np.einsum('rii->ri', self.xtx)
+        penalty[:, 0] = 0.0  # intercept is not shrunk
+        A = self.xtx + penalty[:, :, None] * np.eye(d)
+        fitted = self.n >= 2 * d
+        self.weights = np.full((len(self.rivers), d, self.horizon), np.nan)
+        if fitted.any():
+            self.weights[fitted] = np.linalg.solve(A[fitted], self.xty[fitted])
+        return self.weights
+
+    def _latest_features(self):
+        X, _ = self.design({col: self.tail[col] for col in self.columns})
+        return X[:, -1, :]
+
+    def predict(self):
+        """Forecast for the next `horizon` slots after each river's last reading"""
+        if self.weights is None:
+            self.fit()
+        forecast = np.einsum('rd,rdh->rh', self._latest_features(), self.weights)
+        # Rivers without a usable model (or a gap in the latest lags): persistence
+        persistence = self.tail['water_height_cm'][:, -1:]
+        forecast = np.where(np.isnan(forecast), persistence, forecast)
+
+        issued = (self.last_slot * self.slot_ns).astype('datetime64[ns]')
+        steps = np.arange(1, self.horizon + 1)
+        return pd.DataFrame({
+            'river_name': np.repeat(self.rivers, self.horizon),
+            'issued_at': np.repeat(issued, self.horizon),
+            'horizon_hours': np.tile(steps * self.slot_ns / 3600e9, len(self.rivers)),
+            'target_time': (np.repeat(self.last_slot, self.horizon) + np.tile(steps, len(self.rivers))) * self.slot_ns,
+            'forecast_cm': np.round(forecast.ravel(), 2)
+        }).astype({'target_time': 'datetime64[ns]'})
+
+    def coefficients(self):
+        """Fitted weights as a (river, feature) x horizon table"""
+        if self.weights is None:
+            self.fit()
+        index = pd.MultiIndex.from_product([self.rivers, self.feature_names], names=['river_name', 'feature'])
+        return pd.DataFrame(self.weights.reshape(-1, self.horizon), index=index,
+                            columns=[f'h{h}' for h in range(1, self.horizon + 1)])
+
+    def save(self, path, source_path=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if source_path is not None:
+            self.source = source_signature(source_path, self.source)
+        with open(f'{path}.tmp', 'wb') as f:
+            np.savez(f, config=json.dumps(self.config()), source=json.dumps(self.source),
+                     rivers=np.array(self.rivers, dtype=str), xtx=self.xtx, xty=self.xty, n=self.n,
+                     last_slot=self.last_slot, readings=self.readings,
+                     **{f'tail__{col}': self.tail[col] for col in self.columns})
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path, source_path=None, **kwargs):
+        """Cached model, or a fresh one if missing, built with other settings or for a rewritten source"""
+        model = cls(**kwargs)
+        if not os.path.exists(path):
+            return model
+        with np.load(path) as state:
+            if json.loads(str(state['config'])) != model.config():
+                return model
+            source = json.loads(str(state['source']))
+            if source_path is not None and not source_extends(source, source_path):
+                model.refit_reason = f'{source_path} was rewritten'
+                return model
+            model.source = source
+            model.rivers = state['rivers'].tolist()
+            model.xtx, model.xty, model.n = state['xtx'], state['xty'], state['n']
+            model.last_slot, model.readings = state['last_slot'], state['readings']
+            model.tail = {col: state[f'tail__{col}'] for col in model.columns}
+        return model
+
+def update_persisted_forecast(chunk, path, source_path=None):
+    """Incremental consumer: fold new rows into the cached model
+
+    Rows at or before their river's last slot are skipped here (they may
+    already be folded in); late ones make the next forecast stage refit.
+    """
+    model = WaterLevelForecaster.load(path, source_path=source_path)
+    model.update(chunk)
+    model.save(path, source_path)
+    return model
+
+def backtest(data, train_days=None, refit_hours=None, model=None):
+    """Walk-forward backtest: train, then forecast/refit every `refit_hours`
+
+    Returns per-horizon MAE/RMSE against a persistence baseline plus timings.
+    """
+    train_days = train_days or FORECAST_CONFIG['train_days']
+    refit_hours = refit_hours or FORECAST_CONFIG['refit_hours']
+    model = model or WaterLevelForecaster()
+    data = data.sort_values('timestamp', kind='stable')
+    train_end = data['timestamp'].min() + pd.Timedelta(days=train_days)
+
+    start = time.perf_counter()
+    model.update(data[data['timestamp'] < train_end])
+    train_seconds = time.perf_counter() - start
+
+    rivers = model.rivers + [r for r in data['river_name'].astype(str).unique() if r not in model.rivers]
+    model._add_rivers(rivers)
+    s0, matrices = river_matrix(data, model.columns, model.slot_ns, model.rivers)
+    X, Y = model.design(matrices)
+    slot_axis = s0 + np.arange(X.shape[1])
+    first_test = int(pd.Timestamp(train_end).value // model.slot_ns)
+    step = max(1, int(round(refit_hours * 3600e9 / model.slot_ns)))
+    slots = data['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) // model.slot_ns
+
+    forecast = np.full_like(Y, np.nan)
+    fit_seconds, update_seconds, refits = 0.0, 0.0, 0
+    for a in range(first_test, int(slot_axis[-1]) + 1, step):
+        t = time.perf_counter()
+        weights = model.fit()
+        fit_seconds += time.perf_counter() - t
+        refits += 1
+        cols = slice(a - s0, a - s0 + step)
+        forecast[:, cols] = np.einsum('rtd,rdh->rth', X[:, cols], weights)
+
+        t = time.perf_counter()
+        model.update(data[(slots >= a) & (slots < a + step)])
+        update_seconds += time.perf_counter() - t
+
+    t = time.perf_counter()
+    model.predict()
+    inference_ms = (time.perf_counter() - t) * 1000
+
+    test = slot_axis >= first_test
+    persistence = np.repeat(matrices['water_height_cm'][:, :, None], model.horizon, axis=2)
+    scored = test[None, :, None] & ~np.isnan(forecast) & ~np.isnan(Y)
+    rows = []
+    for h in range(model.horizon):
+        mask = scored[:, :, h]
+        error = (forecast[:, :, h] - Y[:, :, h])[mask]
+        baseline = (persistence[:, :, h] - Y[:, :, h])[mask]
+        rows.append({
+            'horizon_hours': (h + 1) * model.slot_ns / 3600e9,
+            'n': int(mask.sum()),
+            'mae_cm': float(np.abs(error).mean()),
+            'rmse_cm': float(np.sqrt((error ** 2).mean())),
+            'persistence_mae_cm': float(np.abs(baseline).mean()),
+            'skill': float(1 - np.abs(error).mean() / np.abs(baseline).mean())
+        })
+    return {
+        'accuracy': pd.DataFrame(rows),
+        'rivers': len(model.rivers),
+        'train_seconds': train_seconds,
+        'refits': refits,
+        'fit_ms_per_refit': fit_seconds / refits * 1000,
+        'update_ms_per_refit': update_seconds / refits * 1000,
+        'inference_ms_all_rivers': inference_ms,
+        'forecasts_scored': int(scored.sum())
+    }
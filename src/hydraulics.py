@@ -0,0 +1,145 @@
+"""Vectorized Manning flow with per-river channel geometry.
+
+    Q = A * R^(2/3) * sqrt(S) / n,   R = A / P
+
+for a trapezoidal cross-section of bottom width b and side slope z
+(horizontal per vertical): A = (b + z*h) * h, P = b + 2*h*sqrt(1 + z^2).
+A rectangular channel is z = 0 and a triangular one b = 0.
+
+Geometry (width, slope, roughness, profile) comes from HYDRAULICS_CONFIG:
+the defaults, overridden per river. The dataset's rivers are calibrated
+against the stored flows with `calibrate_slope`; fitting and checking on
+the same readings is circular, so `holdout_validation` fits on the earlier
+part of the record and validates on the later, held-out part. Flow for a whole dataset
+is one pass: river codes index the per-river parameter arrays. Stored
+`water_flow_m3s` values are checked in bulk with `validate_flow`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.config import HYDRAULICS_CONFIG
+from src.flood_dataset import FloodDataset
+
+PROFILES = ('rectangular', 'trapezoidal', 'triangular')
+
+def _river_key(river):
+    return str(river).replace('_', ' ')
+
+def channel_geometry(rivers, config=None):
+    """Width, side slope, bed slope and roughness per river (defaults for unknown rivers)"""
+    config = config or HYDRAULICS_CONFIG
+    overrides = {_river_key(river): params for river, params in config['rivers'].items()}
+    rows = []
+    for river in rivers:
+        params = {**config['default'], **overrides.get(_river_key(river), {})}
+        profile = params['profile']
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown channel profile for {river}: {profile}, expected one of {PROFILES}")
+        rows.append({
+            'river_name': str(river),
+            'profile': profile,
+            'width_m': 0.0 if profile == 'triangular' else float(params['width_m']),
+            'side_slope': 0.0 if profile == 'rectangular' else float(params['side_slope']),
+            'slope': float(params['slope']),
+            'roughness': float(params['roughness'])
+        })
+    return pd.DataFrame(rows, columns=['river_name', 'profile', 'width_m', 'side_slope',
+                                       'slope', 'roughness']).set_index('river_name')
+
+def manning_flow(water_height_cm, width_m, slope, roughness, side_slope=0.0, min_flow=None):
+    """Flow in m3/s for arrays of heights and (broadcastable) channel parameters"""
+    min_flow = HYDRAULICS_CONFIG['min_flow_m3s'] if min_flow is None else min_flow
+    h = np.asarray(water_height_cm, dtype=np.float64) / 100
+    area = (width_m + side_slope * h) * h
+    perimeter = width_m + 2 * h * np.sqrt(1 + np.square(side_slope))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        radius = np.where(perimeter > 0, area / perimeter, 0.0)
+    flow = area * np.cbrt(np.square(radius)) * np.sqrt(slope) / roughness
+    # NaN heights stay NaN (np.fmax would replace them with the minimum)
+    return np.maximum(flow, min_flow)
+
+def river_flow(data, config=None):
+    """Manning flow of every reading with its river's geometry, aligned with the data"""
+    frame = FloodDataset.wrap(data).data
+    codes, rivers = pd.factorize(frame['river_name'], sort=True)
+    geometry = channel_geometry(rivers, config)
+    params = {col: geometry[col].to_numpy()[codes] for col in ['width_m', 'side_slope', 'slope', 'roughness']}
+    flow = manning_flow(frame['water_height_cm'].to_numpy(dtype=np.float64), **params,
+                        min_flow=(config or HYDRAULICS_CONFIG)['min_flow_m3s'])
+    flow[codes < 0] = np.nan
+    return pd.Series(flow, index=frame.index, name='water_flow_computed')
+
+def backfill_flow(data, config=None):
+    """water_flow_m3s with missing values computed from the water height"""
+    frame = FloodDataset.wrap(data).data
+    stored = frame['water_flow_m3s'] if 'water_flow_m3s' in frame.columns else pd.Series(np.nan, index=frame.index)
+    return stored.fillna(river_flow(frame, config).astype(stored.dtype)).rename('water_flow_m3s')
+
+def flow_mismatch(data, computed=None, rtol=None, atol=None):
+    """Readings whose stored flow differs from Manning by more than max(atol, rtol * computed)"""
+    frame = FloodDataset.wrap(data).data
+    rtol = HYDRAULICS_CONFIG['flow_rtol'] if rtol is None else rtol
+    atol = HYDRAULICS_CONFIG['flow_atol_m3s'] if atol is None else atol
+    computed = river_flow(frame) if computed is None else computed
+    stored = frame['water_flow_m3s'].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        mismatch = np.abs(stored - computed.to_numpy()) > np.maximum(atol, rtol * computed.to_numpy())
+    return pd.Series(mismatch, index=frame.index, name='flow_mismatch')
+
+def validate_flow(data, rtol=None, atol=None, config=None):
+    """Stored vs computed flow per river: mismatches, error and bias (stored / computed)"""
+    frame = FloodDataset.wrap(data).data
+    computed = river_flow(frame, config)
+    mismatch = flow_mismatch(frame, computed, rtol, atol).to_numpy()
+    stored = frame['water_flow_m3s'].to_numpy(dtype=np.float64)
+    computed = computed.to_numpy()
+    checked = ~(np.isnan(stored) | np.isnan(computed))
+
+    codes, rivers = pd.factorize(frame['river_name'], sort=True)
+    n = len(rivers)
+
+    def per_river(values, mask=checked):
+        return np.bincount(codes[mask & (codes >= 0)], weights=values[mask & (codes >= 0)], minlength=n)
+
+    summary = pd.DataFrame({
+        'readings': np.bincount(codes[codes >= 0], minlength=n),
+        'checked': per_river(np.ones(len(codes))).astype(np.int64),
+        'missing_flow': per_river(np.ones(len(codes)), np.isnan(stored)).astype(np.int64),
+        'mismatched': per_river(mismatch.astype(np.float64)).astype(np.int64)
+    }, index=pd.Index([str(river) for river in rivers], name='river_name'))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary['mismatch_rate'] = (summary['mismatched'] / summary['checked']).round(4)
+        summary['mean_abs_error_m3s'] = (per_river(np.abs(stored - computed)) / summary['checked']).round(3)
+        summary['flow_ratio'] = (per_river(stored) / per_river(computed)).round(3)
+    return summary
+
+def calibrate_slope(data, config=None):
+    """Bed slope per river that best fits the stored flows (least squares, other geometry fixed)"""
+    frame = FloodDataset.wrap(data).data
+    codes, rivers = pd.factorize(frame['river_name'], sort=True)
+    geometry = channel_geometry(rivers, config)
+    params = {col: geometry[col].to_numpy()[codes] for col in ['width_m', 'side_slope', 'roughness']}
+    # Flow with sqrt(slope) = 1 and no minimum: stored ~ k * unit, k = sqrt(slope)
+    unit = manning_flow(frame['water_height_cm'].to_numpy(dtype=np.float64), slope=1.0, min_flow=0.0, **params)
+    stored = frame['water_flow_m3s'].to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(unit) | np.isnan(stored)) & (codes >= 0)
+    numerator = np.bincount(codes[valid], weights=unit[valid] * stored[valid], minlength=len(rivers))
+    denominator = np.bincount(codes[valid], weights=unit[valid] ** 2, minlength=len(rivers))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        geometry['slope'] = np.square(numerator / denominator)
+    return geometry
+
+def holdout_validation(data, holdout_fraction=None, rtol=None, atol=None):
+    """Slopes calibrated on the earlier readings, validated on the last `holdout_fraction` of the period"""
+    frame = FloodDataset.wrap(data).data
+    if holdout_fraction is None:
+        holdout_fraction = HYDRAULICS_CONFIG['holdout_fraction']
+    timestamps = frame['timestamp']
+    split = timestamps.min() + (timestamps.max() - timestamps.min()) * (1 - holdout_fraction)
+    geometry = calibrate_slope(frame[timestamps < split])
+    config = {**HYDRAULICS_CONFIG, 'rivers': geometry.to_dict(orient='index')}
+    summary = validate_flow(frame[timestamps >= split], rtol, atol, config)
+    summary['calibrated_slope'] = geometry['slope'].reindex(summary.index)
+    summary.attrs['split'] = split
+    return summary
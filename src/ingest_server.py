@@ -0,0 +1,390 @@
+"""Live sensor ingestion server.
+
+Devices POST readings (one JSON object, a JSON list, or NDJSON) to
+/readings, or keep a plain TCP connection open and stream one JSON reading
+per line. Readings are validated against the raw CSV schema, buffered in
+memory and flushed as columnar part files (Parquet when pyarrow is
+installed, otherwise .npz) once a batch is full or old enough.
+
+Dashboards follow the readings live on GET /live (see live_stream.py).
+
+Usage: python -m src.ingest_server [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import re
+import time
+import os
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.config import DATASET_SCHEMA, DATASET_ENUMS, INGEST_SERVER_CONFIG
+from src.data_cache import apply_schema, _pyarrow_available
+from src.live_stream import LiveStatusHub
+from src.alert_engine import AlertEngine
+
+RAW_COLUMNS = list(DATASET_SCHEMA)
+HTTP_METHODS = (b'GET ', b'POST ', b'PUT ', b'HEAD ', b'DELETE ', b'OPTIONS ')
+MAX_BODY_BYTES = 16 << 20
+PART_PATTERN = re.compile(r'part-(\d+)\.(?:parquet|npz)$')
+
+def validate_reading(reading):
+    """Validasi satu pembacaan terhadap skema CSV mentah; return (row, error)"""
+    if not isinstance(reading, dict):
+        return None, 'reading must be a JSON object'
+    missing = [col for col in RAW_COLUMNS if col not in reading]
+    if missing:
+        return None, f"missing columns: {', '.join(missing)}"
+
+    row = []
+    for col, dtype in DATASET_SCHEMA.items():
+        value = reading[col]
+        if dtype.startswith('datetime64'):
+            try:
+                value = datetime.fromisoformat(str(value))
+            except ValueError:
+                return None, f'{col}: invalid timestamp {value!r}'
+        elif dtype == 'category':
+            if not isinstance(value, str) or not value:
+                return None, f'{col}: expected a non-empty string'
+            if col in DATASET_ENUMS and value not in DATASET_ENUMS[col]:
+                return None, f'{col}: {value!r} not in {DATASET_ENUMS[col]}'
+        else:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return None, f'{col}: expected a number'
+            value = float(value)
+            if not math.isfinite(value):
+                return None, f'{col}: expected a finite number'
+        row.append(value)
+    return row, None
+
+def load_parts(output_dir=None):
+    """Gabungkan semua part file hasil flush menjadi satu DataFrame"""
+    output_dir = output_dir or INGEST_SERVER_CONFIG['output_dir']
+    frames = []
+    for path in sorted(glob.glob(os.path.join(output_dir, 'part-*'))):
+        if path.endswith('.parquet'):
+            frames.append(pd.read_parquet(path))
+        elif path.endswith('.npz'):
+            with np.load(path) as part:
+                frames.append(pd.DataFrame({col: part[col] for col in part.files}))
+    if not frames:
+        return pd.DataFrame(columns=RAW_COLUMNS)
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+class MicroBatchWriter:
+    """Buffers validated rows column-wise and flushes them as part files"""
+
+    def __init__(self, output_dir=None, max_rows=None, max_latency=None, file_format=None):
+        self.output_dir = output_dir or INGEST_SERVER_CONFIG['output_dir']
+        self.max_rows = max_rows or INGEST_SERVER_CONFIG['batch_max_rows']
+        self.max_latency = max_latency or INGEST_SERVER_CONFIG['batch_max_latency_s']
+        self.file_format = file_format or ('parquet' if _pyarrow_available() else 'npz')
+        self.consumers = []
+        self.flush_stats = deque(maxlen=1000)
+        self.rows_written = 0
+        self.rows_rejected = 0
+
+        self._buffer = {col: [] for col in RAW_COLUMNS}
+        self._pending = 0
+        self._oldest = None
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._sequence = self.next_sequence()
+
+    def next_sequence(self):
+        """Nomor part berikutnya: setelah part terbesar yang ada (tanpa sisa .tmp)"""
+        indices = [int(match.group(1)) for match in map(PART_PATTERN.match, os.listdir(self.output_dir)) if match]
+        return max(indices, default=-1) + 1
+
+    def add_consumer(self, consumer):
+        """Register a callable that receives each flushed batch (DataFrame)"""
+        self.consumers.append(consumer)
+        return consumer
+
+    def add(self, rows):
+        """Append validated rows; schedule a flush once the batch is full"""
+        if not rows:
+            return
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        for col, values in zip(RAW_COLUMNS, zip(*rows)):
+            self._buffer[col].extend(values)
+        self._pending += len(rows)
+
+        if self._pending >= self.max_rows:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _write_part(self, buffer, sequence):
+        batch = apply_schema(pd.DataFrame(buffer))
+        name = f'part-{sequence:08d}.{self.file_format}'
+        path = os.path.join(self.output_dir, name)
+        tmp_path = f'{path}.tmp'
+        if self.file_format == 'parquet':
+            batch.to_parquet(tmp_path, index=False)
+        else:
+            columns = {col: batch[col].to_numpy(dtype=str) if isinstance(batch[col].dtype, pd.CategoricalDtype)
+                       else batch[col].to_numpy() for col in batch.columns}
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **columns)
+        os.replace(tmp_path, path)
+        return batch, path
+
+    async def flush(self):
+        """Write the buffered rows as one part file (off the event loop)"""
+        async with self._lock:
+            if not self._pending:
+                return None
+            start = time.perf_counter()
+            buffer, self._buffer = self._buffer, {col: [] for col in RAW_COLUMNS}
+            pending, oldest = self._pending, self._oldest
+            self._pending, self._oldest = 0, None
+            try:
+                batch, path = await asyncio.get_running_loop().run_in_executor(
+                    None, self._write_part, buffer, self._sequence)
+            except BaseException:
+                # Batch gagal ditulis: kembalikan ke depan buffer (sebelum baris yang masuk sejak itu)
+                self._buffer = {col: buffer[col] + self._buffer[col] for col in RAW_COLUMNS}
+                self._pending += pending
+                self._oldest = oldest
+                raise
+            self._sequence += 1
+            seconds = time.perf_counter() - start
+
+            self.rows_written += len(batch)
+            self.flush_stats.append({'rows': len(batch), 'seconds': seconds, 'path': path})
+            for consumer in self.consumers:
+                consumer(batch)
+            return path
+
+    async def run_timer(self):
+        """Flush batches that have waited longer than max_latency"""
+        while True:
+            await asyncio.sleep(self.max_latency / 4)
+            if self._oldest is not None and time.monotonic() - self._oldest >= self.max_latency:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    # Batch tetap di buffer dan dicoba lagi pada tick berikutnya
+                    print(f"Flush failed: {e!r}")
+
+    def metrics(self):
+        """Ringkasan waktu flush batch"""
+        seconds = np.array([s['seconds'] for s in self.flush_stats])
+        rows = np.array([s['rows'] for s in self.flush_stats])
+        report = {
+            'format': self.file_format,
+            'batches': len(self.flush_stats),
+            'rows_written': self.rows_written,
+            'rows_rejected': self.rows_rejected,
+            'rows_pending': self._pending
+        }
+        if len(seconds):
+            report.update({
+                'flush_ms_p50': round(float(np.percentile(seconds, 50)) * 1000, 3),
+                'flush_ms_p95': round(float(np.percentile(seconds, 95)) * 1000, 3),
+                'flush_ms_max': round(float(seconds.max()) * 1000, 3),
+                'rows_per_batch_mean': round(float(rows.mean()), 1),
+                'flush_rows_per_s': round(float(rows.sum() / seconds.sum()), 1)
+            })
+        return report
+
+class IngestServer:
+    """asyncio HTTP + line-protocol front end for a MicroBatchWriter"""
+
+    def __init__(self, writer=None, host=None, port=None):
+        self.writer = writer or MicroBatchWriter()
+        self.host = host or INGEST_SERVER_CONFIG['host']
+        self.port = INGEST_SERVER_CONFIG['port'] if port is None else port
+        self.routes = {
+            ('POST', '/readings'): self.post_readings,
+            ('GET', '/health'): lambda request: (200, {'status': 'ok'}),
+            ('GET', '/metrics'): lambda request: (200, self.writer.metrics())
+        }
+        self.streams = {}
+        self._server = None
+        self._timer = None
+        self._connections = set()
+
+    def ingest(self, readings):
+        """Validate readings and buffer the good ones; return the rejects"""
+        rows, rejected = [], []
+        for index, reading in enumerate(readings):
+            row, error = validate_reading(reading)
+            if error:
+                rejected.append({'index': index, 'error': error})
+            else:
+                rows.append(row)
+        self.writer.add(rows)
+        self.writer.rows_rejected += len(rejected)
+        return len(rows), rejected
+
+    def post_readings(self, request):
+        body = request['body']
+        try:
+            if 'ndjson' in request['headers'].get('content-type', ''):
+                readings = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                readings = json.loads(body)
+        except ValueError as e:
+            return 400, {'error': f'invalid JSON: {e}'}
+        if isinstance(readings, dict):
+            readings = [readings]
+        if not isinstance(readings, list):
+            return 400, {'error': 'expected a JSON object or a list of objects'}
+        accepted, rejected = self.ingest(readings)
+        return 202 if accepted or not rejected else 400, {'accepted': accepted, 'rejected': rejected}
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            first_line = await reader.readline()
+            if first_line.startswith(HTTP_METHODS):
+                await self._serve_http(first_line, reader, writer)
+            else:
+                await self._serve_stream(first_line, reader)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _serve_stream(self, line, reader):
+        # Line protocol: one JSON reading per line, no acknowledgements
+        while line:
+            if line.strip():
+                try:
+                    self.ingest([json.loads(line)])
+                except ValueError:
+                    self.writer.rows_rejected += 1
+            line = await reader.readline()
+
+    async def _serve_http(self, request_line, reader, writer):
+        while request_line:
+            parts = request_line.decode('latin-1').split()
+            method, path = parts[:2] if len(parts) >= 2 else (None, None)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            length = headers.get('content-length', '0')
+            length = int(length) if length.isdigit() else -1
+            if method is None or length < 0:
+                # Request rusak: body tidak bisa dilewati, jadi koneksi ditutup
+                status, payload = 400, {'error': 'malformed request line or content-length'}
+                headers['connection'] = 'close'
+            elif length > MAX_BODY_BYTES:
+                status, payload = 413, {'error': 'request body too large'}
+                headers['connection'] = 'close'
+            else:
+                body = await reader.readexactly(length) if length else b''
+                request = {'method': method, 'path': path, 'headers': headers, 'body': body}
+                route = (method, path.split('?')[0])
+                if route in self.streams:
+                    # Long-lived response: the stream handler owns the connection
+                    await self.streams[route](request, writer)
+                    break
+                handler = self.routes.get(route)
+                if handler is None:
+                    status, payload = 404, {'error': f'no route for {method} {path}'}
+                else:
+                    try:
+                        status, payload = handler(request)
+                    except Exception as e:
+                        # Handler gagal: klien tetap mendapat respons, koneksi tidak diputus
+                        print(f"Handler for {method} {path} failed: {e!r}")
+                        status, payload = 500, {'error': 'internal server error'}
+
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            content = json.dumps(payload).encode()
+            writer.write(
+                f'HTTP/1.1 {status} {"OK" if status < 300 else "Error"}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(content)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + content)
+            await writer.drain()
+            if not keep_alive:
+                break
+            request_line = await reader.readline()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._timer = asyncio.get_running_loop().create_task(self.writer.run_timer())
+        print(f"Ingestion server listening on {self.host}:{self.port} "
+              f"(batch {self.writer.max_rows} rows / {self.writer.max_latency}s, {self.writer.file_format})")
+        return self
+
+    async def stop(self):
+        """Stop accepting connections and flush what is still buffered"""
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._timer.cancel()
+        await self.writer.flush()
+
+class AlertPublisher:
+    """Evaluates the early-warning rules on every flushed batch"""
+
+    def __init__(self, engine, hub=None):
+        self.engine = engine
+        self.hub = hub
+
+    def __call__(self, batch):
+        alerts = self.engine.process(batch)
+        if len(alerts):
+            print(f"Alerts: {len(alerts)} raised ({', '.join(sorted(set(alerts['rule'])))})")
+            if self.hub is not None:
+                records = alerts.assign(timestamp=alerts['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S'))
+                self.hub.broadcast('alert', {'alerts': records.to_dict(orient='records')})
+        return alerts
+
+    def attach(self, server):
+        server.writer.add_consumer(self)
+        server.routes[('GET', '/alerts')] = lambda request: (200, {
+            'active': self.engine.active_alerts().astype({'last_reading_at': str}).to_dict(orient='records'),
+            'metrics': self.engine.metrics()
+        })
+        return self
+
+async def serve(host=None, port=None, output_dir=None, duration=None):
+    """Run the server until cancelled (or for `duration` seconds)"""
+    server = IngestServer(MicroBatchWriter(output_dir), host, port)
+    hub = LiveStatusHub().attach(server)
+    AlertPublisher(AlertEngine(), hub).attach(server)
+    await server.start()
+    try:
+        await asyncio.sleep(duration if duration is not None else math.inf)
+    finally:
+        await server.stop()
+        print(f"Flush report: {json.dumps(server.writer.metrics())}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Live IoT sensor ingestion server')
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--output-dir', default=None, help='directory for flushed part files')
+    parser.add_argument('--duration', type=float, default=None, help='stop after N seconds')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.output_dir, args.duration))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
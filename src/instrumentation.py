@@ -0,0 +1,350 @@
+"""Lightweight stage instrumentation.
+
+`instrumented` (decorator) and `METRICS.span(name)` (context manager)
+record, per stage: wall time, CPU time, rows in and out, and the peak RSS
+of the process while the stage was running (sampled from /proc by one
+background thread, only while a span is open). Spans nest; each record
+keeps its parent.
+
+CPU time is kept twice: `cpu_seconds` is the CPU of the thread running the
+stage only (work handed to executor threads or worker processes is not in
+it); `process_cpu_seconds` is the whole process plus worker processes that
+finished during the span, so it also counts stages running concurrently.
+
+Totals per stage are written as a Prometheus text file (`.prom`) or a JSON
+report (`.json`), added to the totals already in that file (the metrics are
+counters); a run in which no stage ran leaves the file as it is. One stage at a time can be captured with cProfile (or
+pyinstrument, if installed): `METRICS.profile_stage = 'FloodDataAnalyzer.basic_statistics'`.
+
+Plots rendered in worker processes (render_all with workers > 1) are
+recorded in those processes only; render_all reports their timings itself.
+"""
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from collections import deque
+import sys
+import os
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+from utils.config import INSTRUMENTATION_CONFIG
+
+METRIC_PREFIX = 'flood_stage'
+
+# Prometheus metric, totals key, type, help
+PROM_METRICS = [
+    ('calls_total', 'calls', 'counter', 'Stage runs'),
+    ('errors_total', 'errors', 'counter', 'Stage runs that raised'),
+    ('wall_seconds_total', 'wall_seconds', 'counter', 'Wall time spent in the stage'),
+    ('cpu_seconds_total', 'cpu_seconds', 'counter', 'CPU time of the thread running the stage only'),
+    ('process_cpu_seconds_total', 'process_cpu_seconds', 'counter',
+     'CPU time of the process and its finished workers while the stage ran (overlaps concurrent stages)'),
+    ('rows_in_total', 'rows_in', 'counter', 'Rows passed into the stage'),
+    ('rows_out_total', 'rows_out', 'counter', 'Rows returned by the stage'),
+    ('peak_rss_bytes', 'peak_rss_mb', 'gauge', 'Peak process RSS while the stage ran')
+]
+PROM_LINE = re.compile(rf'^{METRIC_PREFIX}_(\w+)\{{stage="((?:[^"\\]|\\.)*)"\}} (\S+)$')
+
+def _process_cpu():
+    """CPU seconds of this process and of its children that have been waited for"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def read_totals(path):
+    """Totals per stage from a metrics file written by `MetricsRegistry.write` ({} if none)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        if path.endswith('.json'):
+            return json.load(f).get('stages', {})
+        keys = {metric: key for metric, key, _, _ in PROM_METRICS}
+        totals = {}
+        for line in f:
+            match = PROM_LINE.match(line.strip())
+            if match is None or match.group(1) not in keys:
+                continue
+            metric, label, value = match.groups()
+            name = re.sub(r'\\(.)', r'\1', label)
+            value = float(value) / 2**20 if metric == 'peak_rss_bytes' else float(value)
+            totals.setdefault(name, {})[keys[metric]] = value
+        return totals
+
+def _current_rss():
+    """Resident set size in bytes (None where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _max_rss():
+    """Process high-water RSS in bytes (KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def count_rows(value):
+    """Rows of a DataFrame/Series/array or of a FloodDataset; None otherwise"""
+    shape = getattr(value, 'shape', None)
+    if shape:
+        return int(shape[0])
+    # By class name, so this module does not import pandas
+    data = getattr(value, 'data', None) if type(value).__name__ == 'FloodDataset' else None
+    return int(data.shape[0]) if data is not None else None
+
+def _rows_in(args):
+    """Input rows: first argument with rows, or the instance's data (never loaded lazily)"""
+    for arg in args:
+        rows = count_rows(arg)
+        if rows is not None:
+            return rows
+        attributes = getattr(arg, '__dict__', {})
+        for name in ('data', 'dataset', '_dataset'):
+            rows = count_rows(attributes.get(name))
+            if rows is not None:
+                return rows
+    return None
+
+class Span:
+    """One open stage: set `rows_in` / `rows_out` inside the with-block if known"""
+
+    def __init__(self, name, parent, rows_in=None):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak_rss = None
+
+class MetricsRegistry:
+    """Per-process stage metrics (thread-safe; stages may run concurrently)"""
+
+    def __init__(self, config=None):
+        self.config = {**INSTRUMENTATION_CONFIG, **(config or {})}
+        self.enabled = self.config['enabled']
+        self.profile_stage = None
+        self.profiler = self.config['profiler']
+        self.profiles = {}
+        self.records = deque(maxlen=self.config['max_records'])
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = set()
+        self._sampler = None
+        self._profiling = False
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            self.totals.clear()
+            self.profiles.clear()
+
+    # RSS sampling thread: runs only while at least one span is open
+    def _sample_rss(self):
+        interval = self.config['rss_sample_interval_s']
+        while True:
+            rss = _current_rss()
+            with self._lock:
+                if not self._open:
+                    self._sampler = None
+                    return
+                for span in self._open:
+                    if rss is not None and (span.peak_rss is None or rss > span.peak_rss):
+                        span.peak_rss = rss
+            time.sleep(interval)
+
+    def _open_span(self, span):
+        with self._lock:
+            self._open.add(span)
+            if self._sampler is None and _current_rss() is not None:
+                self._sampler = threading.Thread(target=self._sample_rss, name='rss-sampler', daemon=True)
+                self._sampler.start()
+
+    def _close_span(self, span, record):
+        rss = _current_rss()
+        with self._lock:
+            self._open.discard(span)
+            if rss is None:
+                record['peak_rss_mb'] = None if _max_rss() is None else round(_max_rss() / 2**20, 1)
+            else:
+                record['peak_rss_mb'] = round(max(rss, span.peak_rss or 0) / 2**20, 1)
+            self.records.append(record)
+            total = self.totals.setdefault(span.name, {
+                'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'process_cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak_rss_mb': 0.0
+            })
+            total['calls'] += 1
+            total['errors'] += record['status'] == 'error'
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            total['process_cpu_seconds'] += record['process_cpu_seconds']
+            total['rows_in'] += record['rows_in'] or 0
+            total['rows_out'] += record['rows_out'] or 0
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'] or 0.0)
+
+    def span(self, name, rows_in=None):
+        """Context manager recording one stage run"""
+        return _SpanContext(self, name, rows_in)
+
+    def _start_profile(self, name):
+        with self._lock:
+            if self._profiling or name != self.profile_stage:
+                return None
+            self._profiling = True
+        if self.profiler == 'pyinstrument' and pyinstrument is not None:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop_profile(self, name, profiler):
+        os.makedirs(self.config['profile_dir'], exist_ok=True)
+        base = os.path.join(self.config['profile_dir'], name.replace('/', '_'))
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            profiler.dump_stats(f'{base}.pstats')
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(self.config['profile_top'])
+            path, text = f'{base}.pstats', summary.getvalue()
+        else:
+            profiler.stop()
+            path, text = f'{base}.html', profiler.output_text()
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        with open(f'{base}.txt', 'w') as f:
+            f.write(text)
+        with self._lock:
+            self.profiles[name] = path
+            self._profiling = False
+
+    def summary(self):
+        with self._lock:
+            return {name: {**total, 'wall_seconds': round(total['wall_seconds'], 4),
+                           'cpu_seconds': round(total['cpu_seconds'], 4),
+                           'process_cpu_seconds': round(total['process_cpu_seconds'], 4)}
+                    for name, total in self.totals.items()}
+
+    def merged(self, previous):
+        """Summary added to previous totals (counters summed, peak RSS the maximum)"""
+        merged = {name: dict(total) for name, total in previous.items()}
+        for name, total in self.summary().items():
+            before = merged.setdefault(name, {})
+            for key, value in total.items():
+                if key == 'peak_rss_mb':
+                    before[key] = max(before.get(key, 0.0), value)
+                else:
+                    before[key] = round(before.get(key, 0) + value, 4)
+        return merged
+
+    def to_json(self, stages=None):
+        with self._lock:
+            records = list(self.records)
+        return {'stages': stages or self.summary(), 'records': records, 'profiles': dict(self.profiles)}
+
+    def to_prometheus(self, stages=None):
+        """Totals per stage in the Prometheus text exposition format"""
+        summary = stages or self.summary()
+        lines = []
+        for metric, key, kind, help_text in PROM_METRICS:
+            lines.append(f'# HELP {METRIC_PREFIX}_{metric} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{metric} {kind}')
+            for name, total in summary.items():
+                value = total.get(key, 0)
+                value = int(value * 2**20) if key == 'peak_rss_mb' else value
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{METRIC_PREFIX}_{metric}{{stage="{label}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Add this run's totals to the metrics file: JSON report for *.json, Prometheus text otherwise
+
+        Returns the path, or None if no stage ran (the file is left as it is).
+        """
+        if not self.totals:
+            return None
+        stages = self.merged(read_totals(path))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        payload = (json.dumps(self.to_json(stages), indent=2, default=str) if path.endswith('.json')
+                   else self.to_prometheus(stages))
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(payload)
+        os.replace(f'{path}.tmp', path)
+        return path
+
+class _SpanContext:
+    def __init__(self, registry, name, rows_in):
+        self.registry = registry
+        self.name = name
+        self.rows_in = rows_in
+
+    def __enter__(self):
+        registry = self.registry
+        stack = registry._local.__dict__.setdefault('stack', [])
+        self.span = Span(self.name, stack[-1].name if stack else None, self.rows_in)
+        if not registry.enabled:
+            return self.span
+        stack.append(self.span)
+        registry._open_span(self.span)
+        self.profiler = registry._start_profile(self.name)
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.process_cpu = _process_cpu()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        registry = self.registry
+        if not registry.enabled:
+            return False
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        process_cpu = _process_cpu() - self.process_cpu
+        if self.profiler is not None:
+            registry._stop_profile(self.name, self.profiler)
+        registry._local.stack.pop()
+        registry._close_span(self.span, {
+            'stage': self.name,
+            'parent': self.span.parent,
+            'status': 'error' if exc_type else 'ok',
+            'started': time.time() - wall,
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'process_cpu_seconds': round(process_cpu, 6),
+            'rows_in': self.span.rows_in,
+            'rows_out': self.span.rows_out
+        })
+        return False
+
+# One registry per process
+METRICS = MetricsRegistry()
+
+def instrumented(func=None, name=None):
+    """Decorator: record each call as a stage (default name: Class.method)"""
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    stage_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS.enabled:
+            return func(*args, **kwargs)
+        with METRICS.span(stage_name, rows_in=_rows_in(args)) as span:
+            result = func(*args, **kwargs)
+            span.rows_out = count_rows(result)
+            return result
+    return wrapper
@@ -0,0 +1,177 @@
+"""Live river status stream for the dashboard.
+
+Every flushed ingestion batch is appended to a fixed-size, array-backed
+ring buffer per river. A river is pushed to the connected dashboards
+(Server-Sent Events on GET /live) only when its status changes or its
+level moved by at least `level_tolerance_cm` since the last push. Each
+delta is encoded once and shared by all clients, so the cost follows the
+number of changes, not clients x full payload.
+"""
+import asyncio
+import json
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from utils.config import LIVE_STREAM_CONFIG
+from src.data_exporter import river_status
+
+class RiverRingBuffer:
+    """Last `capacity` readings of one river in preallocated arrays"""
+
+    FIELDS = ('water_height_cm', 'water_flow_m3s', 'rainfall_mm')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype='datetime64[ns]')
+        self.values = np.full((capacity, len(self.FIELDS)), np.nan, dtype=np.float32)
+        self.head = 0  # next write position
+        self.size = 0
+
+    def extend(self, timestamps, values):
+        """Append readings in arrival order, overwriting the oldest"""
+        if len(timestamps) > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+        index = (self.head + np.arange(len(timestamps))) % self.capacity
+        self.timestamp[index] = timestamps
+        self.values[index] = values
+        self.head = (self.head + len(timestamps)) % self.capacity
+        self.size = min(self.size + len(timestamps), self.capacity)
+
+    def ordered_index(self):
+        return (self.head - self.size + np.arange(self.size)) % self.capacity
+
+    def latest(self):
+        """Newest reading as a JSON-ready dict"""
+        i = (self.head - 1) % self.capacity
+        reading = {'timestamp': str(self.timestamp[i].astype('datetime64[s]'))}
+        for field, value in zip(self.FIELDS, self.values[i]):
+            reading[field] = None if np.isnan(value) else round(float(value), 3)
+        reading['status'] = river_status(reading['water_height_cm'])
+        return reading
+
+    def recent(self, n=None):
+        """Last n readings (oldest first) as columnar lists"""
+        index = self.ordered_index()[-n:] if n else self.ordered_index()
+        recent = {'t': np.datetime_as_string(self.timestamp[index], unit='s').tolist()}
+        for j, field in enumerate(self.FIELDS):
+            recent[field] = np.round(self.values[index, j].astype(np.float64), 3).tolist()
+        return recent
+
+class LiveStatusHub:
+    """Ring buffers per river plus the SSE fan-out of status deltas"""
+
+    def __init__(self, capacity=None, tolerance_cm=None, queue_size=None):
+        self.capacity = capacity or LIVE_STREAM_CONFIG['ring_capacity']
+        self.tolerance_cm = LIVE_STREAM_CONFIG['level_tolerance_cm'] if tolerance_cm is None else tolerance_cm
+        self.queue_size = queue_size or LIVE_STREAM_CONFIG['client_queue_size']
+        self.buffers = {}
+        self.published = {}  # last state pushed per river
+        self.clients = set()
+        self.event_id = 0
+        self.events_sent = 0
+        self._snapshot_event = None
+
+    def ingest(self, batch):
+        """Consumer for MicroBatchWriter: buffer a batch, broadcast what changed"""
+        if batch.empty:
+            return {}
+        batch = batch.sort_values('timestamp', kind='stable')
+        codes = pd.Categorical(batch['river_name'])
+        timestamps = batch['timestamp'].to_numpy(dtype='datetime64[ns]')
+        values = np.column_stack([batch[field].to_numpy(dtype=np.float32)
+                                  for field in RiverRingBuffer.FIELDS])
+
+        # Group rows by river without a per-row Python loop
+        order = np.argsort(codes.codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes.codes[order])) + 1
+        deltas = {}
+        for rows in np.split(order, bounds):
+            river = str(codes[rows[0]])
+            buffer = self.buffers.get(river)
+            if buffer is None:
+                buffer = self.buffers[river] = RiverRingBuffer(self.capacity)
+            buffer.extend(timestamps[rows], values[rows])
+
+            reading = buffer.latest()
+            previous = self.published.get(river)
+            if (previous is None or previous['status'] != reading['status']
+                    or abs(reading['water_height_cm'] - previous['water_height_cm']) >= self.tolerance_cm):
+                deltas[river] = self.published[river] = reading
+
+        if deltas:
+            self._snapshot_event = None
+            self.broadcast('delta', {'rivers': deltas})
+        return deltas
+
+    def _encode(self, event, payload):
+        self.event_id += 1
+        return f"id: {self.event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n".encode()
+
+    def broadcast(self, event, payload):
+        """Encode once and queue for every client; drop clients that lag behind"""
+        message = self._encode(event, payload)
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # The browser reconnects and resyncs from a fresh snapshot
+                self.clients.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+        self.events_sent += len(self.clients)
+
+    def snapshot(self):
+        return {'rivers': dict(sorted(self.published.items()))}
+
+    async def stream(self, request, writer):
+        """GET /live: snapshot on connect, then deltas as they happen"""
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n'
+                     b'Connection: keep-alive\r\n\r\n')
+        if self._snapshot_event is None:
+            self._snapshot_event = self._encode('snapshot', self.snapshot())
+        writer.write(self._snapshot_event)
+        await writer.drain()
+
+        queue = asyncio.Queue(self.queue_size)
+        self.clients.add(queue)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), LIVE_STREAM_CONFIG['keepalive_s'])
+                except asyncio.TimeoutError:
+                    message = b': keepalive\n\n'
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.clients.discard(queue)
+
+    def recent(self, request):
+        """GET /live/recent?river=<name>&n=<count>: last n readings (0 or none: the whole ring buffer)"""
+        query = parse_qs(urlsplit(request['path']).query)
+        river = query.get('river', [None])[0]
+        if river not in self.buffers:
+            return 404, {'error': f'no live readings for river {river!r}'}
+        n = query.get('n', ['0'])[0]
+        if not (n.isascii() and n.isdigit()):
+            return 400, {'error': f'n must be a non-negative integer, got {n!r}'}
+        # n = 0: seluruh ring buffer; lebih dari kapasitas dibatasi
+        n = min(int(n), self.capacity) or None
+        return 200, {'river': river, **self.buffers[river].recent(n)}
+
+    def metrics(self):
+        return {'clients': len(self.clients), 'rivers': len(self.buffers),
+                'events': self.event_id, 'messages_queued': self.events_sent}
+
+    def attach(self, server):
+        """Wire the hub into an IngestServer"""
+        server.writer.add_consumer(self.ingest)
+        server.streams[('GET', '/live')] = self.stream
+        server.routes[('GET', '/live/snapshot')] = lambda request: (200, self.snapshot())
+        server.routes[('GET', '/live/recent')] = self.recent
+        server.routes[('GET', '/live/metrics')] = lambda request: (200, self.metrics())
+        return self
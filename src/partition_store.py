@@ -0,0 +1,173 @@
+"""River/month partitioned storage of the sensor readings.
+
+Readings are laid out Hive-style, one directory per river and month:
+
+    <root>/river=Bomo%20River/month=2024-03/part-00000000.npz
+
+Each part is a columnar file (Parquet when pyarrow is installed, otherwise
+.npz). A query with river and/or time-range predicates only lists the
+directory names and reads the partitions that can match. The store follows
+the raw CSV through its own FloodDataIngestor state, so a sync only writes
+the rows appended since the previous one; the small parts this produces are
+merged by `compact`. The signature of the CSV at the last sync is kept, so a
+rewritten CSV triggers a rebuild and `matches` tells whether the store holds
+exactly the rows of a given CSV.
+"""
+import glob
+import json
+import shutil
+import os
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from utils.config import DATASET_SCHEMA, FILE_PATHS, STORE_CONFIG
+from src.data_cache import apply_schema, _pyarrow_available, source_signature, source_extends
+from src.data_ingestor import FloodDataIngestor
+
+def _part_sequence(path):
+    return int(os.path.basename(path).split('.')[0].split('-')[1])
+
+class PartitionedFloodStore:
+    """Readings partitioned by river and month with partition pruning"""
+
+    def __init__(self, root=None, file_format=None):
+        self.root = root or FILE_PATHS['store_dir']
+        file_format = file_format or STORE_CONFIG['format']
+        if file_format == 'auto':
+            file_format = 'parquet' if _pyarrow_available() else 'npz'
+        self.file_format = file_format
+        self.state_path = os.path.join(self.root, '_ingest_state.json')
+        self.source_path = os.path.join(self.root, '_source.json')
+
+    def partition_dir(self, river, month):
+        return os.path.join(self.root, f'river={quote(str(river), safe="")}', f'month={month}')
+
+    def partitions(self, rivers=None, start=None, end=None):
+        """Partitions matching the predicates (from directory names only)"""
+        wanted = None if rivers is None else {str(river) for river in rivers}
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        rows = []
+        for river_dir in sorted(glob.glob(os.path.join(self.root, 'river=*'))):
+            river = unquote(os.path.basename(river_dir)[len('river='):])
+            if wanted is not None and river not in wanted:
+                continue
+            for month_dir in sorted(glob.glob(os.path.join(river_dir, 'month=*'))):
+                month = pd.Period(os.path.basename(month_dir)[len('month='):], freq='M')
+                if start is not None and month.end_time < start:
+                    continue
+                if end is not None and month.start_time > end:
+                    continue
+                parts = sorted(glob.glob(os.path.join(month_dir, f'part-*.{self.file_format}')))
+                if parts:
+                    rows.append({'river_name': river, 'month': str(month), 'path': month_dir, 'parts': parts})
+        return pd.DataFrame(rows, columns=['river_name', 'month', 'path', 'parts'])
+
+    def _read_part(self, path, columns):
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path, columns=columns)
+        with np.load(path) as part:
+            return pd.DataFrame({col: part[col] for col in (columns or part.files)})
+
+    def _write_part(self, data, directory):
+        os.makedirs(directory, exist_ok=True)
+        existing = glob.glob(os.path.join(directory, 'part-*'))
+        sequence = max((_part_sequence(path) for path in existing), default=-1) + 1
+        path = os.path.join(directory, f'part-{sequence:08d}.{self.file_format}')
+        tmp_path = f'{path}.tmp'
+        if self.file_format == 'parquet':
+            data.to_parquet(tmp_path, index=False)
+        else:
+            columns = {col: data[col].to_numpy(dtype=str) if isinstance(data[col].dtype, pd.CategoricalDtype)
+                       else data[col].to_numpy() for col in data.columns}
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **columns)
+        os.replace(tmp_path, path)
+        return path
+
+    def append(self, data):
+        """Write new readings as one part per (river, month); returns rows per partition"""
+        if data.empty:
+            return {}
+        months = data['timestamp'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+        written = {}
+        for (river, month), rows in data.groupby([data['river_name'].astype(str), months],
+                                                 sort=True, observed=True).indices.items():
+            month = str(month)[:7]
+            self._write_part(data.iloc[rows], self.partition_dir(river, month))
+            written[(river, month)] = len(rows)
+        return written
+
+    def query(self, rivers=None, start=None, end=None, columns=None):
+        """Readings of the given rivers within [start, end], reading only matching partitions"""
+        columns = list(columns) if columns else None
+        read_columns = None if columns is None else columns + [col for col in ('timestamp', 'river_name')
+                                                                if col not in columns]
+        frames = [self._read_part(path, read_columns)
+                  for parts in self.partitions(rivers, start, end)['parts'] for path in parts]
+        if not frames:
+            return apply_schema(pd.DataFrame(columns=columns or list(DATASET_SCHEMA)))
+        data = apply_schema(pd.concat(frames, ignore_index=True))
+        if start is not None or end is not None:
+            keep = np.ones(len(data), dtype=bool)
+            if start is not None:
+                keep &= (data['timestamp'] >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                keep &= (data['timestamp'] <= pd.Timestamp(end)).to_numpy()
+            data = data[keep]
+        data = data.sort_values(['timestamp', 'river_name'], kind='stable', ignore_index=True)
+        return data[columns] if columns else data
+
+    def compact(self, min_files=None):
+        """Merge partitions with at least `min_files` parts into a single part"""
+        min_files = min_files or STORE_CONFIG['compact_min_files']
+        compacted = 0
+        for partition in self.partitions().itertuples():
+            if len(partition.parts) < min_files:
+                continue
+            merged = pd.concat([self._read_part(path, None) for path in partition.parts], ignore_index=True)
+            merged = apply_schema(merged).sort_values('timestamp', kind='stable')
+            # New part first, then drop the old ones (readers never see missing rows)
+            self._write_part(merged, partition.path)
+            for path in partition.parts:
+                os.remove(path)
+            compacted += 1
+        return compacted
+
+    def source(self):
+        """Signature of the raw CSV at the last sync (None if never synced)"""
+        if not os.path.exists(self.source_path):
+            return None
+        with open(self.source_path) as f:
+            return json.load(f)
+
+    def matches(self, csv_file_path):
+        """True if the store holds exactly the rows of this CSV (nothing appended or rewritten since)"""
+        signature = self.source()
+        return (signature is not None and source_extends(signature, csv_file_path)
+                and os.path.getsize(csv_file_path) == signature['size'])
+
+    def sync(self, csv_file_path):
+        """Append the rows added to the raw CSV since the last sync, then compact"""
+        previous = self.source()
+        ingestor = FloodDataIngestor(csv_file_path, state_path=self.state_path)
+        if (os.path.getsize(csv_file_path) < ingestor.state['offset']
+                or previous is not None and not source_extends(previous, csv_file_path)):
+            ingestor.reset()
+        if ingestor.state['offset'] == 0:
+            # First sync, or the source was rewritten: rebuild from scratch
+            shutil.rmtree(self.root, ignore_errors=True)
+        # Signature sebelum membaca: baris yang ditambahkan selama sync membuat matches() False
+        signature = source_signature(csv_file_path, previous)
+        ingestor.add_consumer(self.append)
+        new_rows = ingestor.run()
+        with open(f'{self.source_path}.tmp', 'w') as f:
+            json.dump(signature, f, indent=2)
+        os.replace(f'{self.source_path}.tmp', self.source_path)
+        compacted = self.compact()
+        partitions = self.partitions()
+        print(f"Partition store: {new_rows:,} new records, {len(partitions)} partitions "
+              f"({compacted} compacted) in {self.root}")
+        return new_rows
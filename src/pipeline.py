@@ -0,0 +1,178 @@
+"""Declarative pipeline stages with content-hashed caching.
+
+A stage declares its dependencies, the config it reads and the files it
+writes. Its cache key is a hash of the input data fingerprint, its config
+and the keys of its dependencies, so it is known before anything runs.
+A stage whose key matches the manifest and whose output files still
+exist is skipped; its (small, pickled) result is read back only if
+needed. Stages marked `cache=False` (e.g. loading the dataset) run only
+when a stage depending on them has to run.
+
+Stages that have to run are executed level by level; stages on the same
+level are independent and run concurrently in a thread pool.
+"""
+import hashlib
+import json
+import pickle
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.config import FILE_PATHS, PIPELINE_CONFIG
+from src.data_cache import file_digest
+from src.instrumentation import METRICS
+
+PIPELINE_VERSION = 2  # 2: results pickled with package module paths (src.*)
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+class Stage:
+    """One pipeline step: func(inputs) -> picklable result"""
+
+    def __init__(self, name, func, deps=(), config=None, outputs=(), cache=True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.config = config or {}
+        self.outputs = tuple(outputs)
+        self.cache = cache
+
+class PipelineDAG:
+    """Stage graph keyed by input fingerprint + config, run with per-stage caching"""
+
+    def __init__(self, cache_dir=None, workers=None):
+        self.cache_dir = cache_dir or FILE_PATHS['pipeline_cache_dir']
+        self.workers = workers or PIPELINE_CONFIG['stage_workers']
+        self.stages = {}
+        self.report = []
+
+    def add(self, name, func, deps=(), config=None, outputs=(), cache=True):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, func, deps, config, outputs, cache)
+        return self
+
+    def stage(self, name, deps=(), config=None, outputs=(), cache=True):
+        """Decorator form of add()"""
+        def register(func):
+            self.add(name, func, deps, config, outputs, cache)
+            return func
+        return register
+
+    def fingerprint(self, path):
+        """Content hash of an input file (re-hashed only when size/mtime change)"""
+        stat = os.stat(path)
+        signature = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        fingerprints = self._read_json('fingerprints.json') or {}
+        known = fingerprints.get(signature['path'])
+        if known and known['size'] == signature['size'] and known['mtime_ns'] == signature['mtime_ns']:
+            return known['sha256']
+        signature['sha256'] = file_digest(path)
+        fingerprints[signature['path']] = signature
+        self._write_json('fingerprints.json', fingerprints)
+        return signature['sha256']
+
+    def keys(self, input_key):
+        """Cache key of every stage (dependencies come first in insertion order)"""
+        keys = {}
+        for name, stage in self.stages.items():
+            keys[name] = _hash(PIPELINE_VERSION, name, input_key, stage.config,
+                               [keys[dep] for dep in stage.deps])
+        return keys
+
+    def _read_json(self, name):
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_json(self, name, payload):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, name)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(payload, f, indent=2)
+        os.replace(f'{path}.tmp', path)
+
+    def _result_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.pkl')
+
+    def _is_fresh(self, stage, key, manifest):
+        return (stage.cache and manifest.get(stage.name) == key
+                and os.path.exists(self._result_path(stage.name))
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def run(self, input_key, targets=None, force=False):
+        """Run the stages needed for `targets` (default: all cached stages); returns results by stage
+
+        `force` reruns the targets even when fresh; their fresh dependencies are still reused.
+        """
+        keys = self.keys(input_key)
+        manifest = self._read_json('manifest.json') or {}
+        targets = list(targets or [name for name, stage in self.stages.items() if stage.cache])
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, expected some of {list(self.stages)}")
+
+        # Stages that must run: stale targets plus every dependency they need computed
+        to_run, needed = set(), list(targets)
+        while needed:
+            name = needed.pop()
+            stage = self.stages[name]
+            if name in to_run or (not force and self._is_fresh(stage, keys[name], manifest)):
+                continue
+            to_run.add(name)
+            for dep in stage.deps:
+                if not self._is_fresh(self.stages[dep], keys[dep], manifest):
+                    needed.append(dep)
+
+        # Dependency levels among the stages to run
+        levels = {}
+        for name, stage in self.stages.items():
+            if name in to_run:
+                levels[name] = 1 + max((levels.get(dep, 0) for dep in stage.deps), default=0)
+
+        results, self.report = {}, []
+
+        def load(name):
+            if name not in results:
+                with open(self._result_path(name), 'rb') as f:
+                    results[name] = pickle.load(f)
+            return results[name]
+
+        def execute(name):
+            stage = self.stages[name]
+            start = time.perf_counter()
+            with METRICS.span(f'stage.{name}'):
+                result = stage.func({dep: load(dep) for dep in stage.deps})
+            return name, result, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for level in sorted(set(levels.values())):
+                wave = [name for name, value in levels.items() if value == level]
+                # Cached inputs of this wave are read before the threads start
+                for name in wave:
+                    for dep in self.stages[name].deps:
+                        if dep not in to_run:
+                            load(dep)
+                for name, result, seconds in pool.map(execute, wave):
+                    results[name] = result
+                    stage = self.stages[name]
+                    if stage.cache:
+                        with open(f'{self._result_path(name)}.tmp', 'wb') as f:
+                            pickle.dump(result, f)
+                        os.replace(f'{self._result_path(name)}.tmp', self._result_path(name))
+                        manifest[name] = keys[name]
+                    self.report.append({'stage': name, 'status': 'ran', 'seconds': round(seconds, 3)})
+                self._write_json('manifest.json', manifest)
+
+        for name in targets:
+            if name not in to_run:
+                load(name)
+                self.report.append({'stage': name, 'status': 'cached', 'seconds': 0.0})
+        return {name: results[name] for name in targets}
@@ -0,0 +1,111 @@
+"""Vectorized data-quality and sensor-fault checks.
+
+Every reading gets one uint8 bitmask (`qc_flags`), computed over the
+(river, timestamp) sorted arrays of the shared FloodDataset index with
+no per-row Python loop:
+
+    STUCK         height unchanged for `stuck_readings` consecutive readings
+    SPIKE         reading sticks out from both neighbours by > `spike_cm`
+    JUMP          level change faster than `max_rate_cm_per_hour`
+    MISMATCH      height != sensor_height_cm - sensor_distance_cm
+    GAP           first reading after a gap in the river's series
+    DUPLICATE     same river and timestamp as the previous reading
+    OUT_OF_RANGE  height missing, below 0 or above the sensor height
+    SENSOR_ERROR  sensor_status == ERROR
+
+Downstream stages filter with `flag_mask(flags, [...])`, a single AND.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.config import DATASET_CONFIG, QC_CONFIG
+from src.flood_dataset import FloodDataset
+
+QC_FLAGS = {
+    'STUCK': 1,
+    'SPIKE': 2,
+    'JUMP': 4,
+    'MISMATCH': 8,
+    'GAP': 16,
+    'DUPLICATE': 32,
+    'OUT_OF_RANGE': 64,
+    'SENSOR_ERROR': 128
+}
+
+def flag_mask(flags, names=None):
+    """Boolean mask of readings carrying any of the named flags (default: any flag)"""
+    bits = sum(QC_FLAGS[name] for name in names) if names else 0xFF
+    return (np.asarray(flags) & bits) != 0
+
+def flag_names(value):
+    """Flag names set in one bitmask value"""
+    return [name for name, bit in QC_FLAGS.items() if int(value) & bit]
+
+def quality_flags(data, config=None):
+    """qc_flags bitmask per reading, aligned with the data"""
+    config = {**QC_CONFIG, **(config or {})}
+    dataset = FloodDataset.wrap(data)
+    index = dataset.river_index()
+    rows, offsets, times = index['data'], index['offsets'], index['times']
+    n = len(rows)
+    flags = np.zeros(n, dtype=np.uint8)
+    if n == 0:
+        return pd.Series(flags, index=dataset.data.index, name='qc_flags')
+
+    river = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    same = river[1:] == river[:-1]
+    height = rows['water_height_cm'].to_numpy(dtype=np.float64)
+    sensor_height = DATASET_CONFIG['sensor_height_cm']
+
+    # Timestamps: duplicates and gaps (flag on the later reading)
+    dt = np.diff(times)
+    interval_ns = DATASET_CONFIG['sampling_interval_hours'] * 3600 * 10**9
+    flags[1:][same & (dt == 0)] |= QC_FLAGS['DUPLICATE']
+    flags[1:][same & (dt > config['gap_factor'] * interval_ns)] |= QC_FLAGS['GAP']
+
+    # Level dynamics within each river
+    dh = np.diff(height)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.abs(dh) / (dt / 3.6e12)
+        flags[1:][same & (dt > 0) & (rate > config['max_rate_cm_per_hour'])] |= QC_FLAGS['JUMP']
+        spike = (same[:-1] & same[1:] & (dh[:-1] * dh[1:] < 0)
+                 & (np.minimum(np.abs(dh[:-1]), np.abs(dh[1:])) > config['spike_cm']))
+    flags[1:-1][spike] |= QC_FLAGS['SPIKE']
+
+    # Stuck: runs of identical heights, labelled by run id
+    run_start = np.ones(n, dtype=bool)
+    run_start[1:] = ~(same & (dh == 0))
+    run_id = np.cumsum(run_start) - 1
+    flags[np.bincount(run_id)[run_id] >= config['stuck_readings']] |= QC_FLAGS['STUCK']
+
+    # Physical cross-checks
+    if 'sensor_distance_cm' in rows.columns:
+        expected = sensor_height - rows['sensor_distance_cm'].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            flags[np.abs(height - expected) > config['mismatch_tolerance_cm']] |= QC_FLAGS['MISMATCH']
+    with np.errstate(invalid='ignore'):
+        flags[~((height >= 0) & (height <= sensor_height))] |= QC_FLAGS['OUT_OF_RANGE']
+    if 'sensor_status' in rows.columns:
+        flags[(rows['sensor_status'] == 'ERROR').to_numpy()] |= QC_FLAGS['SENSOR_ERROR']
+
+    # Back to the original row order
+    aligned = np.empty_like(flags)
+    aligned[index['order']] = flags
+    return pd.Series(aligned, index=dataset.data.index, name='qc_flags')
+
+def quality_summary(data, flags=None):
+    """Flagged readings per river and flag, with the overall flagged rate"""
+    dataset = FloodDataset.wrap(data)
+    flags = dataset.derived('qc_flags') if flags is None else flags
+    values = np.asarray(flags)
+    codes, rivers = pd.factorize(dataset.data['river_name'], sort=True)
+    n_rivers = len(rivers)
+    summary = pd.DataFrame({
+        name.lower(): np.bincount(codes, weights=(values & bit) != 0, minlength=n_rivers).astype(np.int64)
+        for name, bit in QC_FLAGS.items()
+    }, index=pd.Index([str(river) for river in rivers], name='river_name'))
+    summary.insert(0, 'readings', np.bincount(codes, minlength=n_rivers))
+    summary['flagged'] = np.bincount(codes, weights=values != 0, minlength=n_rivers).astype(np.int64)
+    summary['flagged_rate'] = (summary['flagged'] / summary['readings']).round(4)
+    return summary
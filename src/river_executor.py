@@ -0,0 +1,61 @@
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import os
+
+from utils.config import PARALLEL_CONFIG
+from src.flood_dataset import FloodDataset
+
+BACKENDS = ('serial', 'thread', 'process')
+
+class RiverExecutor:
+    """Fan per-river work out over a serial, thread or process backend.
+
+    The data is sorted by (river_name, timestamp) once (the shared
+    FloodDataset river index); each river's partition is a contiguous
+    slice of that frame. Results are always
+    returned in river-name order, whatever order workers finish in.
+    """
+    
+    def __init__(self, data, backend=None, workers=None):
+        backend = backend or PARALLEL_CONFIG['executor']
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown executor backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.workers = workers or PARALLEL_CONFIG['workers'] or os.cpu_count()
+        self.data = data
+        self._partitions = None
+    
+    def partitions(self):
+        """Dict of river name -> that river's rows (built once)"""
+        if self._partitions is None:
+            self._partitions = FloodDataset.wrap(self.data).river_groups()
+        return self._partitions
+    
+    @property
+    def rivers(self):
+        return list(self.partitions())
+    
+    def map(self, func, *args, **kwargs):
+        """Call func(river, river_data, *args, **kwargs) for every river"""
+        partitions = self.partitions()
+        if self.backend == 'serial' or self.workers == 1 or len(partitions) <= 1:
+            return {river: func(river, river_data, *args, **kwargs)
+                    for river, river_data in partitions.items()}
+        
+        workers = min(self.workers, len(partitions))
+        if self.backend == 'thread':
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context(PARALLEL_CONFIG['start_method']))
+        with pool:
+            futures = {river: pool.submit(func, river, river_data, *args, **kwargs)
+                       for river, river_data in partitions.items()}
+            return {river: future.result() for river, future in futures.items()}
+    
+    def map_concat(self, func, *args, **kwargs):
+        """map() and concatenate the DataFrame results in river order"""
+        results = [result for result in self.map(func, *args, **kwargs).values()
+                   if result is not None and len(result)]
+        return pd.concat(results) if results else pd.DataFrame()
@@ -0,0 +1,485 @@
+"""Mergeable streaming statistics for the numeric sensor columns.
+
+StreamingStats keeps, per river and column, the count, mean and central
+moment sums M2..M4 (combined with the pairwise formulas of Chan/Pébay) plus
+exact min/max and a t-digest for quantiles. Updating costs O(new rows),
+two accumulators merge exactly (moments) or within the digest error
+(quantiles), and the state is saved as JSON between runs together with a
+per-river timestamp watermark and count of the rows already counted. The
+state also records the source CSV's signature: it is dropped when the CSV
+was rewritten rather than appended to.
+
+CoMomentAccumulator does the same for correlation matrices, with per-river
+and rolling-window (daily bucket) variants.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.config import FILE_PATHS, STATS_CONFIG, CORRELATION_CONFIG
+from src.data_cache import source_signature, source_extends
+
+STATS_VERSION = 2
+MOMENTS = ('n', 'mean', 'm2', 'm3', 'm4', 'min', 'max')
+
+def stats_state_path(csv_file_path):
+    """State file of the accumulators for one source CSV"""
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    return os.path.join(FILE_PATHS['stats_dir'], f'{stem}.json')
+
+def combine_moments(a, b):
+    """Merge two moment states (dicts of equally shaped arrays)"""
+    n = a['n'] + b['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = b['mean'] - a['mean']
+        na, nb = a['n'], b['n']
+        mean = np.where(n > 0, a['mean'] + delta * nb / n, 0.0)
+        m2 = a['m2'] + b['m2'] + np.where(n > 0, delta**2 * na * nb / n, 0.0)
+        m3 = (a['m3'] + b['m3']
+              + np.where(n > 0, delta**3 * na * nb * (na - nb) / n**2
+                         + 3 * delta * (na * b['m2'] - nb * a['m2']) / n, 0.0))
+        m4 = (a['m4'] + b['m4']
+              + np.where(n > 0, delta**4 * na * nb * (na**2 - na * nb + nb**2) / n**3
+                         + 6 * delta**2 * (na**2 * b['m2'] + nb**2 * a['m2']) / n**2
+                         + 4 * delta * (na * b['m3'] - nb * a['m3']) / n, 0.0))
+    return {'n': n, 'mean': mean, 'm2': m2, 'm3': m3, 'm4': m4,
+            'min': np.fmin(a['min'], b['min']), 'max': np.fmax(a['max'], b['max'])}
+
+def batch_moments(codes, values, n_groups):
+    """Moment state per group for one batch; `values` is (rows, columns)"""
+    shape = (n_groups, values.shape[1])
+    state = {name: np.zeros(shape) for name in MOMENTS}
+    state['min'][:], state['max'][:] = np.inf, -np.inf
+    for j in range(values.shape[1]):
+        x = values[:, j]
+        valid = ~np.isnan(x)
+        g, x = codes[valid], x[valid]
+        n = np.bincount(g, minlength=n_groups).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, np.bincount(g, x, n_groups) / n, 0.0)
+        d = x - mean[g]
+        d2 = d * d
+        state['n'][:, j], state['mean'][:, j] = n, mean
+        state['m2'][:, j] = np.bincount(g, d2, n_groups)
+        state['m3'][:, j] = np.bincount(g, d2 * d, n_groups)
+        state['m4'][:, j] = np.bincount(g, d2 * d2, n_groups)
+        np.minimum.at(state['min'][:, j], g, x)
+        np.maximum.at(state['max'][:, j], g, x)
+    return state
+
+class TDigest:
+    """Merging t-digest (arcsine scale) for approximate quantiles"""
+
+    def __init__(self, compression=None):
+        self.compression = compression or STATS_CONFIG['tdigest_compression']
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = np.inf, -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        # Clusters are runs whose left edge falls in the same unit of the
+        # scale function: tiny at the tails, large around the median
+        k = np.floor(self.compression * (np.arcsin(2 * q_left - 1) / np.pi + 0.5)).astype(np.int64)
+        k = np.minimum(k, self.compression)
+        cluster_weights = np.bincount(k, weights)
+        keep = cluster_weights > 0
+        self.means = np.bincount(k, means * weights)[keep] / cluster_weights[keep]
+        self.weights = cluster_weights[keep]
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        if not len(other.weights):
+            return self
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        if not len(self.weights):
+            return np.full(np.shape(q), np.nan)
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(np.asarray(q) * total,
+                         np.concatenate([[0.0], centers, [total]]),
+                         np.concatenate([[self.min], self.means, [self.max]]))
+
+    def to_dict(self):
+        return {'means': self.means.tolist(), 'weights': self.weights.tolist(),
+                'min': float(self.min), 'max': float(self.max)}
+
+    @classmethod
+    def from_dict(cls, state, compression=None):
+        digest = cls(compression)
+        digest.means = np.array(state['means'], dtype=np.float64)
+        digest.weights = np.array(state['weights'], dtype=np.float64)
+        digest.min, digest.max = state['min'], state['max']
+        return digest
+
+class StreamingStats:
+    """Per-river, per-column streaming moments and quantile digests"""
+
+    def __init__(self, columns=None, group_col='river_name'):
+        self.columns = list(columns or STATS_CONFIG['columns'])
+        self.group_col = group_col
+        self.groups = []
+        self.moments = {name: np.zeros((0, len(self.columns))) for name in MOMENTS}
+        self.digests = {}  # (group, column) -> TDigest
+        self.watermarks = {}  # group -> newest timestamp counted
+        self.rows = {}  # group -> rows counted
+        self.source = None  # signature of the source CSV when last saved
+
+    def _group_rows(self, names):
+        """State row of each group name, adding rows for new groups"""
+        new = [name for name in names if name not in self.groups]
+        if new:
+            empty = {name: np.zeros((len(new), len(self.columns))) for name in MOMENTS}
+            empty['min'][:], empty['max'][:] = np.inf, -np.inf
+            self.moments = {name: np.vstack([self.moments[name], empty[name]]) for name in MOMENTS}
+            self.groups.extend(new)
+        index = {name: i for i, name in enumerate(self.groups)}
+        return np.array([index[name] for name in names], dtype=np.int64)
+
+    def _new_mask(self, data):
+        """Per row: newer than the watermark of its river"""
+        if not self.watermarks or 'timestamp' not in data.columns:
+            return np.ones(len(data), dtype=bool)
+        rivers = data[self.group_col].astype(str)
+        watermark = pd.to_datetime(rivers.map(self.watermarks)).astype(data['timestamp'].dtype)
+        return (watermark.isna() | (data['timestamp'] > watermark)).to_numpy()
+
+    def new_rows(self, data):
+        """Rows newer than the watermark of their river"""
+        if not self.watermarks or 'timestamp' not in data.columns:
+            return data
+        return data[self._new_mask(data)]
+
+    def is_consistent(self, data):
+        """True if the rows of `data` at or before each watermark are exactly the rows counted
+
+        False when rows arrived late (at or before their river's watermark)
+        or counted rows are gone, i.e. the accumulators must be rebuilt.
+        """
+        if not self.watermarks or 'timestamp' not in data.columns:
+            return not any(self.rows.values())
+        counted = pd.Series(~self._new_mask(data)).groupby(data[self.group_col].astype(str).to_numpy()).sum()
+        return ({group: int(n) for group, n in counted.items() if n}
+                == {group: n for group, n in self.rows.items() if n})
+
+    def update(self, data):
+        """Add a batch of rows (O(batch))"""
+        if data.empty:
+            return self
+        codes, names = pd.factorize(data[self.group_col].astype(str))
+        rows = self._group_rows(list(names))
+        for group, n in zip(names, np.bincount(codes, minlength=len(names))):
+            self.rows[group] = self.rows.get(group, 0) + int(n)
+        values = np.column_stack([data[col].to_numpy(dtype=np.float64) for col in self.columns])
+
+        batch = batch_moments(codes, values, len(names))
+        current = {name: self.moments[name][rows] for name in MOMENTS}
+        for name, merged in combine_moments(current, batch).items():
+            self.moments[name][rows] = merged
+
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for part in np.split(order, bounds):
+            group = names[codes[part[0]]]
+            for j, col in enumerate(self.columns):
+                self.digests.setdefault((group, col), TDigest()).update(values[part, j])
+
+        if 'timestamp' in data.columns:
+            newest = data.groupby(codes)['timestamp'].max()
+            for code, timestamp in newest.items():
+                group = names[code]
+                previous = self.watermarks.get(group)
+                stamp = timestamp.isoformat()
+                self.watermarks[group] = max(previous, stamp) if previous else stamp
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator (e.g. from another partition) into this one"""
+        rows = self._group_rows(other.groups)
+        current = {name: self.moments[name][rows] for name in MOMENTS}
+        for name, merged in combine_moments(current, other.moments).items():
+            self.moments[name][rows] = merged
+        for key, digest in other.digests.items():
+            self.digests.setdefault(key, TDigest()).merge(digest)
+        for group, stamp in other.watermarks.items():
+            self.watermarks[group] = max(self.watermarks.get(group, stamp), stamp)
+        for group, n in other.rows.items():
+            self.rows[group] = self.rows.get(group, 0) + n
+        return self
+
+    def _state(self, group=None):
+        """Moments of one river, or of all rivers combined"""
+        if group is not None:
+            i = self.groups.index(group)
+            return {name: self.moments[name][i] for name in MOMENTS}
+        total = {name: np.zeros(len(self.columns)) for name in MOMENTS}
+        total['min'][:], total['max'][:] = np.inf, -np.inf
+        for i in range(len(self.groups)):
+            total = combine_moments(total, {name: self.moments[name][i] for name in MOMENTS})
+        return total
+
+    def _digest(self, col, group=None):
+        if group is not None:
+            return self.digests.get((group, col), TDigest())
+        digest = TDigest()
+        for g in self.groups:
+            if (g, col) in self.digests:
+                digest.merge(self.digests[(g, col)])
+        return digest
+
+    def describe(self, group=None):
+        """Same layout as DataFrame.describe() (quantiles from the t-digest)"""
+        state = self._state(group)
+        n = state['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(state['m2'] / (n - 1))
+        quantiles = np.array([self._digest(col, group).quantile([0.25, 0.5, 0.75])
+                              for col in self.columns]).T
+        table = np.vstack([n, np.where(n > 0, state['mean'], np.nan), std,
+                           np.where(n > 0, state['min'], np.nan), quantiles,
+                           np.where(n > 0, state['max'], np.nan)])
+        return pd.DataFrame(table, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                            columns=self.columns)
+
+    def shape_stats(self, group=None):
+        """Coefficient of variation, skewness and excess kurtosis (population)"""
+        state = self._state(group)
+        n, m2 = state['n'], state['m2']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cv = np.sqrt(m2 / n) / state['mean']
+            skew = np.sqrt(n) * state['m3'] / m2**1.5
+            kurtosis = n * state['m4'] / m2**2 - 3
+        shape = {}
+        for j, col in enumerate(self.columns):
+            shape[f'{col}_cv'] = float(cv[j])
+            shape[f'{col}_skew'] = float(skew[j])
+            shape[f'{col}_kurtosis'] = float(kurtosis[j])
+        return shape
+
+    def by_group(self):
+        """Mean/std/count per river and column"""
+        frames = {group: self.describe(group).loc[['count', 'mean', 'std', '50%']]
+                  for group in sorted(self.groups)}
+        return pd.concat(frames, names=['river_name', 'stat'])
+
+    def save(self, path, source_path=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if source_path is not None:
+            self.source = source_signature(source_path, self.source)
+        state = {
+            'version': STATS_VERSION,
+            'columns': self.columns,
+            'group_col': self.group_col,
+            'groups': self.groups,
+            'moments': {name: self.moments[name].tolist() for name in MOMENTS},
+            'digests': {group: {col: self.digests[(group, col)].to_dict()
+                                for col in self.columns if (group, col) in self.digests}
+                        for group in self.groups},
+            'watermarks': self.watermarks,
+            'rows': self.rows,
+            'source': self.source
+        }
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path, columns=None, source_path=None):
+        """Saved accumulators, or empty ones if missing, incompatible or for a rewritten source"""
+        stats = cls(columns)
+        if not os.path.exists(path):
+            return stats
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('version') != STATS_VERSION or state['columns'] != stats.columns:
+            return stats
+        if source_path is not None and not source_extends(state['source'], source_path):
+            print(f"Streaming stats: {source_path} was rewritten, rebuilding")
+            return stats
+        stats.group_col = state['group_col']
+        stats.groups = state['groups']
+        stats.moments = {name: np.array(state['moments'][name], dtype=np.float64).reshape(-1, len(stats.columns))
+                         for name in MOMENTS}
+        stats.digests = {(group, col): TDigest.from_dict(digest)
+                         for group, digests in state['digests'].items()
+                         for col, digest in digests.items()}
+        stats.watermarks = state['watermarks']
+        stats.rows = state['rows']
+        stats.source = state['source']
+        return stats
+
+def update_persisted_stats(chunk, path, source_path=None):
+    """Incremental consumer: add new rows to the saved accumulators
+
+    Rows at or before their river's watermark are skipped here (they may
+    already be counted); late ones make the next analysis run rebuild.
+    """
+    stats = StreamingStats.load(path, source_path=source_path)
+    stats.update(stats.new_rows(chunk))
+    stats.save(path, source_path)
+    return stats
+
+COMOMENTS = ('n', 'sx', 'sxx', 'sxy')
+
+def batch_comoments(values):
+    """Pairwise-complete sums and cross-products of a (rows, columns) block.
+
+    n[i, j] counts rows where both columns are present; sx[i, j] and
+    sxx[i, j] sum x_i and x_i**2 over those rows; sxy[i, j] sums x_i * x_j.
+    """
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    mask = valid.astype(np.float64)
+    return {'n': mask.T @ mask, 'sx': x.T @ mask, 'sxx': (x * x).T @ mask, 'sxy': x.T @ x}
+
+class CoMomentAccumulator:
+    """Mergeable co-moment sums for correlation matrices.
+
+    Sums are taken around a fixed per-column shift (the first batch's means)
+    so they stay numerically stable yet purely additive: merging, per-river
+    totals and the rolling window are all plain sums. The rolling window
+    keeps one bucket per day for the last `window_days` days.
+    """
+
+    def __init__(self, columns=None, group_col='river_name', window_days=None):
+        self.columns = list(columns or CORRELATION_CONFIG['columns'])
+        self.group_col = group_col
+        self.window_days = CORRELATION_CONFIG['window_days'] if window_days is None else window_days
+        self.groups = []
+        self.shift = None
+        self.totals = self._empty(0)
+        self.buckets = {}  # day number -> sums per group, rows aligned with self.groups
+        self.newest_day = None
+
+    def _empty(self, n_groups):
+        k = len(self.columns)
+        return {name: np.zeros((n_groups, k, k)) for name in COMOMENTS}
+
+    def _group_rows(self, names):
+        new = [name for name in names if name not in self.groups]
+        if new:
+            self.groups.extend(new)
+            grow = lambda sums: {name: np.concatenate([sums[name], self._empty(len(new))[name]]) for name in COMOMENTS}
+            self.totals = grow(self.totals)
+            self.buckets = {day: grow(sums) for day, sums in self.buckets.items()}
+        index = {name: i for i, name in enumerate(self.groups)}
+        return np.array([index[name] for name in names], dtype=np.int64)
+
+    def _reshifted(self, sums, shift):
+        """Sums of `sums` (taken around `shift`) re-expressed around self.shift"""
+        d = self.shift - shift
+        n, sx = sums['n'], sums['sx']
+        return {
+            'n': n,
+            'sx': sx - n * d[:, None],
+            'sxx': sums['sxx'] - 2 * d[:, None] * sx + n * (d**2)[:, None],
+            'sxy': sums['sxy'] - d[None, :] * sx - d[:, None] * np.swapaxes(sx, -1, -2) + n * np.outer(d, d)
+        }
+
+    def _expire(self):
+        if self.newest_day is None:
+            return
+        oldest = self.newest_day - self.window_days + 1
+        self.buckets = {day: sums for day, sums in self.buckets.items() if day >= oldest}
+
+    def update(self, data):
+        """Add a batch of rows (one pass, one matrix product per river/day block)"""
+        if data.empty:
+            return self
+        values = np.column_stack([data[col].to_numpy(dtype=np.float64) for col in self.columns])
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        values = values - self.shift
+
+        codes, names = pd.factorize(data[self.group_col].astype(str))
+        rows = self._group_rows(list(names))
+        days = None
+        if self.window_days and 'timestamp' in data.columns:
+            days = data['timestamp'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+            newest = int(days.max())
+            self.newest_day = newest if self.newest_day is None else max(self.newest_day, newest)
+            self._expire()
+
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for part in np.split(order, bounds):
+            g = rows[codes[part[0]]]
+            for name, block in batch_comoments(values[part]).items():
+                self.totals[name][g] += block
+            if days is None:
+                continue
+            # Daily buckets for the rolling window
+            part_days = days[part]
+            for day in np.unique(part_days[part_days > self.newest_day - self.window_days]):
+                bucket = self.buckets.get(day)
+                if bucket is None:
+                    bucket = self.buckets[day] = self._empty(len(self.groups))
+                for name, block in batch_comoments(values[part[part_days == day]]).items():
+                    bucket[name][g] += block
+        return self
+
+    def merge(self, other):
+        """Fold in an accumulator built on another partition"""
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        rows = self._group_rows(other.groups)
+        for name, block in self._reshifted(other.totals, other.shift).items():
+            self.totals[name][rows] += block
+        for day, sums in other.buckets.items():
+            bucket = self.buckets.get(day)
+            if bucket is None:
+                bucket = self.buckets[day] = self._empty(len(self.groups))
+            for name, block in self._reshifted(sums, other.shift).items():
+                bucket[name][rows] += block
+        if other.newest_day is not None:
+            self.newest_day = max(self.newest_day or other.newest_day, other.newest_day)
+            self._expire()
+        return self
+
+    def corr(self, group=None, window=False):
+        """Pearson correlation matrix (pairwise complete, like DataFrame.corr)"""
+        sources = list(self.buckets.values()) if window else [self.totals]
+        rows = [self.groups.index(group)] if group is not None else slice(None)
+        n, sx, sxx, sxy = (sum(s[name][rows].sum(axis=0) for s in sources) if sources else 0
+                           for name in COMOMENTS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = n * sxy - sx * sx.T
+            var_i = n * sxx - sx**2
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr = np.clip(np.asarray(corr, dtype=np.float64) * np.ones((len(self.columns),) * 2), -1, 1)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def strong_pairs(self, matrix, threshold=None):
+        """Column pairs with |r| above the threshold, without a nested loop"""
+        threshold = CORRELATION_CONFIG['strong_threshold'] if threshold is None else threshold
+        i, j = np.triu_indices(len(self.columns), k=1)
+        r = matrix.to_numpy()[i, j]
+        keep = np.abs(r) > threshold
+        return {f'{self.columns[a]} vs {self.columns[b]}': round(float(value), 3)
+                for a, b, value in zip(i[keep], j[keep], r[keep])}
@@ -0,0 +1,235 @@
+"""Regular river x time grid.
+
+Readings are placed on a fixed grid (GRID_CONFIG['freq'], e.g. hourly or
+15-minute) with one scatter: each reading's flat key is
+river_code * n_slots + slot, so every column becomes a rivers x slots
+matrix (NaN where no reading). Several readings in one slot are averaged;
+categorical and string columns keep the latest reading as integer codes.
+
+Gaps are then filled per column ('linear', 'ffill', 'zero' or 'none'), but
+only up to `limit_hours` and only inside each river's observed span, so a
+dead sensor never turns into a flat line. Rolling windows, durations and
+resampling are plain array operations on the matrices, and `coverage`
+tells how much of each aggregate was actually measured.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.config import DATASET_CONFIG, GRID_CONFIG
+from src.flood_dataset import FloodDataset
+
+AGGREGATIONS = ('mean', 'sum', 'min', 'max', 'last')
+
+def _last_valid_position(matrix):
+    """Column of the last non-NaN value at or before each slot (-1 if none)"""
+    positions = np.where(~np.isnan(matrix), np.arange(matrix.shape[1]), -1)
+    return np.maximum.accumulate(positions, axis=1)
+
+def _next_valid_position(matrix):
+    """Column of the first non-NaN value at or after each slot (n_slots if none)"""
+    n_slots = matrix.shape[1]
+    positions = np.where(~np.isnan(matrix), np.arange(n_slots), n_slots)
+    return np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+
+def fill_gaps(matrix, method, limit):
+    """Fill NaN slots along axis 1, for gaps of at most `limit` slots"""
+    if method == 'none':
+        return matrix
+    prev = _last_valid_position(matrix)
+    nxt = _next_valid_position(matrix)
+    slots = np.arange(matrix.shape[1])
+    inside = (prev >= 0) & (nxt < matrix.shape[1])  # within the observed span
+    gap = np.isnan(matrix) & inside
+    rows = np.arange(matrix.shape[0])[:, None]
+    if method == 'ffill':
+        fill = gap & (slots - prev <= limit)
+        return np.where(fill, matrix[rows, np.maximum(prev, 0)], matrix)
+    if method == 'zero':
+        return np.where(gap & (nxt - prev - 1 <= limit), 0.0, matrix)
+    if method == 'linear':
+        fill = gap & (nxt - prev - 1 <= limit)
+        left = matrix[rows, np.maximum(prev, 0)]
+        right = matrix[rows, np.minimum(nxt, matrix.shape[1] - 1)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = (slots - prev) / (nxt - prev)
+        return np.where(fill, left + weight * (right - left), matrix)
+    raise ValueError(f"Unknown fill method: {method}")
+
+class RiverTimeGrid:
+    """Rivers x slots matrices of the selected columns on a regular grid"""
+
+    def __init__(self, data, columns=None, freq=None, fill=None, limit_hours=None):
+        frame = FloodDataset.wrap(data).data
+        self.freq = freq or GRID_CONFIG['freq']
+        self.slot_ns = pd.Timedelta(self.freq).value
+        columns = [col for col in (columns or GRID_CONFIG['columns']) if col in frame.columns]
+        limit_hours = GRID_CONFIG['limit_hours'] if limit_hours is None else limit_hours
+        self.limit = int(limit_hours * 3600 * 10**9 // self.slot_ns)
+        fill = {**GRID_CONFIG['fill'], **(fill or {})}
+
+        codes, rivers = pd.factorize(frame['river_name'], sort=True)
+        self.rivers = [str(river) for river in rivers]
+        slots = frame['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64) // self.slot_ns
+        self.start = int(slots.min()) if len(slots) else 0
+        self.n_slots = int(slots.max()) - self.start + 1 if len(slots) else 0
+        shape = (len(self.rivers), self.n_slots)
+        flat = codes.astype(np.int64) * self.n_slots + (slots - self.start)
+
+        self.counts = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape)
+        self.categories = {}
+        self.values = {}
+        latest = None
+        for col in columns:
+            series = frame[col]
+            if not pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+                # Kolom string (CSV tanpa apply_schema) diperlakukan seperti kategori
+                series = series.astype('category')
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                if latest is None:
+                    # Latest reading of each slot: sort by (slot, timestamp), keep the last of each slot
+                    order = np.lexsort((frame['timestamp'].to_numpy(dtype='datetime64[ns]'), flat))
+                    latest = order[np.append(flat[order][1:] != flat[order][:-1], True)]
+                # Codes as float so NaN marks empty slots
+                self.categories[col] = series.cat.categories
+                matrix = np.full(shape, np.nan)
+                matrix.ravel()[flat[latest]] = series.cat.codes.to_numpy()[latest].astype(np.float64)
+                matrix[matrix < 0] = np.nan
+                self.values[col] = matrix
+                continue
+            values = series.to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            total = np.bincount(flat[valid], weights=values[valid], minlength=shape[0] * shape[1])
+            n = np.bincount(flat[valid], minlength=shape[0] * shape[1])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                matrix = (total / n).reshape(shape)
+            self.values[col] = fill_gaps(matrix, fill.get(col, GRID_CONFIG['default_fill']), self.limit)
+
+    @property
+    def observed(self):
+        """Slots with at least one reading"""
+        return self.counts > 0
+
+    @property
+    def slot_hours(self):
+        return self.slot_ns / 3.6e12
+
+    @property
+    def times(self):
+        return pd.DatetimeIndex((np.arange(self.n_slots) + self.start) * self.slot_ns)
+
+    def matrix(self, column):
+        return self.values[column]
+
+    def frame(self, dropna=True):
+        """Long (river_name, timestamp, columns..., observed) table of the grid"""
+        frame = pd.DataFrame({
+            'river_name': pd.Categorical.from_codes(np.repeat(np.arange(len(self.rivers)), self.n_slots),
+                                                    categories=self.rivers),
+            'timestamp': np.tile(self.times.to_numpy(), len(self.rivers))
+        })
+        for col, matrix in self.values.items():
+            frame[col] = self._decode(col, matrix.ravel())
+        frame['observed'] = self.observed.ravel()
+        if dropna and self.values:
+            present = np.zeros(len(frame), dtype=bool)
+            for matrix in self.values.values():
+                present |= ~np.isnan(matrix.ravel())
+            frame = frame[present].reset_index(drop=True)
+        return frame
+
+    def _decode(self, col, codes):
+        if col not in self.categories:
+            return codes
+        codes = np.where(np.isnan(codes), -1, codes).astype(np.int64)
+        return pd.Categorical.from_codes(codes, categories=self.categories[col])
+
+    def aggregate(self, freq, how):
+        """Per river and `freq` bin: how[col] in AGGREGATIONS, plus measured coverage"""
+        try:
+            bin_ns = pd.tseries.frequencies.to_offset(freq).nanos
+        except ValueError:
+            return self._aggregate_calendar(freq, how)
+        if bin_ns % self.slot_ns:
+            raise ValueError(f"Bin {freq} is not a multiple of the grid step {self.freq}")
+
+        # Pad to whole bins (epoch-aligned, as pd.Grouper for bins dividing a day)
+        # and reshape to rivers x bins x slots
+        k = bin_ns // self.slot_ns
+        first_bin = self.start // k
+        lead = self.start - first_bin * k
+        n_bins = -(-(lead + self.n_slots) // k)
+        trail = n_bins * k - lead - self.n_slots
+
+        def binned(matrix, pad_value=np.nan):
+            padded = np.pad(matrix, ((0, 0), (lead, trail)), constant_values=pad_value)
+            return padded.reshape(len(self.rivers), n_bins, k)
+
+        observed = binned(self.observed.astype(np.float64), 0.0)
+        result = {}
+        with np.errstate(invalid='ignore'):
+            for col, method in how.items():
+                if col not in self.values:
+                    continue
+                blocks = binned(self.values[col])
+                if method == 'last':
+                    last = _last_valid_position(blocks.reshape(-1, k))[:, -1]
+                    values = blocks.reshape(-1, k)[np.arange(len(last)), np.maximum(last, 0)]
+                    values = np.where(last >= 0, values, np.nan)
+                elif method == 'sum':
+                    values = np.where(np.isnan(blocks).all(axis=2), np.nan,
+                                      np.nansum(blocks, axis=2)).ravel()
+                elif method in AGGREGATIONS:
+                    valid = ~np.isnan(blocks)
+                    if method == 'mean':
+                        values = np.nansum(blocks, axis=2) / valid.sum(axis=2)
+                    else:
+                        fill = np.inf if method == 'min' else -np.inf
+                        reduce = np.min if method == 'min' else np.max
+                        values = reduce(np.where(valid, blocks, fill), axis=2)
+                        values = np.where(valid.any(axis=2), values, np.nan)
+                    values = values.ravel()
+                else:
+                    raise ValueError(f"Unknown aggregation: {method}")
+                result[col] = self._decode(col, values)
+
+        coverage = observed.mean(axis=2).ravel()
+        frame = pd.DataFrame({
+            'timestamp': np.tile((first_bin + np.arange(n_bins)) * bin_ns, len(self.rivers)).astype('datetime64[ns]'),
+            'river_name': pd.Categorical.from_codes(np.repeat(np.arange(len(self.rivers)), n_bins),
+                                                    categories=self.rivers),
+            **result,
+            'coverage': coverage.round(4)
+        })
+        frame = frame[observed.any(axis=2).ravel()]
+        return frame.sort_values(['timestamp', 'river_name'], kind='stable', ignore_index=True)
+
+    def _aggregate_calendar(self, freq, how):
+        """Calendar bins (e.g. month end): grouped over the grid's long table"""
+        frame = self.frame(dropna=False)
+        grouped = frame.groupby([pd.Grouper(key='timestamp', freq=freq), 'river_name'], observed=True)
+        result = grouped.agg({col: method for col, method in how.items() if col in self.values})
+        result['coverage'] = grouped['observed'].mean().round(4)
+        return result[grouped['observed'].any()].reset_index()
+
+    def runs(self, mask):
+        """Runs of True slots per river: start, end, slots and duration in hours"""
+        mask = np.asarray(mask, dtype=bool)
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=bool)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded.astype(np.int8), axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)  # row-major order pairs starts with ends
+        return pd.DataFrame({
+            'river_name': np.array(self.rivers, dtype=object)[rows],
+            'start': ((starts + self.start) * self.slot_ns).astype('datetime64[ns]'),
+            'end': ((ends - 1 + self.start) * self.slot_ns).astype('datetime64[ns]'),
+            'n_slots': ends - starts,
+            'duration_hours': (ends - starts) * self.slot_hours
+        })
+
+    def threshold_runs(self, column='water_height_cm', threshold=None):
+        """Gap-aware durations above a threshold (unfilled gaps end a run)"""
+        threshold = DATASET_CONFIG['flood_threshold_cm'] if threshold is None else threshold
+        with np.errstate(invalid='ignore'):
+            return self.runs(self.values[column] > threshold)
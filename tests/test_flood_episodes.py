@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from src.data_sampler import FloodDataSampler
+from utils.helpers import detect_flood_episodes
+
+START = pd.Timestamp('2024-01-01')
+
+
+def readings(heights, river='Sungai A', hours=None):
+    """Pembacaan per jam (atau pada jam `hours`) untuk satu sungai"""
+    hours = range(len(heights)) if hours is None else hours
+    return pd.DataFrame({
+        'river_name': river,
+        'timestamp': [START + pd.Timedelta(hours=h) for h in hours],
+        'water_height_cm': np.asarray(heights, dtype=float)
+    })
+
+
+def spans(episodes):
+    return [((row.start - START) // pd.Timedelta(hours=1), (row.end - START) // pd.Timedelta(hours=1))
+            for row in episodes.itertuples()]
+
+
+def test_runs_above_threshold_are_episodes():
+    episodes = detect_flood_episodes(readings([100, 210, 220, 190, 230, 150]), hysteresis=0, min_hours=0)
+    assert spans(episodes) == [(1, 2), (4, 4)]
+    assert episodes['duration_hours'].tolist() == [2.0, 1.0]
+    assert episodes['n_readings'].tolist() == [2, 1]
+    assert episodes['peak_height_cm'].tolist() == [220.0, 230.0]
+
+
+def test_defaults_keep_plain_runs():
+    data = readings([100, 210, 220, 190, 230, 150])
+    pd.testing.assert_frame_equal(detect_flood_episodes(data),
+                                  detect_flood_episodes(data, hysteresis=0, min_hours=0))
+
+
+def test_gap_splits_a_run():
+    # Jam 2-4 hilang: pembacaan sebelum dan sesudah gap bukan satu banjir
+    data = readings([250, 250, 250, 250, 250, 250], hours=[0, 1, 5, 6, 7, 8])
+    episodes = detect_flood_episodes(data, hysteresis=0, min_hours=0)
+    assert spans(episodes) == [(0, 1), (5, 8)]
+    assert episodes['duration_hours'].tolist() == [2.0, 4.0]
+
+
+def test_gap_tolerance_bridges_short_gaps():
+    data = readings([250, 250, 250, 250], hours=[0, 1, 3, 4])
+    assert len(detect_flood_episodes(data, hysteresis=0, min_hours=0)) == 2
+    assert spans(detect_flood_episodes(data, gap_tolerance=2.5, hysteresis=0, min_hours=0)) == [(0, 4)]
+
+
+def test_hysteresis_keeps_one_episode_through_a_dip():
+    data = readings([100, 210, 195, 220, 180, 100])
+    assert spans(detect_flood_episodes(data, hysteresis=0, min_hours=0)) == [(1, 1), (3, 3)]
+
+    episodes = detect_flood_episodes(data, hysteresis=15, min_hours=0)
+    assert spans(episodes) == [(1, 3)]
+    assert episodes['peak_height_cm'].tolist() == [220.0]
+
+
+def test_hysteresis_does_not_start_an_episode_below_threshold():
+    episodes = detect_flood_episodes(readings([190, 195, 190, 100]), hysteresis=15, min_hours=0)
+    assert episodes.empty
+
+
+def test_min_hours_drops_short_episodes():
+    data = readings([210, 100, 210, 220, 230, 100])
+    assert spans(detect_flood_episodes(data, hysteresis=0, min_hours=2)) == [(2, 4)]
+
+
+def test_rivers_are_independent_and_order_does_not_matter():
+    data = pd.concat([readings([100, 250, 250, 100], river='Sungai A'),
+                      readings([250, 100, 100, 250], river='Sungai B')], ignore_index=True)
+    episodes = detect_flood_episodes(data, hysteresis=0, min_hours=0)
+    shuffled = detect_flood_episodes(data.sample(frac=1, random_state=0), hysteresis=0, min_hours=0)
+    key = lambda frame: frame.drop(columns='episode_id').sort_values(['river_name', 'start'], ignore_index=True)
+    pd.testing.assert_frame_equal(key(episodes), key(shuffled))
+    assert list(zip(episodes['river_name'], spans(episodes))) == [
+        ('Sungai A', (1, 2)), ('Sungai B', (0, 0)), ('Sungai B', (3, 3))
+    ]
+
+
+def sampled_events(data, **windows):
+    episodes = detect_flood_episodes(data, hysteresis=0, min_hours=0)
+    return FloodDataSampler(data, episodes=episodes).flood_event_sampling(**windows)
+
+
+def flood_day():
+    """Banjir pada jam 10-11, 20 dan 40 di Sungai A; Sungai B tanpa banjir"""
+    heights = np.full(48, 100.0)
+    heights[[10, 11, 20, 40]] = 250.0
+    return pd.concat([readings(heights, river='Sungai A'),
+                      readings(np.full(48, 100.0), river='Sungai B')], ignore_index=True)
+
+
+def test_event_windows_merge_when_they_touch():
+    events = sampled_events(flood_day(), include_before_hours=6, include_after_hours=12)
+    hours = (events['timestamp'] - START) // pd.Timedelta(hours=1)
+    assert set(events['river_name']) == {'Sungai A'}
+    # Window 10-11 (+12 jam) menyentuh window 20 (-6 jam): satu event.
+    # Window 40 (-6 jam) mulai setelah 20 + 12 jam: event baru
+    assert hours[events['event_id'] == 1].tolist() == list(range(4, 33))
+    assert hours[events['event_id'] == 2].tolist() == list(range(34, 48))
+    assert not events.index.duplicated().any()
+
+
+def test_event_phases():
+    data = flood_day()
+    events = sampled_events(data, include_before_hours=6, include_after_hours=12)
+    hours = (events['timestamp'] - START) // pd.Timedelta(hours=1)
+    phase = dict(zip(hours, events['event_phase']))
+
+    assert [h for h, p in phase.items() if p == 'PEAK'] == [10, 11, 20, 40]
+    assert [h for h, p in phase.items() if p == 'BEFORE'] == list(range(4, 10)) + list(range(34, 40))
+    # AFTER menang dari BEFORE jika keduanya berlaku (jam 14-19)
+    assert [h for h, p in phase.items() if p == 'AFTER'] == (
+        list(range(12, 20)) + list(range(21, 33)) + list(range(41, 48))
+    )
+    # Setiap pembacaan di atas threshold termasuk PEAK
+    flooded = data[data['water_height_cm'] > 200].index
+    assert (events.loc[flooded, 'event_phase'] == 'PEAK').all()
+
+
+def test_separate_events_without_overlap():
+    events = sampled_events(flood_day(), include_before_hours=1, include_after_hours=1)
+    hours = (events['timestamp'] - START) // pd.Timedelta(hours=1)
+    assert events['event_id'].nunique() == 3
+    assert hours.tolist() == [9, 10, 11, 12, 19, 20, 21, 39, 40, 41]
+
+
+def test_no_episodes_gives_empty_sample():
+    data = readings(np.full(12, 100.0))
+    assert sampled_events(data).empty
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_generator import generate_flood_data
+from src.forecaster import WaterLevelForecaster
+
+
+@pytest.fixture(scope='module')
+def data():
+    return generate_flood_data(n_rivers=3, days=20)
+
+
+def assert_same_model(model, expected):
+    assert model.rivers == expected.rivers
+    np.testing.assert_allclose(model.xtx, expected.xtx, rtol=1e-9)
+    np.testing.assert_allclose(model.xty, expected.xty, rtol=1e-9)
+    np.testing.assert_array_equal(model.n, expected.n)
+    np.testing.assert_array_equal(model.readings, expected.readings)
+    pd.testing.assert_frame_equal(model.predict(), expected.predict(), check_exact=False, atol=0.01)
+
+
+@pytest.mark.parametrize('n_chunks', [2, 7, 50])
+def test_incremental_update_matches_full_fit(data, n_chunks):
+    model = WaterLevelForecaster()
+    for rows in np.array_split(np.arange(len(data)), n_chunks):
+        model.update(data.iloc[rows])
+    assert_same_model(model, WaterLevelForecaster().update(data))
+
+
+def test_late_readings_are_ignored_by_update(data):
+    cutoff = data['timestamp'].quantile(0.5)
+    model = WaterLevelForecaster().update(data[data['timestamp'] > cutoff])
+    before = model.xtx.copy()
+    model.update(data[data['timestamp'] <= cutoff])
+    np.testing.assert_array_equal(model.xtx, before)
+
+
+def test_sync_extends_without_refit(data):
+    cutoff = data['timestamp'].quantile(0.7)
+    model = WaterLevelForecaster().update(data[data['timestamp'] <= cutoff])
+    synced = model.sync(data)
+    assert synced is model
+    assert synced.refit_reason is None
+    assert_same_model(synced, WaterLevelForecaster().update(data))
+
+
+def test_sync_refits_after_late_readings(data):
+    late = data.sample(20, random_state=1).index
+    model = WaterLevelForecaster().update(data.drop(index=late))
+    synced = model.sync(data)
+    assert synced is not model
+    assert synced.refit_reason == 'late or removed readings'
+    assert_same_model(synced, WaterLevelForecaster().update(data))
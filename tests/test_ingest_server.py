@@ -0,0 +1,109 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from src.data_generator import generate_flood_data
+from src.ingest_server import IngestServer, MicroBatchWriter, load_parts
+
+
+def valid_reading():
+    row = generate_flood_data(n_rivers=1, days=1).iloc[0]
+    return {col: value.isoformat() if col == 'timestamp' else
+            value if isinstance(value, str) else float(value)
+            for col, value in row.items()}
+
+
+@pytest.fixture
+def server(tmp_path):
+    return IngestServer(MicroBatchWriter(str(tmp_path), file_format='npz'), port=0)
+
+
+def post(server, body, content_type='application/json'):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    request = {'method': 'POST', 'path': '/readings',
+               'headers': {'content-type': content_type}, 'body': body}
+    return server.post_readings(request)
+
+
+@pytest.mark.parametrize('body', [b'5', b'null', b'"reading"', b'true'])
+def test_rejects_json_that_is_not_an_object_or_list(server, body):
+    status, payload = post(server, body)
+    assert status == 400
+    assert 'expected a JSON object' in payload['error']
+    assert server.writer.metrics()['rows_pending'] == 0
+
+
+def test_rejects_invalid_json(server):
+    status, payload = post(server, b'{"river_name": ')
+    assert status == 400
+    assert payload['error'].startswith('invalid JSON')
+
+
+def test_rejects_readings_that_are_not_objects(server):
+    status, payload = post(server, [5, None, 'x'])
+    assert status == 400
+    assert [r['index'] for r in payload['rejected']] == [0, 1, 2]
+    assert server.writer.rows_rejected == 3
+
+
+def test_rejects_bad_fields_but_keeps_good_readings(server):
+    good = valid_reading()
+    missing = {k: v for k, v in good.items() if k != 'water_height_cm'}
+    bad_time = {**good, 'timestamp': 'yesterday'}
+    bad_number = {**good, 'rainfall_mm': 'NaN'}
+    bad_enum = {**good, 'flood_status': 'MAYBE'}
+    status, payload = post(server, [good, missing, bad_time, bad_number, bad_enum])
+    assert status == 202
+    assert payload['accepted'] == 1
+    errors = {r['index']: r['error'] for r in payload['rejected']}
+    assert errors[1].startswith('missing columns: water_height_cm')
+    assert errors[2].startswith('timestamp: invalid timestamp')
+    assert errors[3] == 'rainfall_mm: expected a number'
+    assert errors[4].startswith('flood_status:')
+
+
+def test_ndjson_body(server):
+    body = '\n'.join(json.dumps(valid_reading()) for _ in range(2)).encode()
+    status, payload = post(server, body, content_type='application/x-ndjson')
+    assert (status, payload['accepted']) == (202, 2)
+
+
+async def exchange(server, raw):
+    """Kirim request mentah, kembalikan status line setiap respons"""
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 10)
+        writer.close()
+    finally:
+        await server.stop()
+    # Respons keep-alive berurutan: status line langsung setelah body sebelumnya
+    return [line.decode() for line in re.findall(rb'HTTP/1\.1 \d{3} \w+', response)]
+
+
+def test_http_malformed_content_length_closes_connection(server):
+    statuses = asyncio.run(exchange(server, b'POST /readings HTTP/1.1\r\nContent-Length: abc\r\n\r\n'
+                                            b'GET /health HTTP/1.1\r\n\r\n'))
+    assert statuses == ['HTTP/1.1 400 Error']
+
+
+def test_http_failing_handler_returns_500_and_keeps_connection(server):
+    def broken(request):
+        raise RuntimeError('boom')
+    server.routes[('GET', '/broken')] = broken
+    statuses = asyncio.run(exchange(server, b'GET /broken HTTP/1.1\r\n\r\n'
+                                            b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n'))
+    assert statuses == ['HTTP/1.1 500 Error', 'HTTP/1.1 200 OK']
+
+
+def test_http_accepted_readings_are_flushed(server, tmp_path):
+    body = json.dumps([valid_reading(), 5]).encode()
+    statuses = asyncio.run(exchange(server, b'POST /readings HTTP/1.1\r\nConnection: close\r\n'
+                                            b'Content-Length: %d\r\n\r\n' % len(body) + body))
+    assert statuses == ['HTTP/1.1 202 OK']
+    assert len(load_parts(str(tmp_path))) == 1
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.live_stream import LiveStatusHub
+
+
+@pytest.fixture
+def hub():
+    hub = LiveStatusHub(capacity=5)
+    hub.ingest(pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=8, freq='1h'),
+        'river_name': 'Sungai A',
+        'water_height_cm': np.arange(8, dtype=float) * 10 + 100,
+        'water_flow_m3s': 1.0,
+        'rainfall_mm': 0.0
+    }))
+    return hub
+
+
+def recent(hub, query):
+    return hub.recent({'path': f'/live/recent?{query}'})
+
+
+def test_n_limits_to_newest_readings(hub):
+    status, payload = recent(hub, 'river=Sungai+A&n=2')
+    assert status == 200
+    assert payload['water_height_cm'] == [160.0, 170.0]
+    assert len(payload['t']) == 2
+
+
+@pytest.mark.parametrize('query', ['river=Sungai+A', 'river=Sungai+A&n=0', 'river=Sungai+A&n='])
+def test_missing_or_zero_n_returns_ring_buffer(hub, query):
+    status, payload = recent(hub, query)
+    assert status == 200
+    assert payload['water_height_cm'] == [130.0, 140.0, 150.0, 160.0, 170.0]
+
+
+def test_n_is_capped_at_capacity(hub):
+    status, payload = recent(hub, 'river=Sungai+A&n=1000000')
+    assert status == 200
+    assert len(payload['t']) == hub.capacity
+
+
+@pytest.mark.parametrize('n', ['abc', '-1', '1.5', '%C2%B2', '+3'])
+def test_invalid_n_is_rejected(hub, n):
+    status, payload = recent(hub, f'river=Sungai+A&n={n}')
+    assert status == 400
+    assert 'non-negative integer' in payload['error']
+
+
+@pytest.mark.parametrize('query', ['river=Sungai+B&n=2', 'n=2'])
+def test_unknown_river_is_404(hub, query):
+    status, _ = recent(hub, query)
+    assert status == 404
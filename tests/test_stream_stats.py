@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_generator import generate_flood_data
+from src.stream_stats import CoMomentAccumulator, StreamingStats
+
+COLUMNS = ['water_height_cm', 'water_flow_m3s', 'rainfall_mm', 'temperature_c']
+
+
+@pytest.fixture(scope='module')
+def data():
+    return generate_flood_data(n_rivers=3, days=20).astype({col: 'float64' for col in COLUMNS})
+
+
+def partitions(data):
+    """Dua partisi yang tidak sejalan dengan sungai maupun waktu"""
+    mask = np.random.default_rng(0).random(len(data)) < 0.4
+    return data[mask], data[~mask]
+
+
+def test_merged_stats_match_pandas(data):
+    first, second = partitions(data)
+    stats = StreamingStats(COLUMNS).update(first).merge(StreamingStats(COLUMNS).update(second))
+
+    expected = data[COLUMNS].describe()
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_frame_equal(stats.describe().loc[exact], expected.loc[exact], rtol=1e-9)
+    # Kuantil dari t-digest: perkiraan
+    spread = expected.loc['max'] - expected.loc['min']
+    error = (stats.describe().loc[['25%', '50%', '75%']] - expected.loc[['25%', '50%', '75%']]).abs()
+    assert (error <= 0.02 * spread).all().all()
+
+
+def test_merged_stats_per_river_match_pandas(data):
+    first, second = partitions(data)
+    stats = StreamingStats(COLUMNS).update(first).merge(StreamingStats(COLUMNS).update(second))
+    assert stats.rows == data['river_name'].astype(str).value_counts().to_dict()
+    for river, group in data.groupby('river_name', observed=True):
+        expected = group[COLUMNS].agg(['count', 'mean', 'std', 'min', 'max'])
+        pd.testing.assert_frame_equal(stats.describe(river).loc[expected.index], expected, rtol=1e-9)
+
+
+def test_merge_matches_single_pass(data):
+    first, second = partitions(data)
+    merged = StreamingStats(COLUMNS).update(first).merge(StreamingStats(COLUMNS).update(second))
+    single = StreamingStats(COLUMNS).update(data)
+    for name in merged.moments:
+        rows = [merged.groups.index(group) for group in single.groups]
+        np.testing.assert_allclose(merged.moments[name][rows], single.moments[name], rtol=1e-9)
+    assert merged.watermarks == single.watermarks
+
+
+def test_merged_correlation_matches_pandas(data):
+    first, second = partitions(data)
+    accumulator = CoMomentAccumulator(COLUMNS, window_days=0).update(first)
+    accumulator.merge(CoMomentAccumulator(COLUMNS, window_days=0).update(second))
+
+    pd.testing.assert_frame_equal(accumulator.corr(), data[COLUMNS].corr(), rtol=1e-9)
+    for river, group in data.groupby('river_name', observed=True):
+        pd.testing.assert_frame_equal(accumulator.corr(group=river), group[COLUMNS].corr(), rtol=1e-9)
+
+
+def test_merged_window_correlation_matches_pandas(data):
+    first, second = partitions(data)
+    accumulator = CoMomentAccumulator(COLUMNS, window_days=7).update(first)
+    accumulator.merge(CoMomentAccumulator(COLUMNS, window_days=7).update(second))
+
+    last_day = data['timestamp'].dt.normalize().max()
+    recent = data[data['timestamp'] >= last_day - pd.Timedelta(days=6)]
+    pd.testing.assert_frame_equal(accumulator.corr(window=True), recent[COLUMNS].corr(), rtol=1e-9)
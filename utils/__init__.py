@@ -0,0 +1 @@
+"""Configuration and shared helpers."""
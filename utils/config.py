@@ -14,7 +14,10 @@ DATASET_CONFIG = {
     ],
     'sensor_height_cm': 300,
     'flood_threshold_cm': 200,
-    'warning_threshold_cm': 150
+    'flood_hysteresis_cm': 0,  # opt-in smoothing: an episode ends only below threshold - hysteresis
+    'min_flood_hours': 0,  # opt-in: shorter runs above the threshold are not flood episodes
+    'warning_threshold_cm': 150,
+    'rainy_season_months': [1, 2, 3, 10, 11, 12]
 }
 
 # Sensor Configuration
@@ -33,7 +36,213 @@ FILE_PATHS = {
     'samples_dir': 'data/samples/',
     'outputs_dir': 'outputs/',
     'plots_dir': 'outputs/plots/',
-    'reports_dir': 'outputs/reports/'
+    'reports_dir': 'outputs/reports/',
+    'ingest_state': 'data/processed/ingest_state.json',
+    'cache_dir': 'data/processed/cache/',
+    'stats_dir': 'data/processed/stats/',
+    'models_dir': 'data/processed/models/',
+    'store_dir': 'data/processed/store/',
+    'pipeline_cache_dir': 'data/processed/pipeline/'
+}
+
+# Typed schema for the raw dataset (used by the columnar cache)
+DATASET_SCHEMA = {
+    'timestamp': 'datetime64[ns]',
+    'river_name': 'category',
+    'sensor_distance_cm': 'float32',
+    'water_height_cm': 'float32',
+    'water_flow_m3s': 'float32',
+    'flood_status': 'category',
+    'flood_level': 'category',
+    'rainfall_mm': 'float32',
+    'humidity_pct': 'float32',
+    'temperature_c': 'float32',
+    'sensor_status': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64'
+}
+
+# Per-river Parallelism Configuration
+PARALLEL_CONFIG = {
+    'executor': 'serial',  # serial, thread, process
+    'workers': None,  # None = os.cpu_count()
+    # Process pools run inside pipeline stage threads; fork with live threads can deadlock
+    'start_method': 'spawn'
+}
+
+# Pipeline Stage Graph Configuration (see src/pipeline.py)
+PIPELINE_CONFIG = {
+    'stage_workers': 3  # independent stages (samples, analysis, plots, ...) run concurrently
+}
+
+# Dashboard Snapshot Configuration
+SNAPSHOT_CONFIG = {
+    'output_dir': 'web/static/data/',
+    'schema_version': 1,
+    'hourly_days': 7,  # window of the hourly rollup
+    'max_points_per_series': 500  # downsampling for dashboard charts
+}
+
+# Allowed values of the enum columns in the raw dataset
+DATASET_ENUMS = {
+    'flood_status': ['AMAN', 'BANJIR'],
+    'flood_level': ['RENDAH', 'SEDANG', 'TINGGI'],
+    'sensor_status': ['NORMAL', 'ERROR']
+}
+
+# Live Ingestion Server Configuration
+INGEST_SERVER_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'batch_max_rows': 5000,  # flush when this many readings are buffered
+    'batch_max_latency_s': 0.5,  # ... or when the oldest buffered reading is this old
+    'output_dir': 'data/processed/live/'
+}
+
+# Live Dashboard Stream Configuration (SSE on the ingestion server)
+LIVE_STREAM_CONFIG = {
+    'ring_capacity': 720,  # readings kept per river
+    'level_tolerance_cm': 5.0,  # push a river only if its level moved this much (or its status changed)
+    'client_queue_size': 64,  # pending events per client before it is dropped
+    'keepalive_s': 15
+}
+
+# Streaming Statistics Configuration (basic_statistics accumulators)
+STATS_CONFIG = {
+    'columns': ['sensor_distance_cm', 'water_height_cm', 'water_flow_m3s',
+                'rainfall_mm', 'humidity_pct', 'temperature_c'],
+    'tdigest_compression': 200  # max centroids per digest; higher = more accurate quantiles
+}
+
+# Correlation Configuration (co-moment accumulators)
+CORRELATION_CONFIG = {
+    'columns': ['water_height_cm', 'water_flow_m3s', 'rainfall_mm',
+                'humidity_pct', 'temperature_c'],
+    'window_days': 7,  # rolling correlation over the last N days
+    'strong_threshold': 0.3
+}
+
+# Early-warning Rule Configuration
+# kind: 'rise' (change over the window), 'sum' (accumulation over the window),
+# 'min' (sustained: lowest value over the window) or 'value' (latest reading).
+# An alert switches on at metric >= 'on' and clears only below 'off' (hysteresis).
+ALERT_CONFIG = {
+    'rules': [
+        {'name': 'rapid_rise_3h', 'column': 'water_height_cm', 'kind': 'rise',
+         'window_hours': 3, 'on': 80.0, 'off': 40.0, 'severity': 'warning'},
+        {'name': 'heavy_rain_6h', 'column': 'rainfall_mm', 'kind': 'sum',
+         'window_hours': 6, 'on': 60.0, 'off': 40.0, 'severity': 'warning'},
+        {'name': 'sustained_warning_3h', 'column': 'water_height_cm', 'kind': 'min',
+         'window_hours': 3, 'on': 150.0, 'off': 140.0, 'severity': 'warning'},
+        {'name': 'sustained_flood_2h', 'column': 'water_height_cm', 'kind': 'min',
+         'window_hours': 2, 'on': 200.0, 'off': 190.0, 'severity': 'danger'}
+    ],
+    'cooldown_hours': 6,  # re-triggers within this time after a clear are not re-announced
+    # Readings outside this window are rejected (clock resets, far-future timestamps).
+    # Future is checked against the wall clock; local (WIB) timestamps are up to 7 h ahead of UTC
+    'max_future_hours': 24,
+    'max_age_days': 400,  # behind the newest accepted reading
+    'latency_window': 1000  # batches kept for the latency report
+}
+
+# Water Level Forecast Configuration (per-river linear/AR models)
+FORECAST_CONFIG = {
+    'horizon_hours': 6,
+    'lags': {  # hours of history used as features, per column
+        'water_height_cm': 6,
+        'rainfall_mm': 6,
+        'water_flow_m3s': 2
+    },
+    'ridge': 1e-3,  # relative ridge penalty on the normal equations
+    'train_days': 60,  # backtest: initial training period
+    'refit_hours': 24  # backtest: incremental refit interval
+}
+
+# Columnar Cache Configuration
+CACHE_CONFIG = {
+    'enabled': True,
+    'format': 'auto'  # auto (parquet if pyarrow is installed, else npy), parquet, npy
+}
+
+# Incremental Ingestion Configuration
+INGEST_CONFIG = {
+    'chunk_size': 50000  # rows per chunk passed to consumers
+}
+
+# Partitioned Store Configuration (river=<name>/month=YYYY-MM)
+STORE_CONFIG = {
+    'format': 'auto',  # auto (parquet if pyarrow is installed, else npz), parquet, npz
+    'compact_min_files': 2  # merge a partition once it has this many part files
+}
+
+# Data Quality Configuration (bitmask per reading, see src/quality_check.py)
+QC_CONFIG = {
+    'stuck_readings': 6,  # identical consecutive heights before a sensor counts as stuck
+    'spike_cm': 100.0,  # reading sticks out from both neighbours by more than this
+    'max_rate_cm_per_hour': 150.0,  # faster level change is physically impossible
+    'mismatch_tolerance_cm': 1.0,  # |height - (sensor_height - distance)|
+    'gap_factor': 1.5  # gap when readings are further apart than factor x sampling interval
+}
+
+# Regular Time Grid Configuration (rivers x slots matrices, see src/time_grid.py)
+GRID_CONFIG = {
+    'freq': '1h',  # grid step, e.g. '1h' or '15min'
+    'columns': ['water_height_cm', 'sensor_distance_cm', 'water_flow_m3s',
+                'rainfall_mm', 'temperature_c', 'humidity_pct'],
+    'fill': {
+        'rainfall_mm': 'none'  # missing rain is unknown, not zero
+    },
+    'default_fill': 'linear',  # linear, ffill, zero, none
+    'limit_hours': 3  # longer gaps stay empty
+}
+
+# Channel Hydraulics Configuration (Manning flow, see src/hydraulics.py)
+HYDRAULICS_CONFIG = {
+    'default': {
+        'profile': 'rectangular',  # rectangular, trapezoidal, triangular
+        'width_m': 4.0,  # bottom width
+        'side_slope': 0.0,  # horizontal per vertical (trapezoidal, triangular)
+        'slope': 1.5e-4,  # bed slope
+        'roughness': 0.035  # Manning's n, typical for natural streams
+    },
+    # Overrides per river: bed slopes calibrated on Jan-Mar 8 2024, checked on the held-out
+    # rest of the record with hydraulics.holdout_validation
+    'rivers': {
+        'Setail_River': {'slope': 1.56e-4},
+        'Kalibaru_River': {'slope': 1.56e-4},
+        'Tambong_River': {'slope': 1.57e-4},
+        'Panggang_River': {'slope': 1.56e-4},
+        'Mayang_River': {'slope': 1.56e-4},
+        'Bomo_River': {'slope': 1.56e-4},
+        'Sobo_River': {'slope': 1.57e-4}
+    },
+    'min_flow_m3s': 0.1,
+    'flow_rtol': 0.25,  # stored flow may differ from Manning by max(rtol * computed, atol)
+    'flow_atol_m3s': 0.05,  # floor for low flows; stored flows are 0.3-5 m3/s
+    'holdout_fraction': 0.25  # last part of the period kept out of slope calibration
+}
+
+# Stage Instrumentation Configuration (see src/instrumentation.py)
+INSTRUMENTATION_CONFIG = {
+    'enabled': True,
+    'metrics_path': 'outputs/reports/metrics.prom',  # .prom (Prometheus text) or .json
+    'rss_sample_interval_s': 0.01,  # peak RSS sampling while a stage runs
+    'max_records': 10000,  # individual stage runs kept for the JSON report
+    'profiler': 'cprofile',  # cprofile, pyinstrument (if installed)
+    'profile_dir': 'outputs/reports/profiles/',
+    'profile_top': 25  # functions listed in the text summary of a profile
+}
+
+# Synthetic Data Generator Configuration (see src/data_generator.py)
+GENERATOR_CONFIG = {
+    'storms_per_day_rainy': 1.0,  # storm onsets per river and day in rainy season months
+    'storms_per_day_dry': 0.2,
+    'storm_intensity_mm': 6.0,  # mean rain per hour at storm onset
+    'storm_decay_hours': 4.0,  # rain intensity e-folding time
+    'catchment_decay_hours': 12.0,  # water level response e-folding time
+    'rain_response_mm': 0.3,  # stored rain that raises a river by its rain effect
+    'sensor_error_rate': 0.02,
+    'block_rows': 2_000_000  # rows generated per block of rivers
 }
 
 # Sampling Configuration
@@ -49,5 +258,15 @@ VISUALIZATION_CONFIG = {
     'style': 'seaborn',
     'color_palette': 'viridis',
     'figure_size': (12, 8),
-    'dpi': 300
+    'dpi': 300,
+    'max_points_per_series': 2000,  # visual downsampling per river line
+    'downsample_method': 'lttb',  # lttb or minmax
+    'trace_memory': False,  # render_all: tracemalloc peak per plot (about 2x slower renders)
+    'plots': [  # rendered by render_all, in this order
+        'water_level_timeseries',
+        'flood_events_distribution',
+        'correlation_heatmap',
+        'river_comparison',
+        'temporal_patterns'
+    ]
 }
\ No newline at end of file
@@ -0,0 +1,104 @@
+import numpy as np
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').view('int64')
+    return values.astype(float)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the
+    visual shape of the series (first and last point always included)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = _as_float(x)
+    y = _as_float(y)
+    
+    # n_out - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    bucket_sum_x = np.add.reduceat(x[:-1], edges[:-1]) if n > 2 else np.zeros(0)
+    bucket_sum_y = np.add.reduceat(y[:-1], edges[:-1]) if n > 2 else np.zeros(0)
+    bucket_size = np.diff(edges)
+    avg_x = np.append(bucket_sum_x / bucket_size, x[-1])
+    avg_y = np.append(bucket_sum_y / bucket_size, y[-1])
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Triangle area against the previous pick and the next bucket's average
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y, n_bins):
+    """
+    Per-bin (per-pixel) min/max: indices of the minimum and maximum of each
+    of `n_bins` equal-width bins, plus the first and last point
+    """
+    y = _as_float(y)
+    n = len(y)
+    if n <= 2 * n_bins:
+        return np.arange(n)
+    
+    size = -(-n // n_bins)
+    padded = np.full(size * n_bins, np.nan)
+    padded[:n] = y
+    bins = padded.reshape(n_bins, size)
+    offsets = np.arange(n_bins) * size
+    
+    lowest = np.where(np.isnan(bins), np.inf, bins)
+    highest = np.where(np.isnan(bins), -np.inf, bins)
+    index_min = offsets + lowest.argmin(axis=1)
+    index_max = offsets + highest.argmax(axis=1)
+    valid_min = np.isfinite(lowest.min(axis=1))
+    valid_max = np.isfinite(highest.max(axis=1))
+    
+    return np.unique(np.concatenate((
+        [0, n - 1], index_min[valid_min], index_max[valid_max]
+    )))
+
+def peak_indices(y, threshold):
+    """Index of the maximum of every run of consecutive values above threshold"""
+    y = _as_float(y)
+    above = y > threshold
+    if not above.any():
+        return np.zeros(0, dtype=np.int64)
+    
+    padded = np.concatenate(([False], above, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, ends = edges[::2], edges[1::2]
+    
+    # Sort each run's values descending within the run, take the first
+    positions = np.flatnonzero(above)
+    run_id = np.repeat(np.arange(len(starts)), ends - starts)
+    order = np.lexsort((-y[positions], run_id))
+    first_of_run = np.concatenate(([0], np.cumsum(ends - starts)[:-1]))
+    return positions[order[first_of_run]]
+
+def downsample_indices(x, y, n_out, method='lttb', keep_peaks_above=None):
+    """
+    Indices of the points to draw for one series: `method` ('lttb' or
+    'minmax') picks about `n_out` points, and the peak of every excursion
+    above `keep_peaks_above` is always kept exactly
+    """
+    if method == 'lttb':
+        indices = lttb_indices(x, y, n_out)
+    elif method == 'minmax':
+        indices = minmax_indices(y, max(n_out // 2, 1))
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    
+    if keep_peaks_above is not None and len(indices) < len(y):
+        indices = np.union1d(indices, peak_indices(y, keep_peaks_above))
+    return indices
@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from utils.config import DATASET_CONFIG
+
 def create_directories():
     directories = [
         'data/raw',
@@ -19,8 +21,9 @@ def create_directories():
         print(f"Created: {directory}")
 
 def calculate_water_flow(water_height_cm, river_width_m=10, river_slope=0.01):
+    # Scalar atau array; geometri per sungai ada di src/hydraulics.py
     # Convert height to meters
-    h = water_height_cm / 100
+    h = np.asarray(water_height_cm, dtype=np.float64) / 100
     
     # Simplified Manning's equation
     roughness_coefficient = 0.035  # Typical for natural streams
@@ -32,7 +35,8 @@ def calculate_water_flow(water_height_cm, river_width_m=10, river_slope=0.01):
                  (river_slope ** 0.5) / 
                  roughness_coefficient)
     
-    return max(0.1, water_flow)  # Minimum flow 0.1 m³/s
+    water_flow = np.maximum(0.1, water_flow)  # Minimum flow 0.1 m³/s
+    return float(water_flow) if water_flow.ndim == 0 else water_flow
 
 def detect_flood_events(water_levels, threshold=200):
     """
@@ -43,24 +47,94 @@ def detect_flood_events(water_levels, threshold=200):
 
 def calculate_flood_duration(flood_events):
     """
-    Calculate duration of flood events
+    Calculate duration of flood events (in readings)
+    """
+    flood_events = np.asarray(flood_events, dtype=bool)
+    if flood_events.size == 0:
+        return []
+    
+    # Run-length encoding: posisi awal dan akhir setiap run True
+    padded = np.concatenate(([False], flood_events, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return (edges[1::2] - edges[::2]).tolist()
+
+def detect_flood_episodes(data, threshold=200, gap_tolerance=1.5, hysteresis=None, min_hours=None):
+    """
+    Detect flood episodes for all rivers in one pass.
+    
+    An episode is a run of readings above `threshold`. Smoothing is opt-in
+    (DATASET_CONFIG defaults are 0): with `hysteresis` an episode lasts while
+    the river stays above `threshold - hysteresis`, so noise around the
+    threshold does not split one flood into many, and episodes shorter than
+    `min_hours` hours are dropped. A run is split when the time between two readings
+    exceeds `gap_tolerance` times the river's typical sampling interval, so
+    missing readings never get counted as flood time. Durations are in hours.
     """
-    flood_durations = []
-    current_duration = 0
+    hysteresis = DATASET_CONFIG['flood_hysteresis_cm'] if hysteresis is None else hysteresis
+    min_hours = DATASET_CONFIG['min_flood_hours'] if min_hours is None else min_hours
+    columns = ['episode_id', 'river_name', 'start', 'end', 'duration_hours',
+               'n_readings', 'peak_height_cm']
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+    
+    river_codes, rivers = pd.factorize(data['river_name'])
+    timestamps = data['timestamp'].to_numpy()
+    times = timestamps.astype('datetime64[ns]').view('int64')
+    heights = data['water_height_cm'].to_numpy(dtype=float)
+    
+    order = np.lexsort((times, river_codes))
+    river_codes = river_codes[order]
+    times = times[order]
+    heights = heights[order]
+    timestamps = timestamps[order]
+    above_exit = detect_flood_events(heights, threshold - hysteresis)
+    
+    # Interval sampling tipikal per sungai (median selisih waktu)
+    deltas = np.diff(times)
+    same_river = river_codes[1:] == river_codes[:-1]
+    interval = pd.Series(deltas[same_river]).groupby(river_codes[1:][same_river]).median()
+    interval = interval.reindex(range(len(rivers))).fillna(pd.Timedelta(hours=1).value)
+    interval = interval.to_numpy(dtype='int64')
+    
+    # Run di atas ambang keluar: lanjut jika sungai sama, sebelumnya di atas, dan tanpa gap
+    continues = np.zeros(len(order), dtype=bool)
+    continues[1:] = (
+        same_river
+        & above_exit[:-1]
+        & (deltas <= gap_tolerance * interval[river_codes[1:]])
+    )
+    positions = np.flatnonzero(above_exit)
+    if positions.size == 0:
+        return pd.DataFrame(columns=columns)
     
-    for is_flood in flood_events:
-        if is_flood:
-            current_duration += 1
-        else:
-            if current_duration > 0:
-                flood_durations.append(current_duration)
-                current_duration = 0
+    run_starts = np.flatnonzero(~continues[positions])
+    run_ends = np.append(run_starts[1:], positions.size) - 1
     
-    # Don't forget the last event
-    if current_duration > 0:
-        flood_durations.append(current_duration)
+    # Episode dimulai pada pembacaan pertama di atas threshold dalam run
+    entered = np.where(heights[positions] > threshold, np.arange(positions.size), positions.size)
+    first_entry = np.minimum.reduceat(entered, run_starts)
+    entered_runs = first_entry <= run_ends
+    first = positions[np.minimum(first_entry, run_ends)]
+    last = positions[run_ends]
+    codes = river_codes[first]
+    duration_hours = (times[last] - times[first] + interval[codes]) / pd.Timedelta(hours=1).value
+    # Puncak run = puncak episode (pembacaan sebelum masuk <= threshold)
+    peaks = np.maximum.reduceat(heights[positions], run_starts)
+    keep = entered_runs & (duration_hours >= min_hours)
+    if not keep.any():
+        return pd.DataFrame(columns=columns)
     
-    return flood_durations
+    first, last, codes = first[keep], last[keep], codes[keep]
+    episodes = pd.DataFrame({
+        'episode_id': np.arange(1, len(first) + 1),
+        'river_name': rivers[codes],
+        'start': timestamps[first],
+        'end': timestamps[last],
+        'duration_hours': duration_hours[keep],
+        'n_readings': (run_ends - first_entry + 1)[keep],
+        'peak_height_cm': peaks[keep]
+    })
+    return episodes
 
 def format_timestamp(timestamp):
     """Format timestamp for consistent display"""
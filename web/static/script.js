@@ -2,7 +2,9 @@
 const CONFIG = {
     dataUrls: {
         main: '../data/raw/iot_floodmonitor_banyuwangi_hydrological_2024_v1.0.csv',
-        samples: 'data/samples/'
+        samples: 'data/samples/',
+        snapshots: 'data/', // JSON snapshots dari pipeline Python (manifest.json, latest.json, ...)
+        liveStream: 'http://127.0.0.1:8765/live' // SSE dari server ingest (src/ingest_server.py)
     },
     updateInterval: 300000, // 5 minutes
     floodThresholds: {
@@ -14,13 +16,13 @@ const CONFIG = {
 
 // Data sungai Banyuwangi
 const rivers = [
-    { id: 1, name: 'Kali Setail', lat: -8.2192, lng: 114.3691, status: 'normal', waterLevel: 1.2, dangerLevel: 3.0 },
-    { id: 2, name: 'Kali Baru', lat: -8.2135, lng: 114.3685, status: 'warning', waterLevel: 2.5, dangerLevel: 3.0 },
-    { id: 3, name: 'Kali Tambong', lat: -8.2078, lng: 114.3662, status: 'normal', waterLevel: 1.8, dangerLevel: 3.5 },
-    { id: 4, name: 'Kali Panggang', lat: -8.2019, lng: 114.3624, status: 'danger', waterLevel: 4.2, dangerLevel: 4.0 },
-    { id: 5, name: 'Kali Mayang', lat: -8.1963, lng: 114.3587, status: 'normal', waterLevel: 1.5, dangerLevel: 3.2 },
-    { id: 6, name: 'Kali Bomo', lat: -8.1905, lng: 114.3549, status: 'warning', waterLevel: 2.8, dangerLevel: 3.0 },
-    { id: 7, name: 'Kali Sobo', lat: -8.1847, lng: 114.3512, status: 'normal', waterLevel: 1.1, dangerLevel: 2.8 }
+    { id: 1, name: 'Kali Setail', source: 'Setail River', lat: -8.2192, lng: 114.3691, status: 'normal', waterLevel: 1.2, dangerLevel: 3.0 },
+    { id: 2, name: 'Kali Baru', source: 'Kalibaru River', lat: -8.2135, lng: 114.3685, status: 'warning', waterLevel: 2.5, dangerLevel: 3.0 },
+    { id: 3, name: 'Kali Tambong', source: 'Tambong River', lat: -8.2078, lng: 114.3662, status: 'normal', waterLevel: 1.8, dangerLevel: 3.5 },
+    { id: 4, name: 'Kali Panggang', source: 'Panggang River', lat: -8.2019, lng: 114.3624, status: 'danger', waterLevel: 4.2, dangerLevel: 4.0 },
+    { id: 5, name: 'Kali Mayang', source: 'Mayang River', lat: -8.1963, lng: 114.3587, status: 'normal', waterLevel: 1.5, dangerLevel: 3.2 },
+    { id: 6, name: 'Kali Bomo', source: 'Bomo River', lat: -8.1905, lng: 114.3549, status: 'warning', waterLevel: 2.8, dangerLevel: 3.0 },
+    { id: 7, name: 'Kali Sobo', source: 'Sobo River', lat: -8.1847, lng: 114.3512, status: 'normal', waterLevel: 1.1, dangerLevel: 2.8 }
 ];
 
 // Data dummy untuk perangkat Arduino
@@ -130,42 +132,47 @@ function initMap() {
     });
 }
 
+// Buat kartu status untuk satu sungai
+function createRiverCard(river) {
+    const card = document.createElement('div');
+    card.className = `river-card ${river.status}`;
+    card.dataset.riverId = river.id;
+    
+    let statusText, statusClass;
+    if (river.status === 'normal') {
+        statusText = 'Normal';
+        statusClass = 'normal';
+    } else if (river.status === 'warning') {
+        statusText = 'Waspada';
+        statusClass = 'warning';
+    } else {
+        statusText = 'Bahaya';
+        statusClass = 'danger';
+    }
+    
+    card.innerHTML = `
+        <h3>${river.name} <span class="status ${statusClass}">${statusText}</span></h3>
+        <div class="data">
+            <div class="data-item">
+                <div class="data-value">${river.waterLevel}m</div>
+                <div class="data-label">Tinggi Air</div>
+            </div>
+            <div class="data-item">
+                <div class="data-value">${river.dangerLevel}m</div>
+                <div class="data-label">Level Bahaya</div>
+            </div>
+        </div>
+    `;
+    return card;
+}
+
 // Render kartu status sungai
 function renderRiverStatus() {
     const container = document.getElementById('river-status-container');
     container.innerHTML = '';
     
     rivers.forEach(river => {
-        const card = document.createElement('div');
-        card.className = `river-card ${river.status}`;
-        
-        let statusText, statusClass;
-        if (river.status === 'normal') {
-            statusText = 'Normal';
-            statusClass = 'normal';
-        } else if (river.status === 'warning') {
-            statusText = 'Waspada';
-            statusClass = 'warning';
-        } else {
-            statusText = 'Bahaya';
-            statusClass = 'danger';
-        }
-        
-        card.innerHTML = `
-            <h3>${river.name} <span class="status ${statusClass}">${statusText}</span></h3>
-            <div class="data">
-                <div class="data-item">
-                    <div class="data-value">${river.waterLevel}m</div>
-                    <div class="data-label">Tinggi Air</div>
-                </div>
-                <div class="data-item">
-                    <div class="data-value">${river.dangerLevel}m</div>
-                    <div class="data-label">Level Bahaya</div>
-                </div>
-            </div>
-        `;
-        
-        container.appendChild(card);
+        container.appendChild(createRiverCard(river));
     });
     
     // Update waktu terakhir pembaruan
@@ -173,6 +180,17 @@ function renderRiverStatus() {
         `Terakhir diperbarui: Februari 2024`;
 }
 
+// Ganti hanya kartu sungai yang berubah
+function updateRiverCard(river) {
+    const container = document.getElementById('river-status-container');
+    const card = container.querySelector(`[data-river-id="${river.id}"]`);
+    if (card) {
+        card.replaceWith(createRiverCard(river));
+    } else {
+        container.appendChild(createRiverCard(river));
+    }
+}
+
 // Render kontrol perangkat (hanya untuk admin)
 function renderDeviceControl() {
     if (!checkAuth()) return;
@@ -438,42 +456,45 @@ function initNavigation() {
     });
 }
 
-// Load data CSV (hanya untuk admin)
-function loadCSVData() {
+// Load data monitoring (hanya untuk admin): 24 jam terakhir dari snapshot hourly, bukan CSV mentah
+async function loadCSVData() {
     if (!checkAuth()) {
         alert('Anda harus login untuk mengakses data CSV');
         return;
     }
     
-    // Simulasi pemuatan data CSV
-    const sampleData = [
-        { date: '2023-11-01', time: '08:00', setail: 1.2, baru: 2.5, tambong: 1.8, panggang: 4.2, mayang: 1.5, bomo: 2.8, sobo: 1.1 },
-        { date: '2023-10-31', time: '08:00', setail: 1.1, baru: 2.3, tambong: 1.7, panggang: 3.9, mayang: 1.4, bomo: 2.6, sobo: 1.0 },
-        { date: '2023-10-30', time: '08:00', setail: 1.3, baru: 2.7, tambong: 1.9, panggang: 4.5, mayang: 1.6, bomo: 2.9, sobo: 1.2 },
-        { date: '2023-10-29', time: '08:00', setail: 1.0, baru: 2.1, tambong: 1.6, panggang: 3.7, mayang: 1.3, bomo: 2.4, sobo: 0.9 },
-        { date: '2023-10-28', time: '08:00', setail: 1.4, baru: 2.9, tambong: 2.0, panggang: 4.8, mayang: 1.7, bomo: 3.1, sobo: 1.3 }
-    ];
-    
     const tableBody = document.getElementById('data-table-body');
-    tableBody.innerHTML = '';
+    let snapshot;
+    try {
+        snapshot = await loadSnapshot('hourly');
+    } catch (error) {
+        tableBody.innerHTML = `<tr><td colspan="${rivers.length + 2}">${error.message}</td></tr>`;
+        return;
+    }
     
-    sampleData.forEach(row => {
+    // Seri per sungai bisa di-downsample berbeda: gabungkan per timestamp
+    const byTime = {};
+    rivers.forEach((river, index) => {
+        const series = snapshot.rivers[river.source];
+        if (!series) return;
+        series.t.forEach((t, i) => {
+            byTime[t] = byTime[t] || [];
+            byTime[t][index] = series.mean[i];
+        });
+    });
+    const times = Object.keys(byTime).sort().reverse().slice(0, 24);
+    
+    tableBody.innerHTML = '';
+    times.forEach(t => {
         const tr = document.createElement('tr');
-        tr.innerHTML = `
-            <td>${row.date}</td>
-            <td>${row.time}</td>
-            <td>${row.setail}</td>
-            <td>${row.baru}</td>
-            <td>${row.tambong}</td>
-            <td>${row.panggang}</td>
-            <td>${row.mayang}</td>
-            <td>${row.bomo}</td>
-            <td>${row.sobo}</td>
-        `;
+        const levels = rivers.map((river, index) => {
+            const value = byTime[t][index];
+            return value == null ? '-' : (value / 100).toFixed(2);
+        });
+        tr.innerHTML = `<td>${t.slice(0, 10)}</td><td>${t.slice(11, 16)}</td>` +
+            levels.map(level => `<td>${level}</td>`).join('');
         tableBody.appendChild(tr);
     });
-    
-    alert('Data CSV berhasil dimuat!');
 }
 
 // Update chart data
@@ -493,6 +514,144 @@ function updateCharts() {
     }
 }
 
+// Muat satu snapshot JSON dari pipeline (divalidasi ulang via ETag)
+async function loadSnapshot(name) {
+    const response = await fetch(`${CONFIG.dataUrls.snapshots}${name}.json`, { cache: 'no-cache' });
+    if (!response.ok) throw new Error(`Snapshot ${name} tidak tersedia (${response.status})`);
+    return response.json();
+}
+
+// Chart rata-rata harian (snapshot daily) dan tren banjir per bulan (snapshot episodes)
+async function loadTrendSnapshots() {
+    try {
+        const daily = await loadSnapshot('daily');
+        const totals = {};
+        Object.values(daily.rivers).forEach(series => {
+            series.t.forEach((t, i) => {
+                if (series.mean[i] == null) return;
+                const day = t.slice(0, 10);
+                totals[day] = totals[day] || { sum: 0, n: 0 };
+                totals[day].sum += series.mean[i];
+                totals[day].n += 1;
+            });
+        });
+        const days = Object.keys(totals).sort();
+        regressionChart.data.labels = days;
+        regressionChart.data.datasets[0].label = 'Tinggi Air Rata-rata Harian (m)';
+        regressionChart.data.datasets[0].data = days.map(day => totals[day].sum / totals[day].n / 100);
+        regressionChart.update();
+    } catch (error) {
+        console.warn(error.message);
+    }
+    
+    try {
+        const { episodes } = await loadSnapshot('episodes');
+        const months = {};
+        episodes.start.forEach((start, i) => {
+            const month = start.slice(0, 7);
+            months[month] = months[month] || { count: 0, peak: 0 };
+            months[month].count += 1;
+            months[month].peak = Math.max(months[month].peak, episodes.peak_height_cm[i] || 0);
+        });
+        const labels = Object.keys(months).sort();
+        trendChart.data.labels = labels;
+        trendChart.data.datasets[0].data = labels.map(month => months[month].count);
+        trendChart.data.datasets[1].label = 'Tinggi Air Maksimum (m)';
+        trendChart.data.datasets[1].data = labels.map(month => months[month].peak / 100);
+        trendChart.update();
+    } catch (error) {
+        console.warn(error.message);
+    }
+}
+
+// Muat snapshot status terbaru (beberapa KB, divalidasi ulang via ETag)
+async function loadLatestSnapshot() {
+    const snapshot = await loadSnapshot('latest');
+    let lastTimestamp = null;
+    rivers.forEach(river => {
+        const reading = snapshot.rivers[river.source];
+        if (!reading) return;
+        river.waterLevel = Math.round(reading.water_height_cm) / 100;
+        river.status = reading.status;
+        if (!lastTimestamp || reading.timestamp > lastTimestamp) lastTimestamp = reading.timestamp;
+    });
+    return lastTimestamp;
+}
+
+// Simulasi perubahan level air (fallback jika snapshot tidak tersedia)
+function simulateReadings() {
+    rivers.forEach(river => {
+        // Simulasi perubahan level air kecil
+        const change = (Math.random() - 0.5) * 0.2;
+        river.waterLevel = Math.max(0.1, river.waterLevel + change);
+        
+        // Update status berdasarkan level air
+        if (river.waterLevel > river.dangerLevel) {
+            river.status = 'danger';
+        } else if (river.waterLevel > river.dangerLevel * 0.7) {
+            river.status = 'warning';
+        } else {
+            river.status = 'normal';
+        }
+    });
+}
+
+async function refreshReadings() {
+    try {
+        const lastTimestamp = await loadLatestSnapshot();
+        renderRiverStatus();
+        if (lastTimestamp) {
+            document.getElementById('last-update').textContent =
+                `Terakhir diperbarui: ${lastTimestamp.replace('T', ' ')}`;
+        }
+    } catch (error) {
+        simulateReadings();
+        renderRiverStatus();
+    }
+    updateCharts();
+}
+
+// Terapkan pembacaan live (snapshot atau delta) hanya pada sungai yang berubah
+function applyLiveReadings(readings) {
+    let lastTimestamp = null;
+    rivers.forEach(river => {
+        const reading = readings[river.source];
+        if (!reading) return;
+        river.waterLevel = Math.round(reading.water_height_cm) / 100;
+        river.status = reading.status;
+        updateRiverCard(river);
+        if (!lastTimestamp || reading.timestamp > lastTimestamp) lastTimestamp = reading.timestamp;
+    });
+    if (lastTimestamp) {
+        document.getElementById('last-update').textContent =
+            `Terakhir diperbarui: ${lastTimestamp.replace('T', ' ')} (live)`;
+        updateCharts();
+    }
+}
+
+// Polling snapshot hanya dipakai selama stream live tidak terhubung
+let pollTimer = null;
+
+function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(refreshReadings, 10000); // Update setiap 10 detik
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+function connectLiveStream() {
+    if (!window.EventSource || !CONFIG.dataUrls.liveStream) return;
+    
+    const source = new EventSource(CONFIG.dataUrls.liveStream);
+    source.addEventListener('open', stopPolling);
+    // EventSource menyambung ulang sendiri; sementara itu kembali ke polling
+    source.addEventListener('error', startPolling);
+    source.addEventListener('snapshot', event => applyLiveReadings(JSON.parse(event.data).rivers));
+    source.addEventListener('delta', event => applyLiveReadings(JSON.parse(event.data).rivers));
+}
+
 // Inisialisasi aplikasi
 document.addEventListener('DOMContentLoaded', function() {
     initMap();
@@ -520,25 +679,9 @@ document.addEventListener('DOMContentLoaded', function() {
         window.history.replaceState({}, document.title, window.location.pathname);
     }
     
-    // Simulasi update data real-time
-    setInterval(() => {
-        // Update status sungai secara acak untuk simulasi
-        rivers.forEach(river => {
-            // Simulasi perubahan level air kecil
-            const change = (Math.random() - 0.5) * 0.2;
-            river.waterLevel = Math.max(0.1, river.waterLevel + change);
-            
-            // Update status berdasarkan level air
-            if (river.waterLevel > river.dangerLevel) {
-                river.status = 'danger';
-            } else if (river.waterLevel > river.dangerLevel * 0.7) {
-                river.status = 'warning';
-            } else {
-                river.status = 'normal';
-            }
-        });
-        
-        renderRiverStatus();
-        updateCharts();
-    }, 10000); // Update setiap 10 detik
+    // Update data: snapshot terbaru, lalu stream live (polling/simulasi jika tidak tersedia)
+    refreshReadings();
+    loadTrendSnapshots();
+    startPolling();
+    connectLiveStream();
 });
\ No newline at end of file